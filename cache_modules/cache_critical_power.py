@@ -1,12 +1,10 @@
-import os
-import json
-import sqlite3
 import pandas as pd
-import numpy as np
-from utils.settings_access import DB_PATH  # ✅ zentrale DB-Konstante
-from utils.user_paths import get_user_fit_dir, get_user_cache_path
-from fit_processing.power_metrics_complete import estimate_critical_power_model, extract_power_series
-from cache_modules.cache_helpers import get_all_file_names, get_activity_id_from_filename
+from utils.user_paths import get_user_cache_write_path
+from utils.cache_io import write_json
+from fit_processing.power_metrics_complete import estimate_critical_power_model
+from fit_processing.backfill import backfill_metric
+from cache_modules.cache_helpers import get_all_file_names
+from utils.database import read_connection
 
 def validate_user(user: str):
     if not user or not isinstance(user, str) or not user.strip():
@@ -23,73 +21,38 @@ def save_critical_power(user: str):
             print(f"[WARN] Ungültiges CP-Modell für {user} – übersprungen.")
             return
 
-        out_path = get_user_cache_path("critical_power.json", user=user)
-        with open(out_path, "w") as f:
-            json.dump(model, f, indent=2)
+        out_path = get_user_cache_write_path("critical_power.json", user=user)
+        write_json(out_path, model, indent=2)
         print(f"[OK] Critical Power Modell für {user} gespeichert.")
     except Exception as e:
         print(f"[ERROR] Fehler bei CP-Modell für {user}: {e}")
+        raise
 
 def save_critical_power_per_activity(user: str):
+    """
+    Exportiert den CP-Verlauf je Aktivität. Der Wert wird als registrierte Metrik beim Import
+    berechnet; fehlende Werte (ältere Aktivitäten) werden einmalig per Backfill ergänzt.
+    """
     try:
         validate_user(user)
         print(f"[DEBUG] Starte save_critical_power_per_activity für: '{user}'")
-        fit_dir = get_user_fit_dir(user)
-        filenames = get_all_file_names(user)
-        if not filenames:
-            print(f"[WARN] Keine FIT-Dateien für {user}.")
-            return
-
-        updates = []
-        history = []
-
-        for fname in filenames:
-            path = os.path.join(fit_dir, fname)
-            power = extract_power_series(path)
-            if len(power) < 600:
-                continue
+        backfill_metric("critical_power", user, workers=1)
 
-            s = pd.Series(power)
-            cp_estimates = []
-            for dur in [180, 300, 1200]:  # 3min, 5min, 20min
-                if len(s) >= dur:
-                    avg = s.rolling(dur, min_periods=dur).mean().max()
-                    if pd.notna(avg):
-                        cp_estimates.append(avg)
+        with read_connection() as conn:
+            df = pd.read_sql_query("""
+                SELECT start_time AS timestamp, critical_power
+                FROM activities
+                WHERE user_id = ? AND critical_power IS NOT NULL
+                ORDER BY start_time
+            """, conn, params=(user,))
 
-            if not cp_estimates:
-                continue
-
-            cp_estimate = round(np.mean(cp_estimates), 1)
-            updates.append((cp_estimate, fname, user))
-
-            with sqlite3.connect(DB_PATH) as conn:
-                df = pd.read_sql_query("""
-                    SELECT start_time FROM activities
-                    WHERE file_name = ? AND user_id = ?
-                """, conn, params=(fname, user))
-                if not df.empty:
-                    timestamp = df.iloc[0]["start_time"]
-                    history.append({"timestamp": timestamp, "critical_power": cp_estimate})
-
-        if updates:
-            with sqlite3.connect(DB_PATH) as conn:
-                cursor = conn.cursor()
-                cursor.executemany("""
-                    UPDATE activities
-                    SET critical_power = ?
-                    WHERE file_name = ? AND user_id = ?
-                """, updates)
-                conn.commit()
-            print(f"[OK] CP pro Aktivität gespeichert ({len(updates)} für {user}).")
-        else:
+        if df.empty:
             print(f"[WARN] Keine CP-Werte für {user} generiert.")
+            return
 
-        if history:
-            hist_path = get_user_cache_path("critical_power_history.json", user=user)
-            os.makedirs(os.path.dirname(hist_path), exist_ok=True)
-            with open(hist_path, "w") as f:
-                json.dump(history, f, indent=2)
-            print(f"[OK] CP-Verlauf für {user} gespeichert.")
+        hist_path = get_user_cache_write_path("critical_power_history.json", user=user)
+        write_json(hist_path, df.to_dict(orient="records"), indent=2)
+        print(f"[OK] CP-Verlauf für {user} gespeichert ({len(df)} Aktivitäten).")
     except Exception as e:
-        print(f"[ERROR] Fehler bei CP pro Aktivität für {user}: {e}")
\ No newline at end of file
+        print(f"[ERROR] Fehler bei CP pro Aktivität für {user}: {e}")
+        raise
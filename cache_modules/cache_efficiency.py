@@ -1,33 +1,48 @@
 import os
-import sqlite3
+import numpy as np
 import pandas as pd
-from utils.settings_access import DB_PATH  # ✅ zentraler DB-Pfad
-from utils.user_paths import get_user_cache_path
+from fit_processing.efficiency_metrics import decode_ef_stream
+from utils.user_paths import get_user_cache_write_path
+from utils.cache_io import write_table
+from utils.database import read_connection
+
+EF_STREAM_SQL = "SELECT ef_stream FROM activities WHERE id = ? AND user_id = ?"
 
 def save_efficiency_factors(user: str):
+    """
+    Exportiert EF und aerobe Entkopplung je Aktivität. Beide Werte werden beim Import
+    berechnet und hier nur gelesen (ältere Einträge ohne gespeicherten EF: NP / HFavg).
+    """
     try:
-        print(f"[INFO] Berechne EF für Nutzer: {user}")
-        with sqlite3.connect(DB_PATH) as conn:
+        print(f"[INFO] Exportiere EF für Nutzer: {user}")
+        with read_connection() as conn:
             df = pd.read_sql_query("""
-                SELECT start_time, normalized_power, avg_heart_rate, intensity_factor
+                SELECT id, start_time, normalized_power, avg_heart_rate, intensity_factor,
+                       COALESCE(efficiency_factor, normalized_power / avg_heart_rate) AS ef,
+                       ef_first_half, ef_second_half, decoupling
                 FROM activities
                 WHERE user_id = ?
                   AND normalized_power IS NOT NULL
                   AND avg_heart_rate IS NOT NULL
                   AND intensity_factor IS NOT NULL
+                ORDER BY start_time
             """, conn, params=(user,))
 
         if df.empty:
             print(f"[WARN] Keine validen EF-Daten für {user}.")
             return
 
-        df["start_time"] = pd.to_datetime(df["start_time"])
-        df["ef"] = df["normalized_power"] / df["avg_heart_rate"]
         df = df.dropna(subset=["ef", "intensity_factor"])
-        df = df.sort_values("start_time")
 
-        out_path = get_user_cache_path("efficiency_factors.csv", user=user)
-        df.to_csv(out_path, index=False)
+        out_path = get_user_cache_write_path("efficiency_factors.npz", user=user)
+        write_table(df, out_path, datetime_columns=("start_time",))
         print(f"[OK] EF-Cache für {user} gespeichert.")
     except Exception as e:
-        print(f"[ERROR] Fehler bei EF-Berechnung für {user}: {e}")
\ No newline at end of file
+        print(f"[ERROR] Fehler beim EF-Export für {user}: {e}")
+        raise
+
+def load_ef_stream(user: str, activity_id: int) -> np.ndarray:
+    """Liest den beim Import gespeicherten EF-Stream (1 Wert pro Minute) einer Aktivität."""
+    with read_connection() as conn:
+        row = conn.execute(EF_STREAM_SQL, (int(activity_id), user)).fetchone()
+    return decode_ef_stream(row[0] if row else None)
\ No newline at end of file
@@ -1,25 +1,30 @@
-import os
-import sqlite3
 import pandas as pd
-from utils.settings_access import DB_PATH  # ✅ zentrale Definition verwenden
-from utils.user_paths import get_user_cache_path
+from utils.user_paths import get_user_cache_write_path
+from utils.cache_io import write_csv, write_table
+from utils.database import read_connection
 
 def save_activities_export(user: str):
-    """Exportiere alle Aktivitäten eines Benutzers als CSV."""
+    """
+    Exportiert alle Aktivitäten eines Benutzers spaltenweise (activities.npz) für die Seiten
+    sowie als CSV für die ML-Skripte.
+    """
     try:
         print(f"[DEBUG] Starte Export der Aktivitäten für: '{user}'")
 
-        with sqlite3.connect(DB_PATH) as conn:
+        with read_connection() as conn:
             df = pd.read_sql_query("SELECT * FROM activities WHERE user_id = ?", conn, params=(user,))
 
         if df.empty:
             print(f"[WARN] Keine Aktivitäten für Benutzer '{user}' – Export wird übersprungen.")
             return
 
-        out_path = get_user_cache_path("activities.csv", user=user)
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        df.to_csv(out_path, index=False)
+        # Binärspalten (EF-Stream) werden direkt aus der DB gelesen, nicht exportiert
+        df = df.drop(columns=["ef_stream"], errors="ignore")
+        out_path = get_user_cache_write_path("activities.npz", user=user)
+        write_table(df, out_path, datetime_columns=("start_time",))
+        write_csv(df, get_user_cache_write_path("activities.csv", user=user), index=False)
 
         print(f"[OK] Aktivitäten-Export erfolgreich gespeichert für '{user}': {out_path}")
     except Exception as e:
-        print(f"[ERROR] Fehler beim Aktivitäten-Export für Benutzer '{user}': {e}")
\ No newline at end of file
+        print(f"[ERROR] Fehler beim Aktivitäten-Export für Benutzer '{user}': {e}")
+        raise
\ No newline at end of file
@@ -1,35 +1,56 @@
 import os
-import sqlite3
 import hashlib
 import pandas as pd
 from typing import List, Dict, Tuple
-from utils.settings_access import DB_PATH  # ✅ neue zentrale Quelle für den DB-Pfad
 from utils.user_paths import get_user_fit_dir
+from utils.database import read_connection
 
-def migrate_add_critical_power_column():
-    """Fügt der Tabelle 'activities' die Spalte 'critical_power' hinzu, falls sie nicht existiert."""
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(activities)")
-            columns = [col[1] for col in cursor.fetchall()]
-            if "critical_power" not in columns:
-                cursor.execute("ALTER TABLE activities ADD COLUMN critical_power REAL")
-                conn.commit()
-                print("[MIGRATION] Spalte 'critical_power' zur Tabelle 'activities' hinzugefügt.")
-            else:
-                print("[INFO] Spalte 'critical_power' ist bereits vorhanden.")
-    except Exception as e:
-        print(f"[ERROR] Fehler bei Migration (critical_power): {e}")
+ACTIVITIES_IN_RANGE_SQL = """
+    SELECT id, file_name, date(start_time) AS date, tss, normalized_power, avg_power, intensity_factor
+    FROM activities
+    WHERE user_id = ? AND start_time >= ? AND start_time < ?
+    ORDER BY start_time
+"""
+FILE_NAMES_SQL = "SELECT file_name FROM activities WHERE user_id = ?"
+FILE_METADATA_SQL = "SELECT file_name, file_size, file_hash FROM activities WHERE user_id = ?"
+ACTIVITY_AGGREGATES_SQL = """
+    SELECT period_start, count, duration, distance, tss, avg_np, avg_if, avg_power, kj
+    FROM activity_aggregates
+    WHERE user_id = ? AND period_type = ?
+"""
+
+def load_activity_aggregates(user: str, period: str = "week", since=None, until=None) -> pd.DataFrame:
+    """
+    Liest die Aggregate eines Benutzers für einen Periodentyp, optional eingeschränkt auf
+    Perioden mit Beginn in [since, until] (Bereichsabfrage über den Primärschlüssel).
+    """
+    query = ACTIVITY_AGGREGATES_SQL
+    params = [user, period]
+    if since is not None:
+        query += " AND period_start >= ?"
+        params.append(pd.Timestamp(since).strftime("%Y-%m-%d"))
+    if until is not None:
+        query += " AND period_start <= ?"
+        params.append(pd.Timestamp(until).strftime("%Y-%m-%d"))
+    query += " ORDER BY period_start"
+
+    with read_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    df["period_start"] = pd.to_datetime(df["period_start"])
+    return df
+
+def load_activities_between(user: str, start, end) -> pd.DataFrame:
+    """Aktivitäten eines Benutzers mit Beginn in [start, end) – Bereichsabfrage über (user_id, start_time)."""
+    with read_connection() as conn:
+        return pd.read_sql_query(ACTIVITIES_IN_RANGE_SQL, conn, params=(
+            user, pd.Timestamp(start).strftime("%Y-%m-%d"), pd.Timestamp(end).strftime("%Y-%m-%d")
+        ))
 
 def get_all_file_names(user_id: str) -> List[str]:
     """Gibt alle FIT-Dateinamen eines Benutzers aus der Datenbank zurück."""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            df = pd.read_sql_query(
-                "SELECT file_name FROM activities WHERE user_id = ?",
-                conn, params=(user_id,)
-            )
+        with read_connection() as conn:
+            df = pd.read_sql_query(FILE_NAMES_SQL, conn, params=(user_id,))
         return df["file_name"].dropna().tolist() if not df.empty else []
     except Exception as e:
         print(f"[ERROR] Fehler beim Abruf der Dateinamen für '{user_id}': {e}")
@@ -38,12 +59,8 @@ def get_all_file_names(user_id: str) -> List[str]:
 def get_file_metadata(user_id: str) -> Dict[str, Tuple[int, str]]:
     """Gibt ein Dictionary zurück: Dateiname → (Dateigröße, MD5-Hash) aus der Datenbank."""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            df = pd.read_sql_query("""
-                SELECT file_name, file_size, file_hash
-                FROM activities
-                WHERE user_id = ?
-            """, conn, params=(user_id,))
+        with read_connection() as conn:
+            df = pd.read_sql_query(FILE_METADATA_SQL, conn, params=(user_id,))
         return {
             row["file_name"]: (row["file_size"], row["file_hash"])
             for _, row in df.iterrows()
@@ -85,17 +102,3 @@ def get_changed_files(user_id: str) -> List[str]:
                 changed_files.append(fname)
 
     return changed_files
-
-def get_activity_id_from_filename(filename: str, user_id: str) -> int:
-    """Gibt die ID der Aktivität zu einer bestimmten FIT-Datei für einen Benutzer zurück."""
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            result = pd.read_sql_query("""
-                SELECT id FROM activities
-                WHERE file_name = ? AND user_id = ?
-            """, conn, params=(filename, user_id))
-        if not result.empty:
-            return int(result.iloc[0]["id"])
-    except Exception as e:
-        print(f"[ERROR] Fehler beim Abrufen der activity_id für '{filename}' ({user_id}): {e}")
-    return -1
\ No newline at end of file
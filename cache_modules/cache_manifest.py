@@ -0,0 +1,141 @@
+# === Datei: cache_manifest.py ===
+# Manifest je Benutzer (cache/<user>/manifest.json): hält für jedes Cache-Modul und jedes
+# Artefakt den Fingerabdruck seiner Eingaben (Datenversion der Tabellen aus 'data_version',
+# Hash der Einstellungen, Code-Version) sowie Bau-Zeitpunkt und Laufzeit fest.
+# Frische-Prüfungen kosten damit nur ein paar Primärschlüssel-Abfragen – unabhängig von der
+# Anzahl der Aktivitäten oder FIT-Dateien.
+
+import os
+import json
+import hashlib
+import sqlite3
+from datetime import datetime
+from utils.settings_access import get_setting
+from utils.user_paths import get_user_cache_path, get_user_cache_write_path
+from utils.cache_io import write_json
+from cache_modules.cache_planner import MODULE_SPECS
+from utils.database import read_connection
+
+MANIFEST_FILE = "manifest.json"
+CACHE_FORMAT_VERSION = 1
+
+
+def load_manifest(user: str) -> dict:
+    path = get_user_cache_path(MANIFEST_FILE, user=user)
+    if not os.path.exists(path):
+        return {"format": CACHE_FORMAT_VERSION, "modules": {}, "artifacts": {}}
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != CACHE_FORMAT_VERSION:
+            return {"format": CACHE_FORMAT_VERSION, "modules": {}, "artifacts": {}}
+        return manifest
+    except Exception as e:
+        print(f"[WARN] Manifest für '{user}' nicht lesbar, wird neu aufgebaut: {e}")
+        return {"format": CACHE_FORMAT_VERSION, "modules": {}, "artifacts": {}}
+
+
+def save_manifest(user: str, manifest: dict):
+    write_json(get_user_cache_path(MANIFEST_FILE, user=user), manifest, indent=2)
+
+
+def data_versions_sql(n_tables: int) -> str:
+    return f"""
+        SELECT table_name, version
+        FROM data_version
+        WHERE user_id = ? AND table_name IN ({','.join('?' for _ in range(n_tables))})
+    """
+
+
+def get_data_versions(user: str, tables) -> dict:
+    """Liest die Zeilenversionen der angegebenen Tabellen-Schlüssel aus 'data_version'."""
+    tables = list(tables)
+    if not tables:
+        return {}
+    try:
+        with read_connection() as conn:
+            rows = conn.execute(data_versions_sql(len(tables)), (user, *tables)).fetchall()
+    except sqlite3.Error:
+        rows = []
+    versions = dict(rows)
+    return {t: versions.get(t, 0) for t in tables}
+
+
+def _settings_hash(user: str, keys) -> str:
+    values = {k: get_setting(k, None, user=user) for k in keys}
+    return hashlib.md5(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def module_inputs(user: str, name: str, manifest: dict = None) -> dict:
+    """Aktueller Eingabezustand eines Moduls (Datenversionen, Einstellungs-Hash, Code-Version)."""
+    spec = MODULE_SPECS[name]
+    manifest = manifest or load_manifest(user)
+    return {
+        "tables": get_data_versions(user, spec["tables"]),
+        "settings": _settings_hash(user, spec["settings"]),
+        "artifacts": {
+            a: manifest["artifacts"].get(a, {}).get("fingerprint") for a in spec["artifacts"]
+        },
+        "code": spec["version"],
+    }
+
+
+def _fingerprint(inputs: dict) -> str:
+    return hashlib.md5(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def is_up_to_date(user: str, name: str, manifest: dict = None) -> bool:
+    """
+    Ein Modul ist aktuell, wenn sich seine Eingaben seit dem letzten Bau nicht geändert
+    haben und alle Artefakte noch vorhanden sind.
+    """
+    manifest = manifest or load_manifest(user)
+    entry = manifest["modules"].get(name)
+    if not entry or entry.get("fingerprint") != _fingerprint(module_inputs(user, name, manifest)):
+        return False
+    return all(
+        os.path.exists(get_user_cache_write_path(a, user=user))
+        for a in MODULE_SPECS[name]["outputs"]["artifacts"]
+    )
+
+
+def record_module_run(user: str, name: str, seconds: float = None, inputs: dict = None):
+    """
+    Trägt den erfolgreichen Bau eines Moduls und seiner Artefakte ins Manifest ein.
+
+    `inputs` ist der vor dem Lauf erfasste Eingabezustand (`module_inputs`). Ändern sich die
+    Daten während des Laufs, gilt das Modul danach als veraltet statt als aktuell.
+    """
+    manifest = load_manifest(user)
+    inputs = inputs or module_inputs(user, name, manifest)
+    fingerprint = _fingerprint(inputs)
+    built_at = datetime.now().isoformat(timespec="seconds")
+
+    manifest["modules"][name] = {
+        "fingerprint": fingerprint,
+        "inputs": inputs,
+        "built_at": built_at,
+        "seconds": round(seconds, 2) if seconds is not None else None,
+    }
+    for artifact in MODULE_SPECS[name]["outputs"]["artifacts"]:
+        manifest["artifacts"][artifact] = {"module": name, "fingerprint": fingerprint, "built_at": built_at}
+    save_manifest(user, manifest)
+
+
+def _module_of(artifact: str):
+    for name, spec in MODULE_SPECS.items():
+        if artifact in spec["outputs"]["artifacts"]:
+            return name
+    return None
+
+
+def is_artifact_fresh(user: str, artifact: str) -> bool:
+    """Prüft für Leser, ob ein Artefakt zu den aktuellen Daten und Einstellungen passt."""
+    name = _module_of(artifact)
+    return name is not None and is_up_to_date(user, name)
+
+
+def artifact_built_at(user: str, artifact: str):
+    """Bau-Zeitpunkt eines Artefakts laut Manifest (datetime) oder None."""
+    entry = load_manifest(user)["artifacts"].get(artifact)
+    return datetime.fromisoformat(entry["built_at"]) if entry else None
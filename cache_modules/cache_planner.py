@@ -0,0 +1,221 @@
+# === Datei: cache_planner.py ===
+# Abhängigkeitsmodell der Cache-Module: Jedes Modul deklariert seine Eingaben (DB-Tabellen,
+# Einstellungen, FIT-Dateien, andere Cache-Artefakte) und Ausgaben. Aus einem Änderungssatz
+# werden nur die betroffenen Module bestimmt und topologisch sortiert; ob ein Modul übersprungen
+# werden kann, entscheidet das Manifest (cache_manifest.py).
+
+# "executor": "process" für CPU-gebundene Module mit FIT-Parsing, "thread" für SQL-/I/O-gebundene
+# (vo2max_streams verteilt das Parsing selbst auf Worker-Prozesse).
+#
+# Tabellen-Schlüssel entsprechen den Einträgen der Tabelle 'data_version'. Die von
+# 'cp_per_activity' nachgetragene Spalte wird als "activities.critical_power" getrennt geführt,
+# damit nicht jeder Leser von 'activities' davon abhängt.
+#
+# "version" ist die Code-Version des Moduls: bei geänderter Berechnung erhöhen,
+# damit vorhandene Artefakte als veraltet gelten.
+
+MODULE_SPECS = {
+    "training_load": {
+        "version": 2,
+        "executor": "thread",
+        "tables": ["activities"],
+        "settings": ["hr_max", "hr_rest", "ctl_constant", "atl_constant"],
+        "fit_files": False,
+        "artifacts": [],
+        "outputs": {"tables": ["training_load"], "artifacts": ["training_load.npz"]},
+    },
+    "power_curve": {
+        "version": 1,
+        "executor": "process",
+        "tables": ["activities"],
+        "settings": ["weight"],
+        "fit_files": True,
+        "artifacts": [],
+        "outputs": {"tables": [], "artifacts": ["power_curve.npy"]},
+    },
+    "cp_per_activity": {
+        "version": 1,
+        "executor": "process",
+        "tables": ["activities"],
+        "settings": [],
+        "fit_files": True,
+        "artifacts": [],
+        "outputs": {"tables": ["activities.critical_power"], "artifacts": ["critical_power_history.json"]},
+    },
+    "cp_model": {
+        "version": 1,
+        "executor": "process",
+        "tables": ["activities"],
+        "settings": [],
+        "fit_files": True,
+        "artifacts": [],
+        "outputs": {"tables": [], "artifacts": ["critical_power.json"]},
+    },
+    "vo2max": {
+        "version": 1,
+        "executor": "thread",
+        "tables": ["activities"],
+        "settings": ["weight", "hr_max"],
+        "fit_files": False,
+        "artifacts": [],
+        "outputs": {"tables": [], "artifacts": ["vo2max_time_series.json", "vo2max_state.json"]},
+    },
+    "vo2max_streams": {
+        "version": 1,
+        "executor": "thread",
+        "tables": ["activities"],
+        "settings": ["weight", "hr_max", "hr_rest"],
+        "fit_files": True,
+        "artifacts": [],
+        "outputs": {"tables": [], "artifacts": ["vo2max_stream_series.json"]},
+    },
+    "efficiency": {
+        "version": 3,
+        "executor": "thread",
+        "tables": ["activities"],
+        "settings": [],
+        "fit_files": False,
+        "artifacts": [],
+        "outputs": {"tables": [], "artifacts": ["efficiency_factors.npz"]},
+    },
+    "zones": {
+        "version": 3,
+        "executor": "process",
+        "tables": ["activities", "power_zones", "hr_zones"],
+        "settings": ["ftp", "hr_max"],
+        "fit_files": True,
+        "artifacts": [],
+        "outputs": {
+            "tables": ["power_zones", "hr_zones"],
+            "artifacts": ["power_zones_summary.csv", "power_zones_detailed.npz", "hr_zones_summary.csv"],
+        },
+    },
+    "export": {
+        "version": 2,
+        "executor": "thread",
+        "tables": ["activities", "activities.critical_power"],
+        "settings": [],
+        "fit_files": False,
+        "artifacts": [],
+        "outputs": {"tables": [], "artifacts": ["activities.npz", "activities.csv"]},
+    },
+    "power_bests": {
+        "version": 1,
+        "executor": "thread",
+        "tables": ["activities"],
+        "settings": [],
+        "fit_files": False,
+        "artifacts": [],
+        "outputs": {"tables": [], "artifacts": ["power_best_values.json"]},
+    },
+    "power_time_series": {
+        "version": 2,
+        "executor": "thread",
+        "tables": ["activities"],
+        "settings": [],
+        "fit_files": False,
+        "artifacts": [],
+        "outputs": {"tables": [], "artifacts": ["power_bests_time_series.npz"]},
+    },
+}
+
+
+def make_change_set(new_files=(), deleted_files=(), settings=(), tables=()) -> dict:
+    """
+    Beschreibt, was sich seit dem letzten Cache-Aufbau geändert hat. Neue oder gelöschte
+    FIT-Dateien ändern immer auch die zugehörigen Tabellen.
+    """
+    tables = set(tables)
+    if new_files or deleted_files:
+        tables |= {"activities", "power_zones", "hr_zones", "training_load"}
+    return {
+        "new_files": list(new_files),
+        "deleted_files": list(deleted_files),
+        "settings": set(settings),
+        "tables": tables,
+    }
+
+
+def _produces(spec: dict) -> set:
+    return set(spec["outputs"]["tables"]) | set(spec["outputs"]["artifacts"])
+
+
+def _consumes(spec: dict) -> set:
+    return set(spec["tables"]) | set(spec["artifacts"])
+
+
+def topological_order(modules) -> list:
+    """Sortiert Module so, dass Erzeuger von Tabellen/Artefakten vor ihren Lesern laufen."""
+    modules = list(modules)
+    order, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Zyklische Cache-Abhängigkeit bei Modul '{name}'.")
+        visiting.add(name)
+        for other in modules:
+            if other != name and _produces(MODULE_SPECS[other]) & _consumes(MODULE_SPECS[name]):
+                visit(other)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in modules:
+        visit(name)
+    return order
+
+
+def dependency_levels(modules) -> list:
+    """
+    Gruppiert Module in Stufen: Jedes Modul liegt eine Stufe hinter dem letzten Erzeuger
+    seiner Eingaben. Module derselben Stufe sind unabhängig und können parallel laufen.
+    """
+    modules = topological_order(modules)
+    level = {}
+    for name in modules:
+        producers = [
+            level[other] for other in modules
+            if other in level and other != name
+            and _produces(MODULE_SPECS[other]) & _consumes(MODULE_SPECS[name])
+        ]
+        level[name] = max(producers) + 1 if producers else 0
+    return [
+        [m for m in modules if level[m] == i]
+        for i in range(max(level.values()) + 1)
+    ] if level else []
+
+
+def affected_modules(change_set: dict = None, modules=None) -> list:
+    """
+    Bestimmt alle Module, die vom Änderungssatz betroffen sind – direkt über ihre Eingaben
+    oder indirekt über die Ausgaben anderer betroffener Module. Ohne Änderungssatz gelten
+    alle Module als Kandidaten.
+    """
+    candidates = list(modules or MODULE_SPECS.keys())
+    if change_set is None:
+        return topological_order(candidates)
+
+    files_changed = bool(change_set.get("new_files") or change_set.get("deleted_files"))
+    changed = set(change_set.get("tables", ()))
+    settings = set(change_set.get("settings", ()))
+
+    affected = set()
+    grew = True
+    while grew:
+        grew = False
+        for name in candidates:
+            if name in affected:
+                continue
+            spec = MODULE_SPECS[name]
+            if (
+                (spec["fit_files"] and files_changed)
+                or settings & set(spec["settings"])
+                or changed & _consumes(spec)
+            ):
+                affected.add(name)
+                changed |= _produces(spec)
+                grew = True
+
+    return topological_order([m for m in candidates if m in affected])
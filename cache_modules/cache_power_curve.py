@@ -1,10 +1,10 @@
 # === Datei: cache_power_curve.py ===
 
-import os
 import numpy as np
 from fit_processing.power_metrics_complete import compute_alltime_power_curve
 from cache_modules.cache_helpers import get_all_file_names
-from utils.user_paths import get_user_cache_path
+from utils.user_paths import get_user_cache_write_path
+from utils.cache_io import write_npy
 from utils.settings_access import get_setting
 
 
@@ -23,10 +23,10 @@ def save_power_curve(user: str):
             print(f"[WARN] Keine gültige Powerkurve für '{user}' berechnet.")
             return
 
-        out_path = get_user_cache_path("power_curve.npy", user=user)
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        np.save(out_path, np.array(curve))
+        out_path = get_user_cache_write_path("power_curve.npy", user=user)
+        write_npy(out_path, np.array(curve))
         print(f"[OK] Powerkurven-Cache gespeichert für Benutzer '{user}' → {out_path}")
 
     except Exception as e:
-        print(f"[ERROR] Fehler bei Powerkurve für '{user}': {e}")
\ No newline at end of file
+        print(f"[ERROR] Fehler bei Powerkurve für '{user}': {e}")
+        raise
\ No newline at end of file
@@ -1,56 +1,44 @@
 # === Datei: cache_training_load.py ===
 
 import os
-import sqlite3
 import pandas as pd
-from fit_processing.metrics_calc_new import calculate_training_load
-from utils.user_paths import get_user_cache_path
-from utils.settings_access import get_setting
+from fit_processing.metrics_calc_new import update_training_load_table, load_training_load_table
+from utils.user_paths import get_user_cache_write_path
+from utils.cache_io import write_table
 from utils.settings_access import DB_PATH  # ⬅️ Direkt aus settings_access importieren
 
 def save_training_load(user: str):
     """
-    Berechnet CTL, ATL und TSB für einen bestimmten Benutzer
-    und speichert das Ergebnis als CSV im benutzerspezifischen Cache.
+    Exportiert CTL, ATL und TSB (alle Belastungskanäle) eines Benutzers aus der Tabelle
+    'training_load' als Spaltentabelle (training_load.npz) in den benutzerspezifischen Cache.
+    Die Tabelle wird nur dann vollständig berechnet, wenn für den Benutzer noch keine Werte existieren,
+    ansonsten nur ab dem letzten gespeicherten Tag bis heute fortgeschrieben.
     """
     try:
-        print(f"[INFO] Berechne Training Load für Benutzer: '{user}'")
+        print(f"[INFO] Exportiere Training Load für Benutzer: '{user}'")
 
         # === Datenbankverfügbarkeit prüfen ===
         if not os.path.exists(DB_PATH):
-            print(f"[ERROR] Datenbankpfad nicht gefunden: {DB_PATH}")
-            return
+            raise FileNotFoundError(f"Datenbankpfad nicht gefunden: {DB_PATH}")
 
-        # === TSS-Daten für Benutzer laden ===
-        with sqlite3.connect(DB_PATH) as conn:
-            df = pd.read_sql_query(
-                """
-                SELECT start_time, tss
-                FROM activities
-                WHERE user_id = ?
-                  AND tss IS NOT NULL
-                  AND start_time IS NOT NULL
-                """,
-                conn,
-                params=(user,)
-            )
-
-        if df.empty:
-            print(f"[WARN] Keine gültigen TSS-Daten für Benutzer '{user}' – übersprungen.")
-            return
+        # === Wide-Tabelle laden (bei Bedarf befüllen bzw. bis heute fortschreiben) ===
+        df_load = load_training_load_table(user)
+        if df_load.empty or df_load["trimp_ctl"].isna().all():
+            update_training_load_table(user=user)
+        else:
+            update_training_load_table(user=user, since=pd.Timestamp.today())
+        df_load = load_training_load_table(user)
 
-        # === Trainingsbelastung berechnen ===
-        df_load = calculate_training_load(df)
         if df_load.empty:
-            print(f"[WARN] Ergebnis-DataFrame leer für Benutzer '{user}'.")
+            print(f"[WARN] Keine gültigen Belastungsdaten für Benutzer '{user}' – übersprungen.")
             return
 
         # === Cache-Datei schreiben ===
-        out_path = get_user_cache_path("training_load.csv", user=user)
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        df_load.to_csv(out_path, index=False)
+        out_path = get_user_cache_write_path("training_load.npz", user=user)
+        write_table(df_load, out_path, datetime_columns=("date",))
 
         print(f"[OK] Training Load gespeichert für Benutzer '{user}' → {out_path}")
 
     except Exception as e:
-        print(f"[ERROR] Fehler beim Training Load für Benutzer '{user}': {e}")
\ No newline at end of file
+        print(f"[ERROR] Fehler beim Training Load für Benutzer '{user}': {e}")
+        raise
@@ -1,46 +1,84 @@
 # === Datei: cache_vo2max_estimate.py ===
 
 import os
-import sqlite3
 import pandas as pd
-from utils.user_paths import get_user_cache_path
+from utils.user_paths import get_user_cache_write_path
+from utils.settings_access import get_setting
 from fit_processing.vo2_max_estimate_model import (
-    estimate_vo2max_from_dataframe,
+    estimate_vo2max_incremental,
+    load_vo2max_state,
+    save_vo2max_state,
     save_vo2max_time_series
 )
 from utils.settings_access import DB_PATH  # ← neuer zentraler Import
+from utils.database import read_connection
+
+VO2MAX_COLUMNS = """
+    SELECT start_time, normalized_power, avg_heart_rate, intensity_factor, duration,
+           max_5min_power, max_10min_power
+    FROM activities
+    WHERE user_id = ?
+      AND normalized_power IS NOT NULL
+      AND avg_heart_rate IS NOT NULL
+      AND intensity_factor IS NOT NULL
+      AND duration >= 300
+"""
+
+def _resumable_state(conn, user: str, weight: float, max_hr: float):
+    """
+    Gibt den gespeicherten Schätzerzustand zurück, wenn er fortgesetzt werden darf:
+    gleiche Parameter und keine Änderungen an bereits verarbeiteten Aktivitäten.
+    """
+    state = load_vo2max_state(user)
+    if not state or state.get("weight") != weight or state.get("max_hr") != max_hr:
+        return None
+    last = state.get("last_start_time")
+    if not last:
+        return None
+    processed = conn.execute(
+        f"SELECT COUNT(*) FROM ({VO2MAX_COLUMNS} AND start_time <= ?)", (user, last)
+    ).fetchone()[0]
+    return state if processed == state.get("processed") else None
 
 def save_vo2max_peak_estimates_multistage(user: str):
     print(f"[INFO] Starte VO₂max-Hochrechnung für Benutzer: {user}")
     try:
         if not os.path.exists(DB_PATH):
-            print(f"[ERROR] Datenbankpfad nicht gefunden: {DB_PATH}")
-            return
+            raise FileNotFoundError(f"Datenbankpfad nicht gefunden: {DB_PATH}")
 
-        with sqlite3.connect(DB_PATH) as conn:
-            df = pd.read_sql_query("""
-                SELECT start_time, normalized_power, avg_heart_rate, intensity_factor, duration,
-                       max_5min_power, max_10min_power
-                FROM activities
-                WHERE user_id = ?
-                  AND normalized_power IS NOT NULL
-                  AND avg_heart_rate IS NOT NULL
-                  AND intensity_factor IS NOT NULL
-                  AND duration >= 300
-            """, conn, params=(user,))
+        weight = get_setting("weight", 70.0, user=user)
+        max_hr = get_setting("hr_max", 190, user=user)
+        if weight <= 0 or max_hr <= 0:
+            raise ValueError("Ungültige Benutzerparameter: Gewicht oder maximale HF nicht gesetzt.")
 
-        if df.empty:
+        with read_connection() as conn:
+            state = _resumable_state(conn, user, weight, max_hr)
+            if state is not None:
+                df = pd.read_sql_query(f"{VO2MAX_COLUMNS} AND start_time > ?", conn,
+                                       params=(user, state["last_start_time"]))
+            else:
+                df = pd.read_sql_query(VO2MAX_COLUMNS, conn, params=(user,))
+
+        if df.empty and state is None:
             print(f"[WARN] Keine Aktivitäten für VO₂max-Berechnung für Benutzer '{user}'")
             return
+        if df.empty:
+            print(f"[OK] VO₂max-Zeitreihe für '{user}' bereits aktuell.")
+            return
 
-        results = estimate_vo2max_from_dataframe(df)
+        results, state = estimate_vo2max_incremental(df, weight, max_hr, state=state)
 
         if results:
-            out_path = get_user_cache_path("vo2max_time_series.json", user=user)
+            out_path = get_user_cache_write_path("vo2max_time_series.json", user=user)
             os.makedirs(os.path.dirname(out_path), exist_ok=True)
-            save_vo2max_time_series(results, path=out_path)
+            # Zustand erst nach der Zeitreihe sichern – sonst setzt der nächste Lauf
+            # hinter Werten fort, die nie gespeichert wurden
+            if not save_vo2max_time_series(results, path=out_path):
+                raise OSError(f"VO₂max-Zeitreihe nicht geschrieben: {out_path}")
+            save_vo2max_state(state, user=user)
             print(f"[OK] VO₂max-Zeitreihe gespeichert für '{user}': {len(results)} Einträge → {out_path}")
         else:
             print(f"[WARN] Keine validen VO₂max-Werte für Benutzer '{user}'.")
     except Exception as e:
-        print(f"[ERROR] Fehler bei VO₂max-Berechnung für Benutzer '{user}': {e}")
\ No newline at end of file
+        print(f"[ERROR] Fehler bei VO₂max-Berechnung für Benutzer '{user}': {e}")
+        raise
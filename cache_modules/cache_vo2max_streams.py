@@ -0,0 +1,95 @@
+# === Datei: cache_vo2max_streams.py ===
+
+import os
+import json
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from utils.settings_access import get_setting
+from utils.user_paths import get_user_cache_path, get_user_cache_write_path, get_user_fit_path
+from utils.cache_io import write_json
+from fit_processing.vo2max_streams import scan_activity_efforts, estimate_vo2max_from_efforts
+from utils.database import read_connection
+
+EFFORTS_CACHE = "vo2max_efforts.json"
+SERIES_CACHE = "vo2max_stream_series.json"
+
+def _scan(task):
+    file_hash, path = task
+    try:
+        return file_hash, scan_activity_efforts(path), None
+    except Exception as e:
+        return file_hash, None, str(e)
+
+def _load_effort_cache(user: str) -> dict:
+    path = get_user_cache_path(EFFORTS_CACHE, user=user)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[WARN] Effort-Cache nicht lesbar, wird neu aufgebaut: {e}")
+        return {}
+
+def save_vo2max_stream_estimates(user: str, workers: int = None):
+    """
+    Schätzt VO₂max je Fahrt aus den Leistungs-/HF-Streams (beste gleichmäßige 3–8-min-Belastungen).
+    Die Belastungen werden pro Aktivität (Datei-Hash) gecacht, sodass nur neue Fahrten
+    eingelesen werden; das Einlesen läuft parallel in Worker-Prozessen.
+    """
+    try:
+        print(f"[INFO] Starte Stream-basierte VO₂max-Schätzung für: '{user}'")
+        with read_connection() as conn:
+            df = pd.read_sql_query("""
+                SELECT start_time, file_name, file_hash
+                FROM activities
+                WHERE user_id = ?
+                  AND avg_power IS NOT NULL
+                  AND avg_heart_rate IS NOT NULL
+                  AND file_hash IS NOT NULL
+                  AND duration >= 180
+                ORDER BY start_time
+            """, conn, params=(user,))
+
+        if df.empty:
+            print(f"[WARN] Keine Aktivitäten mit Leistung und HF für '{user}'.")
+            return
+
+        cached = _load_effort_cache(user)
+        efforts = {h: cached[h] for h in df["file_hash"] if h in cached}
+
+        tasks = [
+            (row.file_hash, get_user_fit_path(row.file_name, user))
+            for row in df.itertuples(index=False)
+            if row.file_hash not in efforts and os.path.exists(get_user_fit_path(row.file_name, user))
+        ]
+        if tasks:
+            print(f"[INFO] Lese {len(tasks)} neue Fahrt(en) für VO₂max-Streams ...")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for file_hash, result, error in pool.map(_scan, tasks, chunksize=4):
+                    if error:
+                        print(f"[WARN] Stream-Analyse fehlgeschlagen ({file_hash}): {error}")
+                        continue
+                    efforts[file_hash] = result
+
+        write_json(get_user_cache_path(EFFORTS_CACHE, user=user), efforts)
+
+        weight = get_setting("weight", 70.0, user=user)
+        hr_max = get_setting("hr_max", 190, user=user)
+        hr_rest = get_setting("hr_rest", 60, user=user)
+
+        series = []
+        for row in df.itertuples(index=False):
+            vo2_rel = estimate_vo2max_from_efforts(efforts.get(row.file_hash), weight, hr_max, hr_rest)
+            if vo2_rel is not None:
+                series.append({
+                    "timestamp": pd.Timestamp(row.start_time).isoformat(),
+                    "vo2max": round(vo2_rel * weight, 1),
+                })
+
+        write_json(get_user_cache_write_path(SERIES_CACHE, user=user), series, indent=2)
+        print(f"[OK] Stream-VO₂max für '{user}': {len(series)} Schätzungen ({len(tasks)} neu analysiert).")
+
+    except Exception as e:
+        print(f"[ERROR] Fehler bei Stream-VO₂max für '{user}': {e}")
+        raise
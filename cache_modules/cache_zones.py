@@ -1,63 +1,132 @@
 # === Datei: cache_zone_summaries.py ===
+# Zonen-Zusammenfassungen aus den beim Import gespeicherten Zeilen in 'power_zones'/'hr_zones'.
+# FIT-Dateien werden nur noch gelesen für Aktivitäten ohne Zonenzeilen (z. B. aus der Zeit vor
+# deren Speicherung) und – einmalig – wenn sich FTP oder HF-max seit der letzten Berechnung
+# geändert haben ('zone_basis'). Summen und Detailtabelle stammen aus einer gruppierten Abfrage.
+
+from datetime import datetime
 
-import os
-import sqlite3
 import pandas as pd
-from collections import defaultdict
-from utils.user_paths import get_user_cache_path
-from fit_processing.power_zones import compute_power_zones
-from fit_processing.heart_rate_metrics import compute_hr_zones
-from cache_modules.cache_helpers import get_all_file_names, get_activity_id_from_filename
-from utils.settings_access import DB_PATH  # ⬅️ Neuer Import für DB_PATH
+from utils.user_paths import get_user_cache_write_path, get_user_fit_path
+from utils.cache_io import write_csv, write_table
+from utils.database import read_connection, write_connection
+from fit_processing.power_zones import ZONE_RANGES
+from fit_processing.metric_registry import load_activity_frame
+from fit_processing.activity_metrics import compute_activity_metrics, get_metric_settings
+from fit_processing.activity_writer import replace_zone_rows
+
+# Zonentabelle → Spalte in 'activities', ohne deren Wert der Import keine Zonen schreibt
+ZONE_REFERENCE = {"power_zones": "avg_power", "hr_zones": "avg_heart_rate"}
+
+ZONE_ACTIVITIES_SQL = f"""
+    SELECT a.id, a.file_name, {', '.join(f'a.{ref} IS NOT NULL' for ref in ZONE_REFERENCE.values())}
+    FROM activities a
+    WHERE a.user_id = ? AND a.file_name IS NOT NULL
+"""
+MISSING_ZONE_ROWS_SQL = ZONE_ACTIVITIES_SQL + "  AND ({})".format(" OR ".join(
+    f"({ref} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {table} z WHERE z.activity_id = a.id))"
+    for table, ref in ZONE_REFERENCE.items()
+))
+ZONE_ROWS_SQL = """
+    SELECT 'power' AS kind, activity_id, zone_label, SUM(seconds_in_zone) AS seconds_in_zone
+    FROM power_zones WHERE user_id = ?
+    GROUP BY activity_id, zone_label
+    UNION ALL
+    SELECT 'hr' AS kind, activity_id, zone_label, SUM(seconds_in_zone) AS seconds_in_zone
+    FROM hr_zones WHERE user_id = ?
+    GROUP BY activity_id, zone_label
+"""
+
+
+def _stale_activities(conn, user: str, basis: tuple) -> list:
+    """
+    Aktivitäten, deren Zonenzeilen (neu) berechnet werden müssen: alle, wenn die gespeicherten
+    Zeilen auf anderen Einstellungen beruhen, sonst nur die ohne Zonenzeilen.
+    """
+    stored = conn.execute("SELECT ftp, hr_max FROM zone_basis WHERE user_id = ?", (user,)).fetchone()
+    refresh_all = stored is None or tuple(stored) != basis
+    rows = conn.execute(ZONE_ACTIVITIES_SQL if refresh_all else MISSING_ZONE_ROWS_SQL, (user,)).fetchall()
+    return [(activity_id, file_name, dict(zip(ZONE_REFERENCE, flags))) for activity_id, file_name, *flags in rows]
+
+
+def refresh_zone_rows(user: str) -> int:
+    """
+    Berechnet fehlende bzw. veraltete Zonenzeilen aus den FIT-Dateien (ein Parse je Aktivität
+    für beide Zonenarten) und hält die zugrunde liegenden Einstellungen in 'zone_basis' fest.
+
+    Returns:
+        Anzahl neu berechneter Aktivitäten
+    """
+    settings = get_metric_settings(user)
+    basis = (float(settings["ftp"]), float(settings["hr_max"]))
+    with read_connection() as conn:
+        stale = _stale_activities(conn, user, basis)
+
+    zones_by_activity, failed = {}, {}
+    for activity_id, file_name, has_reference in stale:
+        tables = [table for table, present in has_reference.items() if present]
+        if not tables:
+            continue
+        try:
+            _, values = compute_activity_metrics(
+                load_activity_frame(get_user_fit_path(file_name, user)), settings, names=tables
+            )
+            zones_by_activity[activity_id] = {table: values.get(table) or {} for table in tables}
+        except Exception as e:
+            print(f"[WARN] Fehler bei Zonen ({user} – {file_name}): {e}")
+            # Zeilen verwerfen: sie beruhen ggf. auf alten Einstellungen und würden sonst mit der
+            # neuen Basis als aktuell gelten – ohne Zeilen greift beim nächsten Lauf MISSING_ZONE_ROWS_SQL
+            failed[activity_id] = {table: {} for table in tables}
+
+    # Eine Transaktion: Zonenzeilen und die Basis, auf der sie beruhen, ändern sich gemeinsam
+    with write_connection() as conn:
+        replace_zone_rows(user, {**zones_by_activity, **failed})
+        conn.execute("""
+            INSERT INTO zone_basis (user_id, ftp, hr_max, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                ftp = excluded.ftp, hr_max = excluded.hr_max, updated_at = excluded.updated_at
+        """, (user, *basis, datetime.now().isoformat(timespec="seconds")))
+
+    if stale:
+        print(f"[INFO] Zonenzeilen für '{user}' neu berechnet: {len(zones_by_activity)}/{len(stale)} Aktivitäten.")
+    if failed:
+        print(f"[WARN] {len(failed)} Aktivitäten ohne Zonenzeilen – werden beim nächsten Lauf erneut gelesen.")
+    return len(zones_by_activity)
+
+
+def load_zone_rows(user: str) -> pd.DataFrame:
+    """Zonenzeit je Aktivität und Zone für Leistung und HF – eine gruppierte Abfrage."""
+    with read_connection() as conn:
+        return pd.read_sql_query(ZONE_ROWS_SQL, conn, params=(user, user))
+
 
 def save_zone_summaries(user: str):
     try:
         print(f"[DEBUG] Starte Zonen-Zusammenfassungen für: '{user}'")
-        filenames = get_all_file_names(user)
-        pzones_total = defaultdict(int)
-        hzones_total = defaultdict(int)
-        pzones_detailed = []
-
-        fit_dir = os.path.join(os.path.dirname(DB_PATH), "fit_samples")  # Benutzer-FIT-Verzeichnis
-
-        for fname in filenames:
-            path = os.path.join(fit_dir, user, fname)
-            activity_id = get_activity_id_from_filename(fname, user_id=user)
-
-            try:
-                # ✅ Benutzer mitgeben
-                pz = compute_power_zones(path, user=user)
-                if isinstance(pz, dict):
-                    for label, sec in pz.items():
-                        pzones_total[label] += sec
-                        pzones_detailed.append({
-                            "activity_id": activity_id,
-                            "zone_label": label,
-                            "seconds_in_zone": sec,
-                            "user_id": user
-                        })
-            except Exception as e:
-                print(f"[WARN] Fehler bei Powerzonen ({user} – {fname}): {e}")
-
-            try:
-                # ✅ Benutzer mitgeben
-                hz = compute_hr_zones(path, user=user)
-                if isinstance(hz, dict):
-                    for label, sec in hz.items():
-                        hzones_total[label] += sec
-            except Exception as e:
-                print(f"[WARN] Fehler bei HF-Zonen ({user} – {fname}): {e}")
-
-        df_power_summary = pd.DataFrame(pzones_total.items(), columns=["zone", "seconds"])
-        df_power_detailed = pd.DataFrame(pzones_detailed)
-        df_hr_summary = pd.DataFrame(hzones_total.items(), columns=["zone", "seconds"])
+        refresh_zone_rows(user)
+        zones = load_zone_rows(user)
+
+        power = zones[zones["kind"] == "power"]
+        hr = zones[zones["kind"] == "hr"]
+
+        df_power_summary = (
+            power.groupby("zone_label")["seconds_in_zone"].sum()
+            .reindex(list(ZONE_RANGES), fill_value=0)
+            .rename_axis("zone").reset_index(name="seconds")
+        )
+        df_hr_summary = (
+            hr.groupby("zone_label")["seconds_in_zone"].sum()
+            .rename_axis("zone").reset_index(name="seconds")
+        )
+        df_power_detailed = power.drop(columns="kind").assign(user_id=user).reset_index(drop=True)
         df_power_summary["user_id"] = user
         df_hr_summary["user_id"] = user
 
-        df_power_summary.to_csv(get_user_cache_path("power_zones_summary.csv", user), index=False)
-        df_power_detailed.to_csv(get_user_cache_path("power_zones_detailed.csv", user), index=False)
-        df_hr_summary.to_csv(get_user_cache_path("hr_zones_summary.csv", user), index=False)
+        write_csv(df_power_summary, get_user_cache_write_path("power_zones_summary.csv", user), index=False)
+        write_table(df_power_detailed, get_user_cache_write_path("power_zones_detailed.npz", user))
+        write_csv(df_hr_summary, get_user_cache_write_path("hr_zones_summary.csv", user), index=False)
 
         print(f"[OK] Zonen-Zusammenfassungen gespeichert für '{user}'.")
     except Exception as e:
-        print(f"[ERROR] Fehler bei Zonen-Zusammenfassungen für '{user}': {e}")
\ No newline at end of file
+        print(f"[ERROR] Fehler bei Zonen-Zusammenfassungen für '{user}': {e}")
+        raise
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+
+from utils.settings_access import get_setting
+from fit_processing.metric_registry import (
+    register_metric, compute_metrics, collect_columns, metric_columns
+)
+from fit_processing.power_metrics_complete import calculate_tss, calculate_if, calculate_ef
+from fit_processing.power_zones import ZONE_RANGES
+from fit_processing.heart_rate_metrics import compute_hr_metrics
+from fit_processing.efficiency_metrics import compute_efficiency_metrics
+
+MIN_DURATION = 60        # Sekunden
+MAX_DURATION = 8 * 3600  # 8 Stunden
+
+BEST_POWER_WINDOWS = {
+    "max_1min_power": 60,
+    "max_3min_power": 180,
+    "max_5min_power": 300,
+    "max_10min_power": 600,
+    "max_20min_power": 1200,
+    "max_30min_power": 1800,
+}
+
+
+def _window_means(csum: np.ndarray, window: int) -> np.ndarray:
+    return (csum[window:] - csum[:-window]) / window
+
+
+# === Zwischenergebnisse (ohne Spalten) ===
+
+@register_metric("moving_seconds", inputs=("timestamp",))
+def _moving_seconds(ctx):
+    """Bewegungszeit (1 Hz, Geschwindigkeit > 0.5 m/s) bzw. Zeitspanne ohne Geschwindigkeitsdaten."""
+    df = ctx["df"]
+    if "speed" in df.columns:
+        return int((df["speed"].fillna(0) > 0.5).sum())
+    return int((df["timestamp"].iloc[-1] - df["timestamp"].iloc[0]).total_seconds())
+
+
+@register_metric("power_stream", inputs=("power",))
+def _power_stream(ctx):
+    values = ctx["df"]["power"].dropna().astype(float).to_numpy()
+    return values if values.size else None
+
+
+@register_metric("power_prefix_sum", depends=("power_stream",))
+def _power_prefix_sum(ctx, power):
+    return np.concatenate([[0.0], np.cumsum(power)])
+
+
+@register_metric("hr_stream", inputs=("heart_rate",))
+def _hr_stream(ctx):
+    values = ctx["df"]["heart_rate"].dropna().astype(int).to_numpy()
+    return values if values.size else None
+
+
+@register_metric("aligned_power_hr", inputs=("power", "heart_rate"))
+def _aligned_power_hr(ctx):
+    df = ctx["df"]
+    return df["power"].to_numpy(dtype=float), df["heart_rate"].to_numpy(dtype=float)
+
+
+# === Metriken (Spalten der Tabelle 'activities') ===
+
+@register_metric("core", inputs=("timestamp",), columns=("start_time", "distance"), types={"start_time": "TEXT"})
+def _core(ctx):
+    df = ctx["df"]
+    distance = df["distance"].dropna().max() if "distance" in df.columns else None
+    return {
+        "start_time": df["timestamp"].iloc[0].isoformat(),
+        "distance": round(distance / 1000, 2) if distance else None,  # in km
+    }
+
+
+@register_metric("duration", depends=("moving_seconds",), columns=("duration",))
+def _duration(ctx, moving_seconds):
+    if moving_seconds < MIN_DURATION or moving_seconds > MAX_DURATION:
+        print(f"⚠️ Warnung: Ungültige Dauer ({moving_seconds}) – setze auf None")
+        return {"duration": None}
+    return {"duration": moving_seconds}
+
+
+@register_metric("hr", depends=("hr_stream",), columns=("avg_heart_rate", "trimp", "hr_tss"))
+def _hr(ctx, hr):
+    settings = ctx["settings"]
+    metrics = compute_hr_metrics(hr, settings["hr_max"], settings["hr_rest"])
+    return {"avg_heart_rate": round(float(hr.mean()), 2), **metrics}
+
+
+# Coggan A. R. & Allen H. (2010): NP = (Ø (30-s-Mittel)^4)^(1/4)
+@register_metric(
+    "power",
+    depends=("power_stream", "power_prefix_sum", "moving_seconds"),
+    columns=("avg_power", "normalized_power", "tss", "intensity_factor", *BEST_POWER_WINDOWS),
+)
+def _power(ctx, power, csum, moving_seconds):
+    ftp = ctx["settings"]["ftp"]
+    n = len(power)
+
+    np_val = None
+    if n >= 180:
+        np_val = round(float(np.mean(_window_means(csum, 30) ** 4) ** 0.25), 2)
+
+    tss = calculate_tss(np_val, moving_seconds, ftp=ftp)
+    intensity = calculate_if(np_val, ftp=ftp)
+    # Fallback für unrealistische TSS/IF-Werte
+    if tss and tss > 500:
+        tss = None
+    if intensity and intensity > 1.4:
+        intensity = None
+
+    return {
+        "avg_power": round(float(power.mean()), 2),
+        "normalized_power": np_val,
+        "tss": tss,
+        "intensity_factor": intensity,
+        **{
+            key: round(float(_window_means(csum, w).max()), 2) if n >= w else None
+            for key, w in BEST_POWER_WINDOWS.items()
+        },
+    }
+
+
+@register_metric("efficiency_factor", depends=("power", "hr"), columns=("efficiency_factor",))
+def _efficiency_factor(ctx, power, hr):
+    return {"efficiency_factor": calculate_ef(power["normalized_power"], hr["avg_heart_rate"])}
+
+
+@register_metric(
+    "decoupling",
+    depends=("power", "aligned_power_hr"),
+    columns=("ef_first_half", "ef_second_half", "decoupling", "ef_stream"),
+    types={"ef_stream": "BLOB"},
+)
+def _decoupling(ctx, power, aligned):
+    return compute_efficiency_metrics(*aligned)
+
+
+# Mittel der besten 3-, 5- und 20-Minuten-Leistung als CP-Näherung je Aktivität
+@register_metric("critical_power", depends=("power_stream", "power_prefix_sum"), columns=("critical_power",))
+def _critical_power(ctx, power, csum):
+    valid = power[power >= 0]
+    if len(valid) < 600:
+        return {"critical_power": None}
+    csum = csum if len(valid) == len(power) else np.concatenate([[0.0], np.cumsum(valid)])
+    estimates = [_window_means(csum, d).max() for d in (180, 300, 1200) if len(valid) >= d]
+    return {"critical_power": round(float(np.mean(estimates)), 1)}
+
+
+# === Zonen (eigene Tabellen, keine Spalten in 'activities') ===
+
+@register_metric("power_zones", depends=("power_stream",))
+def _power_zones(ctx, power):
+    ftp = ctx["settings"]["ftp"]
+    edges = [low * ftp for low, _ in ZONE_RANGES.values()] + [list(ZONE_RANGES.values())[-1][1] * ftp]
+    counts = np.bincount(np.digitize(power, edges), minlength=len(edges) + 1)
+    return {label: int(counts[i + 1]) for i, label in enumerate(ZONE_RANGES)}
+
+
+@register_metric("hr_zones", depends=("hr",))
+def _hr_zones(ctx, hr):
+    return hr.get("zones") or {}
+
+
+ACTIVITY_METRIC_COLUMNS = metric_columns()
+
+
+def get_metric_settings(user: str) -> dict:
+    """Benutzerparameter, auf die sich die Metriken beziehen."""
+    return {
+        "ftp": get_setting("ftp", 250, user=user),
+        "weight": get_setting("weight", 70, user=user),
+        "hr_max": get_setting("hr_max", 190, user=user),
+        "hr_rest": get_setting("hr_rest", 60, user=user),
+    }
+
+
+def compute_activity_metrics(df: pd.DataFrame, settings: dict, names=None):
+    """
+    Berechnet alle (oder ausgewählte) registrierten Metriken einer Aktivität.
+
+    Returns:
+        (columns, values) – Spaltenwerte für 'activities' und alle Knotenwerte (inkl. Zonen)
+    """
+    values = compute_metrics(df, settings, names)
+    return collect_columns(values, names), values
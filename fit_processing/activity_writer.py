@@ -0,0 +1,125 @@
+# === Datei: activity_writer.py ===
+# Gebündeltes Schreiben importierter Aktivitäten. Statt je Datei eine Transaktion mit einem
+# INSERT pro Zonenzeile zu öffnen, sammelt der Import die Einträge und schreibt sie blockweise:
+# je Block eine Transaktion mit einem executemany() für 'activities' und einem je Zonentabelle.
+# 1 000 Dateien ergeben so eine Handvoll Anweisungen je Block statt Dateien × Zonen.
+#
+# Eintrag = {"row": {Spalte: Wert, ...}, "zones": {"power_zones": {Label: Sekunden}, ...}}
+# Die Zonenzeilen finden ihre activity_id über den eindeutigen Index (user_id, file_hash).
+#
+# Zonenzeilen hängen von FTP und HF-max ab. 'zone_basis' hält je Benutzer die Werte, mit denen
+# alle gespeicherten Zeilen berechnet wurden (gepflegt von cache_zones). Schreibt der Import
+# mit abweichenden Werten, wird der Eintrag verworfen und die Zonen werden neu berechnet.
+
+from itertools import groupby
+
+from utils.database import read_connection, write_connection
+
+BATCH_SIZE = 200
+ZONE_TABLES = ("power_zones", "hr_zones")
+
+EXISTING_HASHES_SQL = "SELECT file_hash FROM activities WHERE user_id = ? AND file_hash IS NOT NULL"
+# {table}: eine der ZONE_TABLES
+ZONE_INSERT_SQL = """
+    INSERT INTO {table} (activity_id, zone_label, seconds_in_zone, user_id)
+    SELECT id, ?, ?, user_id FROM activities WHERE user_id = ? AND file_hash = ?
+"""
+ZONE_DELETE_SQL = "DELETE FROM {table} WHERE activity_id = ?"
+
+
+def existing_hashes(user: str) -> set:
+    """Alle file_hashes eines Benutzers – eine Abfrage statt einer Duplikatprüfung je Datei."""
+    with read_connection() as conn:
+        rows = conn.execute(EXISTING_HASHES_SQL, (user,)).fetchall()
+    return {h for (h,) in rows}
+
+
+def _insert(conn, entries: list, user: str):
+    # Gleiche Spaltenmenge → ein executemany (beim Import haben alle Zeilen dieselben Spalten)
+    def columns_of(entry):
+        return tuple(entry["row"])
+
+    for columns, group in groupby(sorted(entries, key=columns_of), key=columns_of):
+        conn.executemany(
+            f"INSERT INTO activities ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [tuple(e["row"][c] for c in columns) for e in group]
+        )
+
+    for table in ZONE_TABLES:
+        rows = [
+            (label, seconds, user, e["row"]["file_hash"])
+            for e in entries
+            for label, seconds in (e["zones"].get(table) or {}).items()
+            if seconds > 0
+        ]
+        if rows:
+            conn.executemany(ZONE_INSERT_SQL.format(table=table), rows)
+
+
+def _invalidate_zone_basis(conn, user: str, zone_basis):
+    ftp, hr_max = zone_basis
+    conn.execute(
+        "DELETE FROM zone_basis WHERE user_id = ? AND (ftp IS NOT ? OR hr_max IS NOT ?)",
+        (user, ftp, hr_max)
+    )
+
+
+def write_activities(entries: list, user: str, zone_basis=None) -> dict:
+    """
+    Schreibt Aktivitäten samt Zonenzeilen in Blöcken von BATCH_SIZE, je Block eine Transaktion.
+    Scheitert ein Block (z. B. weil ein anderer Prozess dieselbe Datei gerade importiert hat),
+    wird er Eintrag für Eintrag wiederholt, damit nur die fehlerhaften Dateien verloren gehen.
+
+    Args:
+        zone_basis: (FTP, HF-max), mit denen die Zonen der Einträge berechnet wurden
+
+    Returns:
+        Dict file_hash → Fehlermeldung der nicht geschriebenen Einträge
+    """
+    failed = {}
+    for start in range(0, len(entries), BATCH_SIZE):
+        batch = entries[start:start + BATCH_SIZE]
+        try:
+            with write_connection() as conn:
+                _insert(conn, batch, user)
+                if zone_basis is not None:
+                    _invalidate_zone_basis(conn, user, zone_basis)
+        except Exception as e:
+            print(f"[WARN] Block mit {len(batch)} Aktivitäten fehlgeschlagen ({e}) – schreibe einzeln.")
+            for entry in batch:
+                try:
+                    with write_connection() as conn:
+                        _insert(conn, [entry], user)
+                        if zone_basis is not None:
+                            _invalidate_zone_basis(conn, user, zone_basis)
+                except Exception as e:
+                    failed[entry["row"]["file_hash"]] = str(e)
+    return failed
+
+
+def replace_zone_rows(user: str, zones_by_activity: dict):
+    """
+    Ersetzt die Zonenzeilen der angegebenen Aktivitäten, blockweise mit executemany().
+
+    Args:
+        zones_by_activity: activity_id → {"power_zones": {Label: Sekunden}, "hr_zones": {...}};
+            eine fehlende Tabelle bleibt für diese Aktivität unverändert
+    """
+    items = list(zones_by_activity.items())
+    for start in range(0, len(items), BATCH_SIZE):
+        batch = items[start:start + BATCH_SIZE]
+        with write_connection() as conn:
+            for table in ZONE_TABLES:
+                ids = [(activity_id,) for activity_id, zones in batch if table in zones]
+                if not ids:
+                    continue
+                conn.executemany(ZONE_DELETE_SQL.format(table=table), ids)
+                conn.executemany(
+                    f"INSERT INTO {table} (activity_id, zone_label, seconds_in_zone, user_id) VALUES (?, ?, ?, ?)",
+                    [
+                        (activity_id, label, seconds, user)
+                        for activity_id, zones in batch if table in zones
+                        for label, seconds in zones[table].items()
+                        if seconds > 0
+                    ]
+                )
@@ -0,0 +1,198 @@
+# === Datei: backfill.py ===
+# Nachberechnung einer einzelnen registrierten Metrik für bereits importierte Aktivitäten.
+# Verarbeitet nur Aktivitäten, bei denen eine Spalte der Metrik leer ist, parallel in
+# Worker-Prozessen, mit Commits in Batches. Ein Checkpoint je Benutzer und Metrik merkt sich
+# Aktivitäten, die keinen Wert liefern, nur einen Teil der Spalten füllen ('partial') oder
+# fehlschlagen, sodass ein Neustart nur Offenes bearbeitet.
+#
+#   python -m fit_processing.backfill <metrik> [benutzer ...] [--workers N] [--batch-size N] [--retry]
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.auth import get_all_users
+from utils.user_paths import get_user_fit_path, get_user_cache_path
+from utils.cache_io import write_json
+from fit_processing.metric_registry import METRICS, load_activity_frame
+from fit_processing.activity_metrics import compute_activity_metrics, get_metric_settings
+from fit_processing.metrics_calc_new import update_training_load_table
+from utils.db_migrations import run_migrations
+from utils.database import read_connection, write_connection
+
+BATCH_SIZE = 200
+# Spalten, die in die Trainingsbelastung eingehen – nach deren Backfill wird training_load aktualisiert
+LOAD_COLUMNS = {"tss", "trimp", "hr_tss", "avg_power", "duration"}
+
+
+def _compute(task):
+    """Worker: liest die FIT-Datei einer Aktivität und berechnet nur die angeforderte Metrik."""
+    activity_id, path, name, settings = task
+    try:
+        row, _ = compute_activity_metrics(load_activity_frame(path), settings, names=[name])
+        return activity_id, row, None
+    except Exception as e:
+        return activity_id, None, str(e)
+
+
+def _checkpoint_path(name: str, user: str) -> str:
+    return get_user_cache_path(f"backfill_{name}.json", user=user)
+
+
+def _empty_checkpoint() -> dict:
+    return {"skipped": [], "partial": [], "failed": {}}
+
+
+def _load_checkpoint(name: str, user: str) -> dict:
+    path = _checkpoint_path(name, user)
+    if not os.path.exists(path):
+        return _empty_checkpoint()
+    try:
+        with open(path, "r") as f:
+            checkpoint = json.load(f)
+    except Exception:
+        return _empty_checkpoint()
+    # Checkpoints älterer Versionen kennen 'partial' noch nicht
+    return {**_empty_checkpoint(), **checkpoint}
+
+
+def _save_checkpoint(name: str, user: str, checkpoint: dict):
+    write_json(_checkpoint_path(name, user), checkpoint, indent=2)
+
+
+def pending_activities_sql(columns) -> str:
+    """Aktivitäten eines Benutzers, bei denen mindestens eine der Spalten leer ist."""
+    return f"""
+        SELECT id, file_name
+        FROM activities
+        WHERE user_id = ?
+          AND file_name IS NOT NULL
+          AND ({' OR '.join(f'{c} IS NULL' for c in columns)})
+        ORDER BY start_time
+    """
+
+
+def _pending_activities(conn, user: str, columns, exclude: set) -> list:
+    rows = conn.execute(pending_activities_sql(columns), (user,)).fetchall()
+    return [(activity_id, file_name) for activity_id, file_name in rows if activity_id not in exclude]
+
+
+def _write_batch(columns, updates: list):
+    """Füllt nur leere Spalten (COALESCE), bereits vorhandene Werte bleiben unverändert."""
+    with write_connection() as conn:
+        conn.executemany(
+            f"UPDATE activities SET {', '.join(f'{c} = COALESCE({c}, ?)' for c in columns)} WHERE id = ?",
+            updates
+        )
+
+
+def backfill_metric(name: str, user: str, workers: int = None, batch_size: int = BATCH_SIZE,
+                    retry: bool = False) -> dict:
+    """
+    Berechnet die Metrik `name` für alle Aktivitäten eines Benutzers mit leeren Spalten nach.
+
+    Args:
+        workers: Anzahl Worker-Prozesse (1 = im aktuellen Prozess)
+        batch_size: Anzahl Aktivitäten pro Commit
+        retry: Aktivitäten aus dem Checkpoint (ohne Wert / teilweise / fehlgeschlagen) erneut versuchen
+
+    Returns:
+        Dict mit pending, updated, skipped, failed und Durchsatz (Aktivitäten/s)
+    """
+    spec = METRICS.get(name)
+    if spec is None or not spec["columns"]:
+        raise ValueError(f"Metrik '{name}' ist nicht registriert oder hat keine Spalten.")
+    columns = spec["columns"]
+
+    checkpoint = _empty_checkpoint() if retry else _load_checkpoint(name, user)
+    exclude = set(checkpoint["skipped"]) | set(checkpoint["partial"]) | {int(i) for i in checkpoint["failed"]}
+
+    with read_connection() as conn:
+        pending = _pending_activities(conn, user, columns, exclude)
+
+    settings = get_metric_settings(user)
+    tasks = []
+    for activity_id, file_name in pending:
+        path = get_user_fit_path(file_name, user)
+        if os.path.exists(path):
+            tasks.append((activity_id, path, name, settings))
+        else:
+            checkpoint["failed"][str(activity_id)] = "FIT-Datei nicht gefunden"
+
+    stats = {"pending": len(tasks), "updated": 0, "skipped": 0, "failed": 0, "per_second": 0.0}
+    if not tasks:
+        _save_checkpoint(name, user, checkpoint)
+        print(f"[OK] Keine offenen Werte für Metrik '{name}' bei '{user}'.")
+        return stats
+
+    print(f"[INFO] Backfill '{name}' für '{user}': {len(tasks)} Aktivitäten ...")
+    t0 = time.perf_counter()
+    updates = []
+
+    def flush():
+        if updates:
+            _write_batch(columns, updates)
+            updates.clear()
+        _save_checkpoint(name, user, checkpoint)
+
+    if workers == 1:
+        results = map(_compute, tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_compute, tasks, chunksize=4)
+
+    try:
+        for done, (activity_id, row, error) in enumerate(results, start=1):
+            if error:
+                checkpoint["failed"][str(activity_id)] = error
+                stats["failed"] += 1
+            elif row and any(row.get(c) is not None for c in columns):
+                updates.append(tuple(row.get(c) for c in columns) + (activity_id,))
+                stats["updated"] += 1
+                if any(row.get(c) is None for c in columns):
+                    # Teilergebnis: restliche Spalten bleiben leer und wären sonst dauerhaft offen
+                    checkpoint["partial"].append(activity_id)
+            else:
+                checkpoint["skipped"].append(activity_id)
+                stats["skipped"] += 1
+
+            if done % batch_size == 0:
+                flush()
+                rate = done / (time.perf_counter() - t0)
+                print(f"[INFO] {done}/{len(tasks)} verarbeitet ({rate:.1f} Aktivitäten/s)")
+    finally:
+        # Auch bei Abbruch die bisherigen Ergebnisse sichern → Neustart setzt hier fort
+        flush()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - t0
+    stats["per_second"] = round(len(tasks) / elapsed, 1) if elapsed > 0 else 0.0
+    print(
+        f"[OK] Backfill '{name}' für '{user}': {stats['updated']} aktualisiert, "
+        f"{stats['skipped']} ohne Wert, {stats['failed']} fehlgeschlagen "
+        f"in {elapsed:.1f} s ({stats['per_second']} Aktivitäten/s)"
+    )
+
+    if stats["updated"] and LOAD_COLUMNS.intersection(columns):
+        update_training_load_table(user=user)
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eine registrierte Metrik für bestehende Aktivitäten nachberechnen.")
+    parser.add_argument("metric", choices=sorted(n for n, s in METRICS.items() if s["columns"]),
+                        help="Name der Metrik")
+    parser.add_argument("users", nargs="*", help="Benutzer (Standard: alle)")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Worker-Prozesse")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Aktivitäten pro Commit")
+    parser.add_argument("--retry", action="store_true", help="Übersprungene/teilweise/fehlgeschlagene erneut versuchen")
+    args = parser.parse_args()
+
+    run_migrations()
+    for u in args.users or get_all_users():
+        backfill_metric(args.metric, u, workers=args.workers, batch_size=args.batch_size, retry=args.retry)
@@ -1,20 +1,34 @@
 import os
+import time
 import pandas as pd
-import sqlite3
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 from utils.auth import get_all_users
-from utils.user_paths import get_current_user  # Fallback in der App
-from utils.settings_access import DB_PATH
+from utils.user_paths import (  # get_current_user: Fallback in der App
+    get_current_user, begin_user_cache_generation, commit_user_cache_generation,
+    user_cache_generation_lock, writing_user_cache_generation,
+    restore_user_cache_artifacts, discard_user_cache_generation
+)
+from fit_processing.metrics_calc_new import update_training_load_table
 
 from cache_modules.cache_training_load import save_training_load
 from cache_modules.cache_power_curve import save_power_curve
 from cache_modules.cache_critical_power import save_critical_power_per_activity, save_critical_power
 from cache_modules.cache_vo2max import save_vo2max_peak_estimates_multistage
+from cache_modules.cache_vo2max_streams import save_vo2max_stream_estimates
 from cache_modules.cache_efficiency import save_efficiency_factors
 from cache_modules.cache_zones import save_zone_summaries
 from cache_modules.cache_export import save_activities_export
 from cache_modules.cache_best_values import save_best_power_values, save_power_bests_time_series
-from cache_modules.cache_helpers import get_changed_files, migrate_add_critical_power_column
+from cache_modules.cache_helpers import get_changed_files
+from utils.db_migrations import run_migrations
+from cache_modules.cache_planner import MODULE_SPECS, affected_modules, dependency_levels, make_change_set, topological_order
+from cache_modules.cache_manifest import is_up_to_date, module_inputs, record_module_run
+from utils.artifact_cache import invalidate_user
+from utils.database import read_connection, write_connection
+
+LAST_ACTIVITY_SQL = "SELECT user_id, MAX(start_time) FROM activities GROUP BY user_id"
 
 # === Mapping: Modulname → user-fähige Funktion ===
 MODULES = {
@@ -23,6 +37,7 @@ MODULES = {
     "cp_per_activity": lambda user: save_critical_power_per_activity(user=user),
     "cp_model": lambda user: save_critical_power(user=user),
     "vo2max": lambda user: save_vo2max_peak_estimates_multistage(user=user),
+    "vo2max_streams": lambda user: save_vo2max_stream_estimates(user=user),
     "efficiency": lambda user: save_efficiency_factors(user=user),
     "zones": lambda user: save_zone_summaries(user=user),
     "export": lambda user: save_activities_export(user=user),
@@ -30,12 +45,106 @@ MODULES = {
     "power_time_series": lambda user: save_power_bests_time_series(user=user),
 }
 
+def _run_module(key: str, user: str, generation: str):
+    """
+    Führt ein Cache-Modul aus (auch in Worker-Prozessen, daher über den Namen statt Lambda)
+    und liefert (Modul, Laufzeit in s, Fehlermeldung oder None). Die save_*-Funktionen geben
+    Fehler nach ihrer Meldung weiter, nur fehlerfreie Läufe landen im Manifest.
+    Die Ziel-Generation wird explizit übergeben, da Worker den Kontext des Aufrufers nicht erben.
+    """
+    t0 = time.perf_counter()
+    try:
+        with writing_user_cache_generation(user, generation):
+            MODULES[key](user=user)
+        return key, time.perf_counter() - t0, None
+    except Exception as e:
+        return key, time.perf_counter() - t0, str(e)
+
+def run_modules_parallel(user: str, plan: list[str], selective: bool = True, max_workers: int = None) -> dict:
+    """
+    Führt die geplanten Module stufenweise aus: Module einer Abhängigkeitsstufe laufen parallel,
+    SQL-/I/O-gebundene im Thread-Pool, CPU-gebundene (FIT-Parsing) im Prozess-Pool.
+    Fehler eines Moduls beeinflussen die übrigen nicht.
+    Alle Artefakte landen in einer neuen Cache-Generation, die erst nach dem letzten Modul
+    veröffentlicht wird – Leser sehen nie einen halb aktualisierten Cache. Ausgaben fehlgeschlagener
+    Module werden vor der Veröffentlichung auf den vorherigen Stand zurückgesetzt; bricht der Lauf
+    selbst ab (Ausnahme, KeyboardInterrupt), wird die Generation verworfen. Gleichzeitige
+    Rebuilds desselben Benutzers warten auf die Sperre, bis die vorige Generation veröffentlicht ist.
+
+    Returns:
+        Dict Modul → {"seconds": Laufzeit, "error": Fehlermeldung oder None, "skipped": bool}
+    """
+    report = {}
+    t_total = time.perf_counter()
+    generation = None
+    inputs, succeeded = {}, []
+
+    with ExitStack() as lock:
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as threads, \
+                 ProcessPoolExecutor(max_workers=max_workers) as processes:
+                for level in dependency_levels(plan):
+                    futures = {}
+                    for key in level:
+                        if selective and is_up_to_date(user, key):
+                            print(f"[SKIP] {key} – Eingaben unverändert.")
+                            report[key] = {"seconds": 0.0, "error": None, "skipped": True}
+                            continue
+                        if generation is None:
+                            lock.enter_context(user_cache_generation_lock(user))
+                            generation = begin_user_cache_generation(user)
+                        pool = processes if MODULE_SPECS[key]["executor"] == "process" else threads
+                        print(f"[MODUL] {key} ...")
+                        inputs[key] = module_inputs(user, key)
+                        futures[pool.submit(_run_module, key, user, generation)] = key
+
+                    for future in as_completed(futures):
+                        key = futures[future]
+                        try:
+                            _, seconds, error = future.result()
+                        except Exception as e:
+                            seconds, error = 0.0, f"Worker abgebrochen: {e}"
+                        report[key] = {"seconds": round(seconds, 2), "error": error, "skipped": False}
+                        if error:
+                            print(f"[ERROR] Modul '{key}' für Nutzer '{user}' fehlgeschlagen: {error}")
+                        else:
+                            succeeded.append((key, seconds))
+                            print(f"[OK] {key} in {seconds:.2f} s")
+        except BaseException:
+            # Abbruch des Laufs: nichts veröffentlichen, nichts ins Manifest eintragen
+            if generation is not None:
+                discard_user_cache_generation(user, generation)
+                print(f"[ERROR] Cache-Aufbau für '{user}' abgebrochen – Generation verworfen.")
+            raise
+
+        if generation is not None:
+            # Fehlgeschlagene Module können einen Teil ihrer Ausgaben geschrieben haben:
+            # diese vor der Veröffentlichung auf den Stand der vorherigen Generation zurücksetzen
+            for key, entry in report.items():
+                if entry["error"]:
+                    restore_user_cache_artifacts(user, generation, MODULE_SPECS[key]["outputs"]["artifacts"])
+            commit_user_cache_generation(user, generation)
+            invalidate_user(user, keep_generation=generation)
+            # Erst nach der Veröffentlichung: das Manifest beschreibt die aktuelle Generation
+            for key, seconds in succeeded:
+                record_module_run(user, key, seconds, inputs=inputs[key])
+
+    ran = {k: v for k, v in report.items() if not v["skipped"]}
+    failed = [k for k, v in ran.items() if v["error"]]
+    print(
+        f"[INFO] Cache für '{user}': {len(ran)} Module in {time.perf_counter() - t_total:.2f} s "
+        f"(Summe Einzelzeiten {sum(v['seconds'] for v in ran.values()):.2f} s), "
+        f"{len(report) - len(ran)} übersprungen, {len(failed)} fehlgeschlagen"
+        + (f": {', '.join(failed)}" if failed else "")
+    )
+    return report
+
 def remove_duplicate_activities(user):
     """
     Entfernt doppelte FIT-Dateien (gleiche Hashes) sowie Einträge ohne gültigen Benutzer.
     """
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with write_connection() as conn:
             df = pd.read_sql_query("""
                 SELECT id, start_time, file_name, file_size, file_hash
                 FROM activities
@@ -43,6 +152,7 @@ def remove_duplicate_activities(user):
             """, conn, params=(user,))
 
             before = len(df)
+            removed_since = None
             df["key"] = df["file_hash"]
             keep_ids = df.drop_duplicates("key", keep="first")["id"]
             drop_ids = df.loc[~df["id"].isin(keep_ids), "id"]
@@ -52,8 +162,8 @@ def remove_duplicate_activities(user):
                 cursor.execute(f"DELETE FROM power_zones WHERE activity_id IN ({','.join('?' for _ in drop_ids)})", drop_ids.tolist())
                 cursor.execute(f"DELETE FROM hr_zones WHERE activity_id IN ({','.join('?' for _ in drop_ids)})", drop_ids.tolist())
                 cursor.execute(f"DELETE FROM activities WHERE id IN ({','.join('?' for _ in drop_ids)})", drop_ids.tolist())
-                conn.commit()
                 print(f"🧹 {len(drop_ids)} doppelte Aktivitäten für '{user}' entfernt.")
+                removed_since = pd.to_datetime(df.loc[df["id"].isin(drop_ids), "start_time"], errors="coerce").min()
             else:
                 print(f"✅ Keine Duplikate für '{user}' gefunden.")
 
@@ -63,16 +173,27 @@ def remove_duplicate_activities(user):
             cursor.execute("DELETE FROM power_zones WHERE user_id IS NULL OR TRIM(user_id) = ''")
             cursor.execute("DELETE FROM hr_zones WHERE user_id IS NULL OR TRIM(user_id) = ''")
             cursor.execute("DELETE FROM training_load WHERE user_id IS NULL OR TRIM(user_id) = ''")
-            conn.commit()
             print("🧹 Ungültige Benutzer-Einträge entfernt.")
 
+        if removed_since is not None and pd.notna(removed_since):
+            update_training_load_table(user=user, since=removed_since)
+
     except Exception as e:
         print(f"[ERROR] Fehler beim Entfernen von Duplikaten für '{user}': {e}")
 
-def build_and_save_cache(user: str = None, modules: list[str] = None, selective: bool = True):
+def build_and_save_cache(user: str = None, modules: list[str] = None, selective: bool = True,
+                         change_set: dict = None, max_workers: int = None) -> dict:
     """
     Baut alle oder ausgewählte Cache-Komponenten für einen oder mehrere Nutzer neu auf.
+
+    Mit `change_set` (siehe `make_change_set`) laufen nur die davon betroffenen Module in
+    Abhängigkeitsreihenfolge. Bei `selective=True` werden zusätzlich Module übersprungen,
+    deren Eingaben sich seit ihrem letzten Lauf nicht geändert haben.
+
+    Returns:
+        Dict Benutzer → Modulbericht (siehe `run_modules_parallel`)
     """
+    reports = {}
     if user is None:
         try:
             user = get_current_user()
@@ -90,21 +211,94 @@ def build_and_save_cache(user: str = None, modules: list[str] = None, selective:
 
         remove_duplicate_activities(u)
 
-        if selective:
+        user_changes = change_set
+        if selective and user_changes is None:
             changed = get_changed_files(user_id=u)
-            if not changed:
-                print("[OK] Keine Dateiänderungen erkannt – Cache bleibt bestehen.")
-                continue
-            else:
+            if changed:
                 print(f"[INFO] {len(changed)} Datei(en) geändert – selektiver Cache-Rebuild...")
+                user_changes = make_change_set(new_files=changed)
+
+        plan = affected_modules(user_changes, modules)
+        if not plan:
+            print("[OK] Keine betroffenen Module – Cache bleibt bestehen.")
+            reports[u] = {}
+            continue
 
-        active = modules or list(MODULES.keys())
-        for key in active:
+        reports[u] = run_modules_parallel(u, plan, selective=selective, max_workers=max_workers)
+
+    return reports
+
+def users_by_recent_activity(users: list[str]) -> list[str]:
+    """Sortiert Benutzer nach ihrer letzten Aktivität (neueste zuerst), Benutzer ohne Aktivitäten zuletzt."""
+    try:
+        with read_connection() as conn:
+            last_seen = dict(conn.execute(LAST_ACTIVITY_SQL).fetchall())
+    except Exception as e:
+        print(f"[WARN] Letzte Aktivitäten nicht ermittelbar – alphabetische Reihenfolge: {e}")
+        last_seen = {}
+    active = sorted((u for u in users if last_seen.get(u)), key=lambda u: last_seen[u], reverse=True)
+    return active + sorted(u for u in users if not last_seen.get(u))
+
+def _rebuild_user(user: str, modules: list[str], selective: bool, max_workers: int):
+    """Worker-Prozess: Cache-Aufbau für einen Benutzer, liefert (Benutzer, Dauer, Bericht, Fehler)."""
+    t0 = time.perf_counter()
+    try:
+        report = build_and_save_cache(user=user, modules=modules, selective=selective,
+                                      max_workers=max_workers).get(user, {})
+        return user, time.perf_counter() - t0, report, None
+    except Exception as e:
+        return user, time.perf_counter() - t0, {}, str(e)
+
+def rebuild_all_users(max_users: int = 2, modules: list[str] = None, selective: bool = False) -> dict:
+    """
+    Baut den Cache aller Benutzer parallel in Worker-Prozessen auf – höchstens `max_users`
+    gleichzeitig, zuletzt aktive Benutzer zuerst. Die Modul-Parallelität pro Benutzer wird
+    auf die verbleibenden Kerne begrenzt. Gibt einen Bericht je Benutzer zurück.
+    """
+    users = users_by_recent_activity([u for u in get_all_users() if u])
+    if not users:
+        print("[WARN] Keine Benutzer gefunden.")
+        return {}
+
+    max_users = max(1, min(max_users, len(users)))
+    per_user_workers = max(1, (os.cpu_count() or 1) // max_users)
+    print(f"[INFO] Cache-Aufbau für {len(users)} Benutzer, {max_users} parallel "
+          f"({per_user_workers} Worker je Benutzer): {', '.join(users)}")
+
+    summary = {}
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_users) as pool:
+        futures = {pool.submit(_rebuild_user, u, modules, selective, per_user_workers): u for u in users}
+        for future in as_completed(futures):
             try:
-                print(f"[MODUL] {key} ...")
-                MODULES[key](user=u)
+                user, seconds, report, error = future.result()
             except Exception as e:
-                print(f"[ERROR] Modul '{key}' für Nutzer '{u}' fehlgeschlagen: {e}")
+                user, seconds, report, error = futures[future], 0.0, {}, f"Worker abgebrochen: {e}"
+            failed = [k for k, v in report.items() if v.get("error")]
+            summary[user] = {"seconds": round(seconds, 1), "error": error, "failed_modules": failed}
+
+    print(f"\n📋 Cache-Aufbau abgeschlossen in {time.perf_counter() - t0:.1f} s")
+    for user in users:
+        entry = summary.get(user, {})
+        status = "❌ " + entry["error"] if entry.get("error") else (
+            "⚠️ Fehler in " + ", ".join(entry["failed_modules"]) if entry.get("failed_modules") else "✅"
+        )
+        print(f"  {user:<20} {entry.get('seconds', 0):>8.1f} s  {status}")
+    return summary
+
+def rebuild_modules(user: str, modules: list[str]) -> dict:
+    """
+    Baut ausgewählte Module eines Benutzers sofort neu auf (z. B. "Neu berechnen" in der App) –
+    wie jeder Rebuild in einer neuen Generation, die nach Abschluss veröffentlicht wird.
+
+    Returns:
+        Dict Modul → Fehlermeldung der fehlgeschlagenen Module (leer bei Erfolg)
+    """
+    unknown = [m for m in modules if m not in MODULES]
+    if unknown:
+        raise ValueError(f"Unbekannte Cache-Module: {', '.join(unknown)} (verfügbar: {', '.join(MODULES)})")
+    report = run_modules_parallel(user, topological_order(modules), selective=False)
+    return {k: v["error"] for k, v in report.items() if v["error"]}
 
 def rebuild_single_cache(user: str = None, module_key: str = None):
     """
@@ -121,13 +315,19 @@ def rebuild_single_cache(user: str = None, module_key: str = None):
         except Exception:
             raise ValueError("Kein Benutzer angegeben und kein aktueller Benutzer ermittelbar.")
 
-    try:
-        print(f"🔄 Starte gezielten Cache-Rebuild: {module_key} für {user}")
-        MODULES[module_key](user=user)
+    print(f"🔄 Starte gezielten Cache-Rebuild: {module_key} für {user}")
+    errors = rebuild_modules(user, [module_key])
+    if errors:
+        print(f"[ERROR] Fehler im Modul '{module_key}' für '{user}': {errors[module_key]}")
+    else:
         print(f"[OK] Modul '{module_key}' für '{user}' erfolgreich.")
-    except Exception as e:
-        print(f"[ERROR] Fehler im Modul '{module_key}' für '{user}': {e}")
 
 if __name__ == "__main__":
-    migrate_add_critical_power_column()
-    build_and_save_cache(selective=False)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Cache für alle Benutzer neu aufbauen.")
+    parser.add_argument("--jobs", type=int, default=2, help="Anzahl gleichzeitig bearbeiteter Benutzer")
+    parser.add_argument("--selective", action="store_true", help="Module mit unveränderten Eingaben überspringen")
+    args = parser.parse_args()
+
+    run_migrations()
+    rebuild_all_users(max_users=args.jobs, selective=args.selective)
\ No newline at end of file
@@ -0,0 +1,59 @@
+import numpy as np
+
+# Friel J.: Aerobe Entkopplung (Pw:HR) – Vergleich des Leistungs-/HF-Verhältnisses
+# der ersten und zweiten Hälfte einer Einheit:
+#   EF = Ø Leistung / Ø HF,   Entkopplung (%) = (EF₁ − EF₂) / EF₁ · 100
+# < 5 % gilt als Hinweis auf eine stabile aerobe Grundlage.
+
+EF_WINDOW = 300          # Sekunden für den gleitenden EF-Stream
+EF_STREAM_STEP = 60      # Abtastung des gespeicherten Streams (1 Wert pro Minute)
+MIN_SAMPLES = 600        # mindestens 10 Minuten mit Leistung und HF
+
+
+def compute_efficiency_metrics(power, hr, window: int = EF_WINDOW, step: int = EF_STREAM_STEP) -> dict:
+    """
+    Berechnet EF je Fahrthälfte, die aerobe Entkopplung und einen gleitenden EF-Stream
+    in einem vektorisierten Durchlauf über die ausgerichteten Leistungs-/HF-Arrays (1 Hz).
+
+    Returns:
+        Dict mit ef_first_half, ef_second_half, decoupling (%) und ef_stream (float32-Bytes);
+        leer, wenn zu wenige gemeinsame Samples vorhanden sind.
+    """
+    power = np.asarray(power, dtype="float64")
+    hr = np.asarray(hr, dtype="float64")
+    if power.shape != hr.shape:
+        return {}
+
+    valid = ~np.isnan(power) & ~np.isnan(hr) & (hr > 0)
+    p = power[valid]
+    h = hr[valid]
+    n = len(p)
+    if n < MIN_SAMPLES:
+        return {}
+
+    # Präfixsummen einmal bilden – Hälften und gleitende Fenster sind Differenzen daraus
+    csum_p = np.concatenate([[0.0], np.cumsum(p)])
+    csum_h = np.concatenate([[0.0], np.cumsum(h)])
+
+    half = n // 2
+    ef_first = csum_p[half] / csum_h[half]
+    ef_second = (csum_p[n] - csum_p[half]) / (csum_h[n] - csum_h[half])
+    decoupling = (ef_first - ef_second) / ef_first * 100 if ef_first > 0 else None
+
+    window = min(window, n)
+    ef_rolling = (csum_p[window:] - csum_p[:-window]) / (csum_h[window:] - csum_h[:-window])
+    ef_stream = ef_rolling[::step].astype("float32")
+
+    return {
+        "ef_first_half": round(float(ef_first), 3),
+        "ef_second_half": round(float(ef_second), 3),
+        "decoupling": round(float(decoupling), 2) if decoupling is not None else None,
+        "ef_stream": ef_stream.tobytes(),
+    }
+
+
+def decode_ef_stream(blob) -> np.ndarray:
+    """Wandelt den gespeicherten EF-Stream (BLOB) zurück in ein float32-Array."""
+    if not blob:
+        return np.empty(0, dtype="float32")
+    return np.frombuffer(blob, dtype="float32")
@@ -1,5 +1,4 @@
 import os
-import sqlite3
 import math
 import hashlib
 import traceback
@@ -10,18 +9,13 @@ import pandas as pd
 from fitparse import FitFile
 import streamlit as st
 
-from fit_processing.core_metrics import extract_core_metrics
-from fit_processing.power_metrics_complete import extract_power_metrics
-from fit_processing.power_zones import compute_power_zones
-from fit_processing.heart_rate_metrics import extract_hr_series, compute_hr_zones
+from fit_processing.activity_metrics import compute_activity_metrics, get_metric_settings
 from fit_processing.metrics_calc_new import update_training_load_table
 from fit_processing.build_data_cache_new import build_and_save_cache
-from utils.settings_access import get_setting, DB_PATH
+from cache_modules.cache_planner import make_change_set
+from fit_processing.activity_writer import BATCH_SIZE, existing_hashes, write_activities
 from utils.user_paths import get_current_user
 
-MIN_DURATION = 60        # Sekunden
-MAX_DURATION = 8 * 3600  # 8 Stunden
-
 def is_valid_number(value):
     return isinstance(value, (int, float)) and not math.isnan(value)
 
@@ -45,13 +39,13 @@ def safe(source, key):
         return val if is_valid_number(val) else None
     return None
 
-def trigger_background_cache_rebuild(user: str, imported_paths: list[str] = None):
+def trigger_background_cache_rebuild(user: str, imported_paths: list[str] = None, change_set: dict = None):
     def run():
         try:
-            print(f"[INFO] Hintergrundprozess: Starte vollständigen Cache-Rebuild für Benutzer: {user} ...")
+            print(f"[INFO] Hintergrundprozess: Starte Cache-Rebuild für Benutzer: {user} ...")
             if imported_paths:
                 st.session_state[f"live_fit_paths_for_user_{user}"] = imported_paths
-            build_and_save_cache(user=user, selective=False)
+            build_and_save_cache(user=user, change_set=change_set, selective=change_set is not None)
             if imported_paths:
                 del st.session_state[f"live_fit_paths_for_user_{user}"]
             print(f"[INFO] Hintergrundprozess: Cache-Rebuild abgeschlossen für {user}.")
@@ -81,31 +75,45 @@ def import_fit_files(paths):
     if not current_user:
         raise ValueError("❗️ Kein Benutzer gesetzt beim Import – Abbruch.")
 
-    FTP = get_setting("ftp", default=250, user=current_user)
-    WEIGHT = get_setting("weight", default=70, user=current_user)
-    HR_MAX = get_setting("hr_max", default=190, user=current_user)
+    settings = get_metric_settings(current_user)
 
-    # Öffnet Datenbankverbindung und bereitet Ergebnislisten vor
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    # Bereitet Ergebnislisten vor
     results = []
     imported_paths = []
+    imported_start_times = []
+    pending = []   # geparste Aktivitäten, die noch geschrieben werden müssen
+
+    # Verhindert Doppelimporte auf Basis des Hashs + Benutzer-ID (eine Abfrage für alle Dateien)
+    known_hashes = existing_hashes(current_user)
+
+    def flush():
+        """Schreibt die gesammelten Aktivitäten gebündelt und trägt die Ergebnisse ein."""
+        failed = write_activities(pending, current_user, zone_basis=(settings["ftp"], settings["hr_max"]))
+        for entry in pending:
+            file_name = entry["row"]["file_name"]
+            error = failed.get(entry["row"]["file_hash"])
+            if error:
+                print(f"❌ Fehler beim Import von {file_name}: {error}")
+                results[entry["result_index"]] = (file_name, f"❌ Fehler: {error}")
+                continue
+            imported_paths.append(entry["path"])
+            if entry["start_time"]:
+                imported_start_times.append(entry["start_time"])
+            results[entry["result_index"]] = (file_name, entry["message"])
+        pending.clear()
 
-    # Verhindert Doppelimporte auf Basis des Hashs + Benutzer-ID
     for path in paths:
         file_name = os.path.basename(path)
         file_hash = compute_file_hash(path)
 
-        cursor.execute("""
-            SELECT 1 FROM activities
-            WHERE file_hash = ? AND user_id = ?
-        """, (file_hash, current_user))
-        if cursor.fetchone():
+        if file_hash in known_hashes:
             results.append((file_name, "⚠️ Bereits vorhanden – übersprungen"))
             continue
     # Extrahiert alle record-Nachrichten.
     # Sortiert sie chronologisch.
         try:
+            if file_hash is None:
+                raise ValueError("Datei nicht lesbar.")
             fitfile = FitFile(path)
             df = fitfile_to_df(fitfile)
             if "timestamp" not in df.columns:
@@ -114,139 +122,65 @@ def import_fit_files(paths):
             df["timestamp"] = pd.to_datetime(df["timestamp"])
             df = df.sort_values("timestamp").reset_index(drop=True)
 
-    # Metriken extrahieren und berechnen
-            core = extract_core_metrics(path)
-            if core is None:
+    # Alle registrierten Metriken in einem Durchlauf (gemeinsame Streams, Präfixsummen, Bewegungsmaske)
+            row, values = compute_activity_metrics(df, settings)
+            if values.get("core") is None:
                 raise ValueError("Konnte keine Kerndaten extrahieren.")
 
-            hr_series = extract_hr_series(df)
-            avg_hr = round(hr_series.mean(), 2) if isinstance(hr_series, pd.Series) and not hr_series.empty else None
-            power = extract_power_metrics(df, hr_avg=avg_hr, user=current_user)
-
-    # Fallback für unrealistische TSS Werte
-
-            if power.get("tss") and power["tss"] > 500:
-                power["tss"] = None
-            if power.get("intensity_factor") and power["intensity_factor"] > 1.4:
-                power["intensity_factor"] = None
-
-            # === Bewegungszeit berechnen (inkl. Pausen bei Stillstand)
-            try:
-                if "speed" in df.columns and "timestamp" in df.columns:
-                    df["timestamp"] = pd.to_datetime(df["timestamp"])
-                    df = df.sort_values("timestamp").reset_index(drop=True)
-
-                    moving_mask = df["speed"].fillna(0) > 0.5
-                    df["is_moving"] = moving_mask.astype(int)
-
-                    # Bewegungszeit = Anzahl Sekunden mit Bewegung
-                    duration_s = int(df["is_moving"].sum())
-                    moving_duration = duration_s
-                else:
-                    # Fallback: Gesamtdifferenz der Zeitstempel
-                    moving_duration = int((df["timestamp"].iloc[-1] - df["timestamp"].iloc[0]).total_seconds())
-            except Exception as e:
-                print(f"❗️ Fehler bei Zeitberechnung im Importprozess: {e}")
-                moving_duration = None
-
-            # Dauer validieren aber nicht abbrechen
-            if not is_valid_number(moving_duration) or moving_duration < MIN_DURATION or moving_duration > MAX_DURATION:
-                print(f"⚠️ Warnung: Ungültige Dauer ({moving_duration}) – setze auf None")
-                moving_duration = None
-
-            start_time = core.get("start_time")
-            if isinstance(start_time, pd.Timestamp):
-                start_time = start_time.isoformat()
-
-            file_size = os.path.getsize(path)
-
-    # zentrale Metriken in der Activities Tabelle eingetragen
-            data = (
-                start_time, file_name,
-                safe(power, "avg_power"), avg_hr,
-                safe(power, "normalized_power"),
-                safe(power, "tss"),
-                safe(power, "intensity_factor"),
-                safe(power, "efficiency_factor"),
-                safe(power, "max_5sec_power"),
-                safe(power, "max_1min_power"),
-                safe(power, "max_3min_power"),
-                safe(power, "max_5min_power"),
-                safe(power, "max_10min_power"),
-                safe(power, "max_20min_power"),
-                safe(power, "max_30min_power"),
-                moving_duration,
-                safe(core, "distance"),
-                file_size, file_hash,
-                current_user
-            )
-    # Schreibt zentrale Metriken zur Aktivität in die activities-Tabelle.
-
-            cursor.execute("""
-                INSERT INTO activities (
-                    start_time, file_name, avg_power, avg_heart_rate,
-                    normalized_power, tss, intensity_factor, efficiency_factor,
-                    max_5sec_power, max_1min_power, max_3min_power, max_5min_power,
-                    max_10min_power, max_20min_power, max_30min_power,
-                    duration, distance, file_size, file_hash, user_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, data)
-            activity_id = cursor.lastrowid
-        # wenn is_valid_number dann optionale Power und HF-Zonen Berechnung
-            if is_valid_number(data[2]):
-                try:
-                    pzones = compute_power_zones(path, ftp=FTP, user=current_user)
-                    for label, seconds in pzones.items():
-                        if seconds > 0:
-                            cursor.execute("""
-                                INSERT INTO power_zones (activity_id, zone_label, seconds_in_zone, user_id)
-                                VALUES (?, ?, ?, ?)
-                            """, (activity_id, label, seconds, current_user))
-                except Exception as e:
-                    print(f"⚠️ Power-Zonen-Fehler für {file_name}: {e}")
-
-            if is_valid_number(avg_hr):
-                try:
-                    hzones = compute_hr_zones(df, user=current_user)
-                    for label, seconds in hzones.items():
-                        if seconds > 0:
-                            cursor.execute("""
-                                INSERT INTO hr_zones (activity_id, zone_label, seconds_in_zone, user_id)
-                                VALUES (?, ?, ?, ?)
-                            """, (activity_id, label, seconds, current_user))
-                except Exception as e:
-                    print(f"⚠️ HF-Zonen-Fehler für {file_name}: {e}")
-
-        # erfolgreich importierte Dateien werden festgehalten und in den Ergebnislisten geschrieben.
-
-            conn.commit()
-            imported_paths.append(path)
+            start_time = row["start_time"]
+            avg_power = row.get("avg_power")
+            avg_hr = row.get("avg_heart_rate")
+
+    # zentrale Metriken für die activities-Tabelle
+            row.update({
+                "file_name": file_name,
+                "file_size": os.path.getsize(path),
+                "file_hash": file_hash,
+                "user_id": current_user,
+            })
+            row = {
+                c: row[c] if c == "ef_stream" or isinstance(row[c], str) else safe(row, c)
+                for c in row
+            }
+        # wenn is_valid_number dann optionale Power und HF-Zonen
+            zone_tables = {"power_zones": avg_power, "hr_zones": avg_hr}
+            zones = {
+                table: values.get(table) or {}
+                for table, reference in zone_tables.items()
+                if is_valid_number(reference)
+            }
 
             msg = "✅ Erfolgreich importiert"
-            if not is_valid_number(data[2]) and not is_valid_number(avg_hr):
+            if not is_valid_number(avg_power) and not is_valid_number(avg_hr):
                 msg += " – ⚠️ keine Leistung & HF"
-            elif not is_valid_number(data[2]):
+            elif not is_valid_number(avg_power):
                 msg += " – ⚠️ keine Leistung"
             elif not is_valid_number(avg_hr):
                 msg += " – ⚠️ keine HF"
 
-            results.append((file_name, msg))
-
-        # Rückgängig machen falls ein Fehler beim Import aufgetreten ist.
+        # Geschrieben wird gebündelt; das Ergebnis wird nach dem Schreiben eingetragen.
+            known_hashes.add(file_hash)
+            pending.append({
+                "row": row, "zones": zones, "path": path, "start_time": start_time,
+                "message": msg, "result_index": len(results),
+            })
+            results.append((file_name, None))
+            if len(pending) >= BATCH_SIZE:
+                flush()
 
         except Exception as e:
-            conn.rollback()
             print(f"❌ Fehler beim Import von {file_name}: {e}")
             traceback.print_exc()
             results.append((file_name, f"❌ Fehler: {str(e)}"))
 
-    conn.close()
+    flush()
 
     # Hintergrundprozess starten, falls neue Dateien importiert wurden.
     if imported_paths:
         print(f"[INFO] Neue FIT-Dateien importiert: {len(imported_paths)}")
         try:
-            update_training_load_table(user=current_user)
+            since = min(pd.to_datetime(imported_start_times)) if imported_start_times else None
+            update_training_load_table(user=current_user, since=since)
         except Exception as e:
             print(f"⚠️ Fehler bei Training Load Update: {e}")
         try:
@@ -255,7 +189,8 @@ def import_fit_files(paths):
         except Exception as e:
             print(f"[WARN] Konnte Session-State nicht setzen: {e}")
         try:
-            trigger_background_cache_rebuild(current_user)
+            change_set = make_change_set(new_files=[os.path.basename(p) for p in imported_paths])
+            trigger_background_cache_rebuild(current_user, change_set=change_set)
         except Exception as e:
             print(f"❌ Fehler beim Cache-Rebuild: {e}")
         try:
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from fitparse import FitFile
 from utils.settings_access import get_setting
@@ -12,6 +13,9 @@ HR_ZONES = {
     "Z5 (VO2max)": (0.90, 1.00),
 }
 
+# Schwellen-HF als Anteil der HFmax (Obergrenze "Z4 (Schwelle)") – Bezugsgröße für hrTSS
+HR_THRESHOLD_FACTOR = 0.90
+
 def extract_hr_series(df):
     try:
         if not isinstance(df, pd.DataFrame):
@@ -27,6 +31,47 @@ def extract_hr_series(df):
         print(f"❌ Fehler beim Extrahieren der HF-Serie: {e}")
         return None
 
+# Banister E. W. (1991): TRIMP = Σ Δt · HRr · 0.64 · e^(1.92 · HRr)
+# hrTSS: TRIMP normiert auf eine Stunde an der Schwellen-HF (= 100 Punkte, analog zu TSS)
+def compute_hr_metrics(hr_values, hr_max: float, hr_rest: float) -> dict:
+    """
+    Berechnet HF-Zonen, TRIMP und hrTSS in einem vektorisierten Durchlauf über die HF-Serie (1 Hz).
+    """
+    hr = np.asarray(hr_values, dtype="float64")
+    hr = hr[np.isfinite(hr) & (hr > 0)]
+    if hr.size == 0 or not hr_max or hr_max <= 0:
+        return {"zones": None, "trimp": None, "hr_tss": None}
+
+    # Zeit in Zonen: Grenzen sind lückenlos, daher genügt ein einziges digitize
+    labels = list(HR_ZONES.keys())
+    edges = [int(low * hr_max) for low, _ in HR_ZONES.values()] + [int(list(HR_ZONES.values())[-1][1] * hr_max)]
+    counts = np.bincount(np.digitize(hr, edges), minlength=len(edges) + 1)
+    zones = {label: int(counts[i + 1]) for i, label in enumerate(labels)}
+
+    if hr_rest is None or hr_max <= hr_rest:
+        return {"zones": zones, "trimp": None, "hr_tss": None}
+
+    reserve = np.clip((hr - hr_rest) / (hr_max - hr_rest), 0.0, 1.0)
+    trimp = float(np.sum(reserve * 0.64 * np.exp(1.92 * reserve)) / 60.0)
+
+    thr_reserve = min(max((HR_THRESHOLD_FACTOR * hr_max - hr_rest) / (hr_max - hr_rest), 0.0), 1.0)
+    trimp_threshold_hour = 60.0 * thr_reserve * 0.64 * np.exp(1.92 * thr_reserve)
+    hr_tss = trimp / trimp_threshold_hour * 100 if trimp_threshold_hour > 0 else None
+
+    return {
+        "zones": zones,
+        "trimp": round(trimp, 2),
+        "hr_tss": round(hr_tss, 2) if hr_tss is not None else None,
+    }
+
+def load_hr_stream(filepath: str) -> np.ndarray:
+    """Liest nur die HF-Serie einer FIT-Datei (für Backfills ohne vollständigen Import)."""
+    values = [
+        rec.get_value("heart_rate")
+        for rec in FitFile(filepath).get_messages("record")
+    ]
+    return np.array([v for v in values if isinstance(v, (int, float))], dtype="float64")
+
 def compute_hr_zones(source, user=None):
     try:
         # Datenquelle interpretieren
@@ -64,14 +109,8 @@ def compute_hr_zones(source, user=None):
             return None
 
         # Zeit in Zonen berechnen
-        zone_times = {}
-        for label, (low, high) in HR_ZONES.items():
-            lower = int(low * max_hr)
-            upper = int(high * max_hr)
-            in_zone = (hr_series >= lower) & (hr_series < upper)
-            zone_times[label] = int(in_zone.sum())
-
-        return zone_times
+        hr_rest = get_setting("hr_rest", 60, user=user)
+        return compute_hr_metrics(hr_series.to_numpy(), max_hr, hr_rest)["zones"]
 
     except Exception as e:
         print(f"❌ Fehler in compute_hr_zones: {e}")
@@ -0,0 +1,129 @@
+import pandas as pd
+from fitparse import FitFile
+
+# Registry für Aktivitätsmetriken: Jede Metrik deklariert die benötigten Record-Felder (inputs),
+# die Knoten, von denen sie abhängt (depends), und die Spalten der Tabelle 'activities', die sie
+# liefert (columns). Knoten ohne Spalten sind Zwischenergebnisse (z. B. sortierte Streams,
+# Präfixsummen, Bewegungsmaske) und werden pro Aktivität genau einmal berechnet.
+
+METRICS = {}
+
+
+def register_metric(name: str, inputs=(), depends=(), columns=(), types=None):
+    """
+    Dekorator zur Registrierung einer Metrik bzw. eines Zwischenergebnisses.
+
+    Die Funktion erhält den Aktivitätskontext (`df`, `settings`) und die Werte der
+    Abhängigkeiten in der angegebenen Reihenfolge. Fehlt ein Input-Feld oder liefert
+    eine Abhängigkeit None, wird der Knoten übersprungen (Wert None).
+    Metriken mit `columns` geben ein Dict zurück, dessen Schlüssel diese Spalten enthalten;
+    `types` legt abweichende SQL-Typen fest (Standard: REAL).
+    """
+    def decorator(fn):
+        if name in METRICS:
+            raise ValueError(f"Metrik '{name}' ist bereits registriert.")
+        unknown = [d for d in depends if d not in METRICS]
+        if unknown:
+            raise ValueError(f"Metrik '{name}': unbekannte Abhängigkeiten {unknown}")
+        METRICS[name] = {
+            "fn": fn,
+            "inputs": tuple(inputs),
+            "depends": tuple(depends),
+            "columns": tuple(columns),
+            "types": {col: (types or {}).get(col, "REAL") for col in columns},
+        }
+        return fn
+    return decorator
+
+
+def resolve_order(names=None) -> list:
+    """Topologische Reihenfolge aller benötigten Knoten für die angeforderten Metriken."""
+    order, seen = [], set()
+
+    def visit(name):
+        if name in seen:
+            return
+        if name not in METRICS:
+            raise ValueError(f"Metrik '{name}' ist nicht registriert.")
+        seen.add(name)
+        for dep in METRICS[name]["depends"]:
+            visit(dep)
+        order.append(name)
+
+    for name in (names or METRICS.keys()):
+        visit(name)
+    return order
+
+
+def metric_columns(names=None) -> list:
+    """Alle Spalten, die die angegebenen (oder alle) Metriken liefern, in Registrierungsreihenfolge."""
+    selected = set(names) if names else None
+    return [
+        col
+        for name, spec in METRICS.items()
+        if selected is None or name in selected
+        for col in spec["columns"]
+    ]
+
+
+def metric_column_types(names=None) -> dict:
+    """SQL-Typ je Spalte der angegebenen (oder aller) Metriken."""
+    return {
+        col: spec["types"][col]
+        for name, spec in METRICS.items()
+        if not names or name in names
+        for col in spec["columns"]
+    }
+
+
+def _has_input(df: pd.DataFrame, field: str) -> bool:
+    return field in df.columns and df[field].notna().any()
+
+
+def compute_metrics(df: pd.DataFrame, settings: dict, names=None) -> dict:
+    """
+    Berechnet den Abhängigkeitsgraphen für eine Aktivität. Jeder Knoten wird höchstens einmal
+    ausgewertet; Zwischenergebnisse werden von allen abhängigen Metriken gemeinsam genutzt.
+
+    Returns:
+        Dict Knotenname → Wert (None für übersprungene oder fehlgeschlagene Knoten)
+    """
+    ctx = {"df": df, "settings": settings}
+    values = {}
+    for name in resolve_order(names):
+        spec = METRICS[name]
+        deps = [values.get(d) for d in spec["depends"]]
+        if any(dep is None for dep in deps) or not all(_has_input(df, f) for f in spec["inputs"]):
+            values[name] = None
+            continue
+        try:
+            values[name] = spec["fn"](ctx, *deps)
+        except Exception as e:
+            print(f"⚠️ Metrik '{name}' fehlgeschlagen: {e}")
+            values[name] = None
+    return values
+
+
+def collect_columns(values: dict, names=None) -> dict:
+    """Fasst die Spaltenwerte der berechneten Metriken zu einem Dict Spalte → Wert zusammen."""
+    row = {}
+    for name, spec in METRICS.items():
+        if not spec["columns"] or (names and name not in names):
+            continue
+        result = values.get(name) or {}
+        for col in spec["columns"]:
+            row[col] = result.get(col)
+    return row
+
+
+def load_activity_frame(filepath: str) -> pd.DataFrame:
+    """Liest alle record-Nachrichten einer FIT-Datei, chronologisch sortiert."""
+    records = [
+        {field.name: field.value for field in rec if field.value is not None}
+        for rec in FitFile(filepath).get_messages("record")
+    ]
+    df = pd.DataFrame(records)
+    if "timestamp" not in df.columns:
+        raise ValueError("Keine Timestamp-Spalte gefunden.")
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df.sort_values("timestamp").reset_index(drop=True)
@@ -1,102 +1,232 @@
 import os
-import sqlite3
+import numpy as np
 import pandas as pd
 from utils.settings_access import get_setting
 from utils.user_paths import get_current_user, get_user_cache_path
-
-def calculate_training_load(tss_df: pd.DataFrame, ctl_constant: int = 42, atl_constant: int = 7) -> pd.DataFrame:
-    """
-    Berechnet CTL, ATL, TSB nach Performance-Management-Chart-Methode (Coggan).
+from utils.artifact_cache import load_artifact
+from fit_processing.pmc_model import CTL_CONSTANT, ATL_CONSTANT, compute_pmc
+from utils.database import read_connection, write_connection
+
+# Belastungskanäle → Spalten (CTL, ATL, TSB) in der Tabelle 'training_load'.
+# TSS behält die ursprünglichen Spaltennamen, weitere Kanäle werden mit Präfix abgelegt.
+LOAD_CHANNELS = {
+    "tss": ("ctl", "atl", "tsb"),
+    "trimp": ("trimp_ctl", "trimp_atl", "trimp_tsb"),
+    "kj": ("kj_ctl", "kj_atl", "kj_tsb"),
+}
+
+TRAINING_LOAD_SQL = (
+    f"SELECT {', '.join(['date'] + [col for c in LOAD_CHANNELS for col in (c,) + LOAD_CHANNELS[c]])} "
+    "FROM training_load WHERE user_id = ? ORDER BY date"
+)
+
+def get_pmc_constants(user: str = None) -> tuple:
+    """Liefert die benutzerspezifischen Zeitkonstanten (CTL, ATL) in Tagen."""
+    ctl_constant = get_setting("ctl_constant", CTL_CONSTANT, user=user)
+    atl_constant = get_setting("atl_constant", ATL_CONSTANT, user=user)
+    if not ctl_constant or ctl_constant <= 0:
+        ctl_constant = CTL_CONSTANT
+    if not atl_constant or atl_constant <= 0:
+        atl_constant = ATL_CONSTANT
+    return float(ctl_constant), float(atl_constant)
+
+# Banister E. W. (1991): Modeling elite athletic performance – TRIMP mit HF-Reserve-Gewichtung
+def compute_activity_loads(df: pd.DataFrame, hr_max: float, hr_rest: float) -> pd.DataFrame:
     """
-    df = tss_df.copy()
-    df["start_time"] = pd.to_datetime(df["start_time"], errors="coerce")
-    df["tss"] = pd.to_numeric(df["tss"], errors="coerce")
-    df = df[df["start_time"].notna() & df["tss"].notna() & (df["tss"] > 0)]
+    Berechnet je Aktivität alle Belastungskanäle (TSS, TRIMP, kJ) vektorisiert.
 
-    if df.empty:
-        return pd.DataFrame(columns=["date", "tss", "ctl", "atl", "tsb"])
+    Fahrten ohne Leistungsmesser gehen mit ihrem hrTSS in den TSS-Kanal ein; TRIMP wird aus
+    dem beim Import gespeicherten Wert übernommen und nur ersatzweise aus der Ø-HF geschätzt.
+    """
+    out = pd.DataFrame({"start_time": pd.to_datetime(df["start_time"], errors="coerce")})
+    duration = pd.to_numeric(df.get("duration"), errors="coerce")
 
-    df = df.groupby(df["start_time"].dt.date)["tss"].sum().reset_index()
-    df.rename(columns={"start_time": "date"}, inplace=True)
-    df["date"] = pd.to_datetime(df["date"])
+    out["tss"] = pd.to_numeric(df.get("tss"), errors="coerce")
+    if "hr_tss" in df.columns:
+        out["tss"] = out["tss"].fillna(pd.to_numeric(df["hr_tss"], errors="coerce"))
 
-    full_range = pd.date_range(df["date"].min(), pd.Timestamp.today(), freq="D")
-    df = df.set_index("date").reindex(full_range, fill_value=0).rename_axis("date").reset_index()
+    hr_avg = pd.to_numeric(df.get("avg_heart_rate"), errors="coerce")
+    hr_reserve = ((hr_avg - hr_rest) / max(hr_max - hr_rest, 1)).clip(lower=0, upper=1)
+    out["trimp"] = (duration / 60) * hr_reserve * 0.64 * np.exp(1.92 * hr_reserve)
+    if "trimp" in df.columns:
+        out["trimp"] = pd.to_numeric(df["trimp"], errors="coerce").fillna(out["trimp"])
 
-    ctl, atl = [], []
-    ctl_prev, atl_prev = 0.0, 0.0
+    avg_power = pd.to_numeric(df.get("avg_power"), errors="coerce")
+    out["kj"] = avg_power * duration / 1000
 
-    for tss in df["tss"]:
-        ctl_today = ctl_prev + (tss - ctl_prev) * (1 / ctl_constant)
-        atl_today = atl_prev + (tss - atl_prev) * (1 / atl_constant)
-        ctl.append(ctl_today)
-        atl.append(atl_today)
-        ctl_prev = ctl_today
-        atl_prev = atl_today
+    return out
 
-    df["ctl"] = ctl
-    df["atl"] = atl
-    df["tsb"] = df["ctl"] - df["atl"]
+def calculate_load_channels(loads_df: pd.DataFrame, ctl_constant: float = CTL_CONSTANT,
+                            atl_constant: float = ATL_CONSTANT, start=None, seeds: dict = None) -> pd.DataFrame:
+    """
+    Berechnet CTL/ATL/TSB für alle vorhandenen Belastungskanäle in einem Durchlauf:
+    Tageswerte werden als Matrix (Kanäle × Tage) geglättet.
 
-    return df[["date", "tss", "ctl", "atl", "tsb"]]
+    Mit `start` und `seeds` (Spaltenname → Wert vom Vortag) wird nur der Zeitraum
+    ab `start` bis heute berechnet – Grundlage für das inkrementelle Update.
+    """
+    channels = [c for c in LOAD_CHANNELS if c in loads_df.columns]
+    columns = ["date"] + [col for c in channels for col in (c,) + LOAD_CHANNELS[c]]
 
-def update_training_load_table(user: str = None):
+    df = loads_df.copy()
+    df["start_time"] = pd.to_datetime(df["start_time"], errors="coerce")
+    values = df[channels].apply(pd.to_numeric, errors="coerce")
+    values = values.where(values > 0)
+    df = df[df["start_time"].notna() & values.notna().any(axis=1)]
+
+    if df.empty and start is None:
+        return pd.DataFrame(columns=columns)
+
+    daily = values.loc[df.index].groupby(df["start_time"].dt.normalize()).sum(min_count=1)
+
+    first_day = pd.Timestamp(start).normalize() if start is not None else daily.index.min()
+    full_range = pd.date_range(first_day, pd.Timestamp.today(), freq="D")
+    daily = daily.reindex(full_range).fillna(0.0)
+
+    seeds = seeds or {}
+    ctl_seed = [seeds.get(LOAD_CHANNELS[c][0], 0.0) for c in channels]
+    atl_seed = [seeds.get(LOAD_CHANNELS[c][1], 0.0) for c in channels]
+    ctl, atl, tsb = compute_pmc(daily[channels].to_numpy(dtype="float64").T, ctl_constant, atl_constant,
+                                ctl_seed=ctl_seed, atl_seed=atl_seed)
+
+    result = pd.DataFrame({"date": full_range})
+    for i, c in enumerate(channels):
+        ctl_col, atl_col, tsb_col = LOAD_CHANNELS[c]
+        result[c] = daily[c].to_numpy()
+        result[ctl_col] = ctl[i]
+        result[atl_col] = atl[i]
+        result[tsb_col] = tsb[i]
+
+    return result[columns]
+
+def calculate_training_load(tss_df: pd.DataFrame, ctl_constant: float = None, atl_constant: float = None,
+                            start=None, ctl_seed: float = 0.0, atl_seed: float = 0.0,
+                            *, user: str) -> pd.DataFrame:
+    """
+    Berechnet CTL, ATL, TSB nach Performance-Management-Chart-Methode (Coggan).
+    Ohne explizite Zeitkonstanten gelten die Einstellungen von `user` (get_pmc_constants);
+    der Benutzer ist Pflicht, da die Funktion auch außerhalb einer Streamlit-Sitzung läuft.
+    """
+    if ctl_constant is None or atl_constant is None:
+        user_ctl, user_atl = get_pmc_constants(user)
+        ctl_constant = ctl_constant or user_ctl
+        atl_constant = atl_constant or user_atl
+    return calculate_load_channels(
+        tss_df[["start_time", "tss"]], ctl_constant, atl_constant,
+        start=start, seeds={"ctl": ctl_seed, "atl": atl_seed}
+    )
+
+def _load_seed_state(conn, user: str, since: pd.Timestamp):
     """
-    Holt TSS-Werte aus der Datenbank und aktualisiert die Tabelle 'training_load' im DB-System.
+    Letzter gespeicherter Tageszustand vor `since` als (Datum, {Spalte: Wert}) oder None,
+    falls keiner existiert oder einzelne Kanäle noch nicht befüllt sind.
+    """
+    seed_cols = [col for c in LOAD_CHANNELS for col in LOAD_CHANNELS[c][:2]]
+    row = conn.execute(
+        f"""
+        SELECT date, {", ".join(seed_cols)}
+        FROM training_load
+        WHERE user_id = ? AND date < ?
+        ORDER BY date DESC
+        LIMIT 1
+        """,
+        (user, since.strftime("%Y-%m-%d"))
+    ).fetchone()
+    if row is None or any(v is None for v in row[1:]):
+        return None
+    return pd.Timestamp(row[0]), dict(zip(seed_cols, map(float, row[1:])))
+
+def update_training_load_table(user: str = None, since=None):
+    """
+    Aktualisiert die Tabelle 'training_load' (alle Belastungskanäle) für einen Nutzer.
+
+    Ohne `since` wird die gesamte Historie neu berechnet. Mit `since` (frühestes
+    Datum, an dem Aktivitäten hinzugefügt oder entfernt wurden) wird ab dem letzten
+    gespeicherten Tageszustand davor weitergerechnet und nur dieser Bereich per
+    Upsert in einer Transaktion geschrieben.
     """
     user = user or get_current_user()
-    db_path = get_setting("db_path", default="trainings.db", user=user)
+    hr_max = get_setting("hr_max", 190, user=user)
+    hr_rest = get_setting("hr_rest", 60, user=user)
+    ctl_constant, atl_constant = get_pmc_constants(user)
 
     try:
-        with sqlite3.connect(db_path) as conn:
+        with write_connection() as conn:
+            seed = None
+            if since is not None:
+                since = pd.Timestamp(since).normalize()
+                seed = _load_seed_state(conn, user, since)
+
+            start = seed[0] + pd.Timedelta(days=1) if seed is not None else None
             df = pd.read_sql_query(
                 """
-                SELECT start_time, tss
+                SELECT start_time, tss, hr_tss, trimp, avg_heart_rate, avg_power, duration
                 FROM activities
                 WHERE user_id = ?
-                  AND start_time IS NOT NULL
-                  AND tss IS NOT NULL
+                  AND start_time >= ?
                 """,
-                conn, params=(user,)
+                conn, params=(user, start.strftime("%Y-%m-%d") if start is not None else "")
             )
 
-        df_load = calculate_training_load(df)
-        if df_load.empty:
-            print(f"[WARN] Keine gültigen TSS-Werte für '{user}' – Abbruch.")
-            return
+            df_load = calculate_load_channels(
+                compute_activity_loads(df, hr_max, hr_rest), ctl_constant, atl_constant,
+                start=start, seeds=seed[1] if seed is not None else None
+            )
+
+            if df_load.empty:
+                if seed is None:
+                    conn.execute("DELETE FROM training_load WHERE user_id = ?", (user,))
+                    print(f"[WARN] Keine gültigen Belastungswerte für '{user}' – Abbruch.")
+                else:
+                    print(f"[OK] Training Load für '{user}' bereits aktuell.")
+                return
+
+            value_cols = [col for col in df_load.columns if col != "date"]
+            rows = zip(
+                df_load["date"].dt.strftime("%Y-%m-%d"),
+                *(df_load[col].astype(float) for col in value_cols),
+                [user] * len(df_load),
+            )
 
-        with sqlite3.connect(db_path) as conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM training_load WHERE user_id = ?", (user,))
+            if seed is None:
+                cursor.execute("DELETE FROM training_load WHERE user_id = ?", (user,))
             cursor.executemany(
-                """
-                INSERT INTO training_load (date, ctl, atl, tsb, user_id)
-                VALUES (?, ?, ?, ?, ?)
+                f"""
+                INSERT INTO training_load (date, {", ".join(value_cols)}, user_id)
+                VALUES ({", ".join("?" for _ in range(len(value_cols) + 2))})
+                ON CONFLICT(date, user_id) DO UPDATE SET
+                    {", ".join(f"{col} = excluded.{col}" for col in value_cols)}
                 """,
-                [
-                    (row["date"].strftime("%Y-%m-%d"), row["ctl"], row["atl"], row["tsb"], user)
-                    for _, row in df_load.iterrows()
-                ]
+                rows
             )
-            conn.commit()
-        print(f"[OK] Training Load erfolgreich aktualisiert für '{user}'")
+
+        mode = f"ab {df_load['date'].min():%Y-%m-%d}" if seed is not None else "vollständig"
+        print(f"[OK] Training Load aktualisiert für '{user}' ({mode}, {len(df_load)} Tage)")
 
     except Exception as e:
         print(f"❌ Fehler beim Training Load Update für '{user}': {e}")
 
+def load_training_load_table(user: str) -> pd.DataFrame:
+    """Liest die gespeicherte Training-Load-Zeitreihe (alle Kanäle) eines Nutzers aus der Datenbank."""
+    with read_connection() as conn:
+        df = pd.read_sql_query(TRAINING_LOAD_SQL, conn, params=(user,))
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
 def get_training_load_df(user: str = None) -> pd.DataFrame:
     """
     Läd die gecachte Training-Load-Zeitreihe für einen Nutzer.
     """
     user = user or get_current_user()
-    path = get_user_cache_path("training_load.csv", user=user)
+    path = get_user_cache_path("training_load.npz", user=user)
 
     if not os.path.exists(path):
         print(f"[WARN] Kein Cache gefunden: {path}")
         return pd.DataFrame(columns=["date", "CTL", "ATL", "TSB"])
 
     try:
-        df = pd.read_csv(path, parse_dates=["date"])
+        df = load_artifact("training_load.npz", user)
         df = df.dropna(subset=["ctl", "atl", "tsb"])
         df.rename(columns={"ctl": "CTL", "atl": "ATL", "tsb": "TSB"}, inplace=True)
         return df
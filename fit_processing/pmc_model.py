@@ -0,0 +1,216 @@
+import time
+import numpy as np
+import pandas as pd
+
+# Coggan A. / Banister E. W.: Performance Manager Chart (Impulse-Response-Modell)
+# CTL/ATL sind exponentiell gewichtete Mittel der täglichen Belastung:
+#   y_t = y_(t-1) + (x_t - y_(t-1)) / k   ⇔   y_t = (1 - a) * y_(t-1) + a * x_t  mit a = 1/k
+
+CTL_CONSTANT = 42
+ATL_CONSTANT = 7
+
+
+def ewma(values, time_constant: float, seed=0.0) -> np.ndarray:
+    """
+    Vektorisierte PMC-Glättung entlang der letzten Achse (Tage).
+
+    Akzeptiert eine Tagesreihe (1D) oder eine Matrix (Serien × Tage) und liefert
+    exakt dieselben Werte wie die klassische Schleife mit Startwert `seed`
+    (Skalar oder ein Wert pro Serie).
+    """
+    arr = np.asarray(values, dtype="float64")
+    if arr.ndim not in (1, 2):
+        raise ValueError(f"ewma(): 1D oder 2D erwartet, erhalten: {arr.ndim}D")
+    if time_constant <= 0:
+        raise ValueError(f"ewma(): Ungültige Zeitkonstante: {time_constant}")
+
+    matrix = np.atleast_2d(arr)
+    n_series, n_days = matrix.shape
+    if n_days == 0:
+        return arr.copy()
+
+    seeds = np.broadcast_to(np.asarray(seed, dtype="float64"), (n_series,))
+
+    # Startwert als "Tag 0" voranstellen → adjust=False entspricht exakt der Rekursion
+    frame = pd.DataFrame(np.column_stack([seeds, matrix]).T)
+    smoothed = frame.ewm(alpha=1.0 / time_constant, adjust=False).mean().to_numpy()[1:].T
+
+    return smoothed[0] if arr.ndim == 1 else smoothed
+
+
+def compute_pmc(daily_load, ctl_constant: float = CTL_CONSTANT, atl_constant: float = ATL_CONSTANT,
+                ctl_seed=0.0, atl_seed=0.0):
+    """Berechnet CTL, ATL und TSB für eine tägliche Belastungsreihe (oder Matrix)."""
+    ctl = ewma(daily_load, ctl_constant, seed=ctl_seed)
+    atl = ewma(daily_load, atl_constant, seed=atl_seed)
+    return ctl, atl, ctl - atl
+
+
+# Typische Wochenverteilung (Mo–So) für Wochenvorlagen: Ruhetag Montag, lange Einheit am Wochenende
+DEFAULT_WEEK_SHAPE = (0.0, 0.15, 0.15, 0.15, 0.05, 0.25, 0.25)
+
+
+def expand_weekly_template(template, start, days: int) -> np.ndarray:
+    """
+    Wandelt eine Wochenvorlage (7 TSS-Werte, Mo–So) in einen Tagesplan der Länge `days` ab `start`.
+    """
+    template = np.asarray(template, dtype="float64")
+    if template.shape != (7,):
+        raise ValueError("Wochenvorlage benötigt genau 7 Tageswerte (Mo–So).")
+    weekdays = (pd.Timestamp(start).weekday() + np.arange(max(int(days), 0))) % 7
+    return template[weekdays]
+
+
+def project_training_load(planned_tss, ctl_start: float, atl_start: float, start,
+                          ctl_constant: float = CTL_CONSTANT, atl_constant: float = ATL_CONSTANT) -> pd.DataFrame:
+    """
+    Simuliert CTL/ATL/TSB für einen geplanten Tages-TSS-Verlauf ab `start`,
+    ausgehend vom letzten bekannten Zustand (`ctl_start`, `atl_start` vom Vortag).
+    """
+    planned = np.asarray(planned_tss, dtype="float64")
+    ctl, atl, tsb = compute_pmc(planned, ctl_constant, atl_constant, ctl_seed=ctl_start, atl_seed=atl_start)
+    return pd.DataFrame({
+        "date": pd.date_range(pd.Timestamp(start).normalize(), periods=len(planned), freq="D"),
+        "tss": planned,
+        "ctl": ctl,
+        "atl": atl,
+        "tsb": tsb,
+    })
+
+
+def simulate_plans(plans, ctl_start: float, atl_start: float,
+                   ctl_constant: float = CTL_CONSTANT, atl_constant: float = ATL_CONSTANT):
+    """
+    Simuliert viele Pläne gleichzeitig als 2D-EWMA (Pläne × Tage).
+    Gibt die Matrizen (ctl, atl, tsb) in derselben Form wie `plans` zurück.
+    """
+    plans = np.atleast_2d(np.asarray(plans, dtype="float64"))
+    return compute_pmc(plans, ctl_constant, atl_constant, ctl_seed=ctl_start, atl_seed=atl_start)
+
+
+def build_taper_plans(base_plan, taper_days=range(3, 22), taper_factors=np.arange(0.2, 1.01, 0.05),
+                      build_factors=np.arange(0.8, 1.31, 0.05)):
+    """
+    Erzeugt Taper-Varianten eines Basisplans: Aufbauphase skaliert mit `build_factors`,
+    die letzten `taper_days` Tage vor dem Renntag skaliert mit `taper_factors`.
+
+    Returns:
+        (plans, params) – Matrix (Pläne × Tage) und je Zeile (build, taper_days, taper_factor)
+    """
+    base = np.asarray(base_plan, dtype="float64")
+    n_days = len(base)
+    grid = [
+        (float(b), int(d), float(f))
+        for b in build_factors for d in taper_days for f in taper_factors
+        if d <= n_days
+    ]
+    if not grid:
+        return np.empty((0, n_days)), []
+
+    build = np.array([g[0] for g in grid])[:, None]
+    taper = np.array([g[1] for g in grid])[:, None]
+    factor = np.array([g[2] for g in grid])[:, None]
+
+    in_taper = np.arange(n_days)[None, :] >= (n_days - taper)
+    plans = base[None, :] * np.where(in_taper, factor, build)
+    return plans, grid
+
+
+def search_taper_plan(base_plan, ctl_start: float, atl_start: float, target_tsb: float,
+                      ctl_constant: float = CTL_CONSTANT, atl_constant: float = ATL_CONSTANT, **grid) -> dict:
+    """
+    Durchsucht alle Taper-Varianten (`build_taper_plans`) und wählt den Plan, dessen TSB
+    am Renntag (Zustand am Ende des Plans, d. h. vor der Rennbelastung) dem Ziel am
+    nächsten kommt. Bei Gleichstand gewinnt die höhere CTL.
+    """
+    plans, params = build_taper_plans(base_plan, **grid)
+    if not params:
+        return {}
+
+    ctl, atl, tsb = simulate_plans(plans, ctl_start, atl_start, ctl_constant, atl_constant)
+    race_tsb = tsb[:, -1]
+    race_ctl = ctl[:, -1]
+    order = np.lexsort((-race_ctl, np.abs(race_tsb - target_tsb)))
+    best = int(order[0])
+    build, taper_days, taper_factor = params[best]
+
+    return {
+        "plan": plans[best],
+        "ctl": ctl[best],
+        "atl": atl[best],
+        "tsb": tsb[best],
+        "build_factor": round(build, 2),
+        "taper_days": taper_days,
+        "taper_factor": round(taper_factor, 2),
+        "race_ctl": float(race_ctl[best]),
+        "race_tsb": float(race_tsb[best]),
+        "candidates": len(params),
+    }
+
+
+def _ewma_loop(values, time_constant: float, seed: float = 0.0) -> np.ndarray:
+    """Referenzimplementierung (ursprüngliche Python-Schleife) für Benchmark und Abgleich."""
+    out = []
+    prev = seed
+    for x in values:
+        prev = prev + (x - prev) * (1 / time_constant)
+        out.append(prev)
+    return np.asarray(out, dtype="float64")
+
+
+def benchmark_pmc(days: int = 5 * 365, users: int = 50, repeats: int = 3, seed: int = 0) -> dict:
+    """
+    Vergleicht Schleife und vektorisierte Berechnung auf synthetischen Tagesreihen
+    (`users` Historien mit je `days` Tagen) und prüft die Übereinstimmung.
+    """
+    rng = np.random.default_rng(seed)
+    loads = rng.gamma(2.0, 40.0, size=(users, days)) * (rng.random((users, days)) > 0.3)
+
+    def _timed(fn):
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - t0)
+        return best, result
+
+    t_loop, ref = _timed(lambda: np.vstack([
+        np.vstack([_ewma_loop(row, CTL_CONSTANT), _ewma_loop(row, ATL_CONSTANT)]) for row in loads
+    ]))
+    t_vec, vec = _timed(lambda: np.vstack([
+        np.vstack([ewma(row, CTL_CONSTANT), ewma(row, ATL_CONSTANT)]) for row in loads
+    ]))
+    t_batch, batch = _timed(lambda: np.stack([ewma(loads, CTL_CONSTANT), ewma(loads, ATL_CONSTANT)], axis=1))
+
+    return {
+        "days": days,
+        "users": users,
+        "loop_s": round(t_loop, 4),
+        "vectorized_s": round(t_vec, 4),
+        "batched_s": round(t_batch, 4),
+        "max_abs_error": float(max(np.abs(ref - vec).max(), np.abs(ref - batch.reshape(ref.shape)).max())),
+    }
+
+
+def benchmark_taper_search(days_to_race: int = 84, repeats: int = 3) -> dict:
+    """Misst die Laufzeit einer vollständigen Taper-Suche (alle Varianten × Tage)."""
+    base = expand_weekly_template(np.array(DEFAULT_WEEK_SHAPE) * 600, pd.Timestamp.today(), days_to_race)
+    best = float("inf")
+    result = {}
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = search_taper_plan(base, ctl_start=70.0, atl_start=80.0, target_tsb=10.0)
+        best = min(best, time.perf_counter() - t0)
+    return {"days": days_to_race, "candidates": result.get("candidates", 0), "search_s": round(best, 4)}
+
+
+if __name__ == "__main__":
+    for n_days in (365, 5 * 365, 20 * 365):
+        res = benchmark_pmc(days=n_days)
+        print(
+            f"[BENCH] {res['users']} Nutzer × {res['days']} Tage: "
+            f"Schleife {res['loop_s']} s · vektorisiert {res['vectorized_s']} s · "
+            f"gebündelt {res['batched_s']} s · max. Abweichung {res['max_abs_error']:.2e}"
+        )
+    taper = benchmark_taper_search()
+    print(f"[BENCH] Taper-Suche: {taper['candidates']} Pläne × {taper['days']} Tage in {taper['search_s']} s")
@@ -1,13 +1,14 @@
 import os
 import numpy as np
 import pandas as pd
-import sqlite3
 from fitparse import FitFile
-import streamlit as st
 from typing import List, Dict, Optional
-from utils.settings_access import get_setting, DB_PATH
+from utils.settings_access import get_setting
 from fit_processing.power_zones import compute_power_zones
 from utils.user_paths import get_user_fit_dir
+from utils.memo import memoize
+from fit_processing.stream_cache import get_stream
+from utils.database import read_connection
 
 # Coggan, A. R., & Allen, H. (2010). Training and Racing with a Power Meter (2nd ed.). VeloPress.
 def calculate_np(power_series: List[float]) -> Optional[float]:
@@ -54,8 +55,7 @@ def rolling_best_powers(power_series: List[float]) -> Dict[str, Optional[float]]
         for key, w in windows.items()
     }
 
-@st.cache_data(show_spinner=False)
-def extract_power_series(filepath: str) -> List[float]:
+def _parse_power_series(filepath: str) -> List[float]:
     try:
         fitfile = FitFile(filepath)
         power_values = []
@@ -84,8 +84,16 @@ def extract_power_series(filepath: str) -> List[float]:
         return []
 
 
-def compute_power_curve(power_series: List[float]) -> Optional[List[float]]:
-    if not power_series or len(power_series) < 3:
+def extract_power_series(filepath: str) -> np.ndarray:
+    """
+    Leistungsstrom einer FIT-Datei als schreibgeschütztes float32-Array (leer bei zu wenig Daten).
+    Zwischengespeichert im Stream-Cache, Schlüssel ist der Dateiinhalt.
+    """
+    return get_stream(filepath, "power", _parse_power_series)
+
+
+def compute_power_curve(power_series) -> Optional[List[float]]:
+    if power_series is None or len(power_series) < 3:
         return None
 
     s = pd.Series(power_series, dtype="float64").dropna()
@@ -98,7 +106,7 @@ def compute_power_curve(power_series: List[float]) -> Optional[List[float]]:
     ]
     return curve if any(pd.notna(v) for v in curve) else None
 
-@st.cache_data(show_spinner=True)
+@memoize()
 def compute_alltime_power_curve(
     filenames: List[str],
     weight: Optional[float] = None,
@@ -115,11 +123,11 @@ def compute_alltime_power_curve(
         fit_path = os.path.join(fit_dir, fname)
         power = extract_power_series(fit_path)
 
-        if not power or len(power) < 30:
+        if power.size < 30:
             continue
 
         if weight:
-            power = [p / weight for p in power]
+            power = power / weight
 
         curve = compute_power_curve(power)
         if not curve or all(v is None for v in curve):
@@ -134,7 +142,7 @@ def compute_alltime_power_curve(
     padded = [np.pad(c, (0, max_len - len(c)), constant_values=np.nan) for c in all_curves]
     return np.nanmax(padded, axis=0).tolist()
 
-@st.cache_data(show_spinner=True)
+@memoize()
 def compute_last_activity_power_curve(user: str, weight: Optional[float] = None) -> List[float]:
     from fit_processing.power_metrics_complete import extract_power_series, compute_power_curve
     from utils.user_paths import get_user_fit_dir
@@ -146,9 +154,9 @@ def compute_last_activity_power_curve(user: str, weight: Optional[float] = None)
         path = os.path.join(fit_dir, fname)
         power = extract_power_series(path)
 
-        if power and len(power) >= 30:
+        if power.size >= 30:
             if weight:
-                power = [p / weight for p in power]
+                power = power / weight
 
             curve = compute_power_curve(power)
             if curve and any(pd.notna(v) for v in curve):
@@ -158,7 +166,7 @@ def compute_last_activity_power_curve(user: str, weight: Optional[float] = None)
     return []
 
 def get_best_power_data(column_name: str) -> pd.DataFrame:
-    with sqlite3.connect(DB_PATH) as conn:
+    with read_connection() as conn:
         return pd.read_sql_query(f"""
             SELECT start_time, {column_name} AS Power
             FROM activities
@@ -0,0 +1,90 @@
+# === Datei: stream_cache.py ===
+# Prozessweiter Cache für aus FIT-Dateien gelesene Datenströme (z. B. Leistung).
+# Schlüssel ist der Inhalts-Fingerabdruck der Datei (MD5 wie beim Import), nicht der Pfad:
+# Wird eine Datei am selben Pfad ersetzt, entsteht ein neuer Eintrag; identische Dateien
+# unter verschiedenen Pfaden teilen sich einen. Ströme liegen kompakt als float32-Arrays
+# (4 Byte pro Sekunde statt ~32 Byte je Python-float in einer Liste) mit Speicherbudget
+# und LRU-Verdrängung.
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_STREAM_BYTES = int(os.environ.get("STREAM_CACHE_MB", 256)) * 1024 * 1024
+MAX_FINGERPRINTS = 20000
+
+_streams = OrderedDict()        # (Fingerabdruck, Strom) → float32-Array
+_fingerprints = OrderedDict()   # Pfad → ((mtime_ns, Größe), MD5)
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+_EMPTY = np.empty(0, dtype=np.float32)
+_EMPTY.flags.writeable = False
+
+
+def file_fingerprint(path: str) -> str:
+    """MD5 des Dateiinhalts; wird je Pfad bis zur nächsten Änderung (mtime/Größe) gemerkt."""
+    info = os.stat(path)
+    version = (info.st_mtime_ns, info.st_size)
+    with _lock:
+        known = _fingerprints.get(path)
+        if known and known[0] == version:
+            _fingerprints.move_to_end(path)
+            return known[1]
+
+    with open(path, "rb") as f:
+        digest = hashlib.md5(f.read()).hexdigest()
+
+    with _lock:
+        _fingerprints[path] = (version, digest)
+        while len(_fingerprints) > MAX_FINGERPRINTS:
+            _fingerprints.popitem(last=False)
+    return digest
+
+
+def get_stream(path: str, name: str, parser) -> np.ndarray:
+    """
+    Liefert den Strom `name` einer FIT-Datei aus dem Cache oder parst ihn mit `parser(path)`.
+    Das Ergebnis ist ein schreibgeschütztes float32-Array (leer, wenn kein gültiger Strom
+    oder die Datei nicht lesbar ist – wie zuvor beim direkten Parsen).
+    """
+    try:
+        key = (file_fingerprint(path), name)
+    except OSError as e:
+        print(f"⚠️ FIT-Datei nicht lesbar ({path}): {e}")
+        return _EMPTY
+    with _lock:
+        stream = _streams.get(key)
+        if stream is not None:
+            _streams.move_to_end(key)
+            _stats["hits"] += 1
+            return stream
+        _stats["misses"] += 1
+
+    stream = np.asarray(parser(path), dtype=np.float32)
+    stream.flags.writeable = False
+
+    with _lock:
+        if key not in _streams and stream.nbytes <= MAX_STREAM_BYTES:
+            _streams[key] = stream
+            _stats["bytes"] += stream.nbytes
+            while _stats["bytes"] > MAX_STREAM_BYTES:
+                _, evicted = _streams.popitem(last=False)
+                _stats["bytes"] -= evicted.nbytes
+                _stats["evictions"] += 1
+    return stream
+
+
+def stream_cache_stats() -> dict:
+    """Treffer, Fehlzugriffe, Verdrängungen und Speicherbelegung des Stream-Caches."""
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "entries": len(_streams),
+            "max_bytes": MAX_STREAM_BYTES,
+            "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else None,
+        }
@@ -1,8 +1,10 @@
 import os
 import json
+import numpy as np
 import pandas as pd
 from utils.settings_access import get_setting
-from utils.user_paths import get_user_cache_path, get_current_user
+from utils.user_paths import get_user_cache_path, get_user_cache_write_path, get_current_user
+from utils.cache_io import write_json
 
 
 # Garmin/Firstbeat Modellprinzipien (2014): VO₂max-Schätzung basiert auf NP/HR-Ratio während intensiver Einheiten
@@ -24,6 +26,127 @@ def validate_vo2max(vo2_rel: float, vo2_abs: float, last_vals: list, hr: float,
             return False
     return True
 
+FACTOR_PEAK = 23.0
+DRIFT_PER_DAY = -0.03
+SMOOTHING_WINDOW = 5
+NS_PER_DAY = 86_400_000_000_000
+
+def _static_validity(vo2_abs: np.ndarray, weight: float, hr: np.ndarray, np_val: np.ndarray) -> np.ndarray:
+    """Zustandsunabhängiger Teil von `validate_vo2max` als Array-Maske."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vo2_rel = vo2_abs / weight
+        return (vo2_rel >= 40) & (vo2_rel <= 75) & ~(hr < 90) & ~(np_val / hr > 3.0)
+
+def _stage_arrays(df: pd.DataFrame, weight: float, max_hr: float) -> dict:
+    """
+    Berechnet Kandidatenwerte und Eignungsmasken aller drei Stufen vektorisiert.
+    Stufe 3 hängt vom letzten gültigen Wert ab und liefert daher nur ihre Eignung.
+    """
+    def col(name):
+        return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype="float64") if name in df else np.full(len(df), np.nan)
+
+    np_val, hr, if_val, dur = col("normalized_power"), col("avg_heart_rate"), col("intensity_factor"), col("duration")
+    p5, p10 = col("max_5min_power"), col("max_10min_power")
+    complete = ~np.isnan(np_val) & ~np.isnan(hr) & ~np.isnan(if_val)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # 1. Stufe: NP/HF-Verhältnis intensiver, kurzer Einheiten
+        stage1 = complete & (if_val >= 0.75) & (dur >= 300) & (dur <= 1500) & (hr / max_hr >= 0.75)
+        c1 = (np_val / hr) * if_val * weight * FACTOR_PEAK
+        ok1 = stage1 & _static_validity(c1, weight, hr, np_val)
+
+        # 2. Stufe; Midgley et al. (2007): VO₂max ≈ 15 × (maximale 5min-Leistung) / Körpergewicht
+        c2 = [((15 * p) / weight) * weight for p in (p5, p10)]
+        ok2 = [~np.isnan(p) & (p > 0) & _static_validity(c, weight, hr, np_val) for p, c in zip((p5, p10), c2)]
+
+        # 3. Stufe: Fortschreibung bei langen, moderaten Einheiten
+        stage3 = complete & (if_val >= 0.6) & (dur >= 1500) & (hr / max_hr >= 0.65)
+        hr_ok = ~(hr < 90) & ~(np_val / hr > 3.0)
+
+    return {"c1": c1, "ok1": ok1, "c2": c2, "ok2": ok2, "stage3": stage3 & hr_ok}
+
+def _run_stages(ts_ns: np.ndarray, arrays: dict, weight: float, state: dict) -> list:
+    """
+    Zustandsbehafteter Durchlauf (Validierung gegen die letzten Werte + Glättung).
+    Arbeitet nur noch auf vorberechneten Arrays; `state` wird fortgeschrieben.
+    """
+    valid = state["valid_values"]
+    last_ns = state.get("last_result_ns")
+    results = []
+    c1, ok1, stage3 = arrays["c1"], arrays["ok1"], arrays["stage3"]
+    (c2a, c2b), (ok2a, ok2b) = arrays["c2"], arrays["ok2"]
+
+    def dynamic_ok(v):
+        if not valid:
+            return True
+        avg = sum(valid[-3:]) / min(3, len(valid))
+        return not abs(v - avg) > 400
+
+    def accept(i, v, smooth=True):
+        nonlocal last_ns
+        if smooth and valid:
+            v = sum(valid[-2:] + [v]) / min(3, len(valid) + 1)
+        results.append((int(ts_ns[i]), round(v, 1)))
+        valid.append(v)
+        last_ns = int(ts_ns[i])
+
+    for i in range(len(ts_ns)):
+        if ok1[i] and dynamic_ok(c1[i]):
+            accept(i, float(c1[i]))
+            continue
+        if ok2a[i] and dynamic_ok(c2a[i]):
+            accept(i, float(c2a[i]))
+            continue
+        if ok2b[i] and dynamic_ok(c2b[i]):
+            accept(i, float(c2b[i]))
+            continue
+        if stage3[i] and valid:
+            decay_days = (int(ts_ns[i]) - last_ns) // NS_PER_DAY
+            est = max(0, valid[-1] + (DRIFT_PER_DAY * decay_days))
+            if 40 <= est / weight <= 75 and dynamic_ok(est):
+                accept(i, est, smooth=False)
+
+    state["valid_values"] = valid[-3:]
+    state["last_result_ns"] = last_ns
+    return results
+
+def _smooth(raw: list) -> list:
+    """Zentrierter gleitender Median (Fenster 5) über die Rohwerte."""
+    if not raw:
+        return []
+    ts = pd.to_datetime([t for t, _ in raw])
+    values = pd.Series([v for _, v in raw]).rolling(window=SMOOTHING_WINDOW, center=True, min_periods=1).median()
+    return [{"timestamp": t.isoformat(), "vo2max": round(v, 1)} for t, v in zip(ts, values)]
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["start_time"] = pd.to_datetime(df["start_time"])
+    return df.sort_values("start_time", kind="stable")
+
+def estimate_vo2max_incremental(df: pd.DataFrame, weight: float, max_hr: float, state: dict = None):
+    """
+    Schätzt VO₂max für neue Aktivitäten und setzt dabei eine bestehende Zeitreihe fort.
+
+    `state` enthält die für die Validierung nötigen letzten Werte sowie die Rohwerte
+    der bisherigen Reihe; ohne `state` wird die gesamte Historie verarbeitet.
+
+    Returns:
+        (results, state) – geglättete Zeitreihe und fortgeschriebener Zustand
+    """
+    state = dict(state) if state else {"valid_values": [], "last_result_ns": None, "raw": [], "processed": 0}
+    state["valid_values"] = list(state["valid_values"])
+    df = _prepare(df)
+
+    if not df.empty:
+        ts_ns = df["start_time"].to_numpy(dtype="datetime64[ns]").astype("int64")
+        raw_new = _run_stages(ts_ns, _stage_arrays(df, weight, max_hr), weight, state)
+        state["raw"] = list(state["raw"]) + [[t, v] for t, v in raw_new]
+        state["processed"] = state.get("processed", 0) + len(df)
+        state["last_start_time"] = df["start_time"].iloc[-1].isoformat()
+
+    state["weight"], state["max_hr"] = weight, max_hr
+    return _smooth(state["raw"]), state
+
 def estimate_vo2max_from_dataframe(df: pd.DataFrame, user: str = None) -> list:
     weight = get_setting("weight", 70.0, user=user)
     max_hr = get_setting("hr_max", 190, user=user)
@@ -31,77 +154,38 @@ def estimate_vo2max_from_dataframe(df: pd.DataFrame, user: str = None) -> list:
     if weight <= 0 or max_hr <= 0:
         raise ValueError("Ungültige Benutzerparameter: Gewicht oder maximale HF nicht gesetzt.")
 
-    df = df.copy()
-    df["start_time"] = pd.to_datetime(df["start_time"])
-    df = df.sort_values("start_time")
+    results, _ = estimate_vo2max_incremental(df, weight, max_hr)
+    return results
 
-    results = []
-    valid_values = []
-    factor_peak = 23.0
-    drift_per_day = -0.03
-
-    for _, row in df.iterrows():
-        ts = row["start_time"]
-        np_val = row.get("normalized_power")
-        hr = row.get("avg_heart_rate")
-        if_val = row.get("intensity_factor")
-        dur = row.get("duration")
-        p5 = row.get("max_5min_power")
-        p10 = row.get("max_10min_power")
-
-        estimation_done = False
-# 1. Stufe
-        if all(pd.notna([np_val, hr, if_val])) and if_val >= 0.75 and 300 <= dur <= 1500 and hr / max_hr >= 0.75:
-            vo2_abs = (np_val / hr) * if_val * weight * factor_peak
-            vo2_rel = vo2_abs / weight
-            if validate_vo2max(vo2_rel, vo2_abs, valid_values, hr, np_val):
-                vo2_abs = (sum(valid_values[-2:] + [vo2_abs]) / min(3, len(valid_values) + 1)) if valid_values else vo2_abs
-                results.append({"timestamp": ts, "vo2max": round(vo2_abs, 1)})
-                valid_values.append(vo2_abs)
-                estimation_done = True
-                continue
-# 2. Stufe; Midgley et al. (2007): VO₂max ≈ 15 × (maximale 5min-Leistung) / Körpergewicht
-        for p_peak in [p5, p10]:
-            if pd.notna(p_peak) and p_peak > 0:
-                vo2_rel_peak = (15 * p_peak) / weight
-                vo2_abs_peak = vo2_rel_peak * weight
-                if validate_vo2max(vo2_rel_peak, vo2_abs_peak, valid_values, hr, np_val):
-                    vo2_abs_peak = (sum(valid_values[-2:] + [vo2_abs_peak]) / min(3, len(valid_values) + 1)) if valid_values else vo2_abs_peak
-                    results.append({"timestamp": ts, "vo2max": round(vo2_abs_peak, 1)})
-                    valid_values.append(vo2_abs_peak)
-                    estimation_done = True
-                    break
-
-        if not estimation_done:
-            if all(pd.notna([np_val, hr, if_val])) and if_val >= 0.6 and dur >= 1500 and hr / max_hr >= 0.65:
-                if valid_values:
-                    decay_days = (ts - pd.to_datetime(results[-1]["timestamp"])).days if results else 0
-                    est_vo2 = max(0, valid_values[-1] + (drift_per_day * decay_days))
-                    vo2_rel_est = est_vo2 / weight
-                    if validate_vo2max(vo2_rel_est, est_vo2, valid_values, hr, np_val):
-                        results.append({"timestamp": ts, "vo2max": round(est_vo2, 1)})
-                        valid_values.append(est_vo2)
-
-    df_result = pd.DataFrame(results)
-    if not df_result.empty:
-        df_result["timestamp"] = pd.to_datetime(df_result["timestamp"])
-        df_result = df_result.sort_values("timestamp")
-        df_result["vo2max"] = df_result["vo2max"].rolling(window=5, center=True, min_periods=1).median()
-        results = [{"timestamp": ts.isoformat(), "vo2max": round(vo2, 1)} for ts, vo2 in zip(df_result["timestamp"], df_result["vo2max"])]
+def load_vo2max_state(user: str = None) -> dict:
+    """Lädt den gespeicherten Schätzerzustand (oder None)."""
+    path = get_user_cache_path("vo2max_state.json", user=user or get_current_user())
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[WARN] VO₂max-Zustand nicht lesbar ({path}): {e}")
+        return None
 
-    return results
+def save_vo2max_state(state: dict, user: str = None):
+    """Speichert den Schätzerzustand in dieselbe Generation wie die Zeitreihe."""
+    path = get_user_cache_write_path("vo2max_state.json", user=user or get_current_user())
+    write_json(path, state)
 
-def save_vo2max_time_series(results, user: str = None, path: str = None):
+def save_vo2max_time_series(results, user: str = None, path: str = None) -> bool:
+    """Speichert die Zeitreihe; True nur bei erfolgreichem Schreiben."""
     if not results:
         print("[WARN] Keine VO₂max-Daten zum Speichern übergeben.")
-        return
+        return False
 
     try:
         if path is None:
-            path = get_vo2max_cache_path(user=user)
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w") as f:
-            json.dump(results, f, indent=2)
+            path = get_user_cache_write_path("vo2max_time_series.json", user=user or get_current_user())
+        write_json(path, results, indent=2)
         print(f"[OK] VO₂max-Zeitreihe gespeichert: {len(results)} Einträge → {path}")
+        return True
     except Exception as e:
         print(f"[ERROR] Fehler beim Speichern der VO₂max-Datei: {e}")
+        return False
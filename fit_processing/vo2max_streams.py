@@ -0,0 +1,98 @@
+import numpy as np
+from fitparse import FitFile
+
+# ACSM (2013): VO₂ Radfahren (ml/kg/min) ≈ 10.8 · W/kg + 7
+# Swain D. P. & Leutholtz B. C. (1997): %HF-Reserve ≈ %VO₂-Reserve – lineare Beziehung zwischen
+# Leistung und HF erlaubt die Hochrechnung einer submaximalen Belastung auf VO₂max.
+EFFORT_DURATIONS = (180, 300, 480)   # 3, 5 und 8 Minuten
+MAX_EFFORT_CV = 0.10                 # max. Variationskoeffizient der Leistung ("steady")
+MIN_HRR_FRACTION = 0.65              # Mindestanteil der HF-Reserve für belastbare Hochrechnung
+VO2_REST = 3.5                       # ml/kg/min
+
+
+def load_power_hr_streams(filepath: str):
+    """Liest Leistung und HF als zeitlich ausgerichtete 1-Hz-Arrays (fehlende Werte = NaN)."""
+    power, hr = [], []
+    for rec in FitFile(filepath).get_messages("record"):
+        p = rec.get_value("power")
+        h = rec.get_value("heart_rate")
+        power.append(float(p) if isinstance(p, (int, float)) else np.nan)
+        hr.append(float(h) if isinstance(h, (int, float)) else np.nan)
+    return np.array(power, dtype="float64"), np.array(hr, dtype="float64")
+
+
+def _window_means(values: np.ndarray, window: int) -> np.ndarray:
+    """Gleitende Mittelwerte aller vollständigen Fenster über Präfixsummen."""
+    csum = np.concatenate([[0.0], np.cumsum(values)])
+    return (csum[window:] - csum[:-window]) / window
+
+
+def find_steady_efforts(power: np.ndarray, hr: np.ndarray, durations=EFFORT_DURATIONS,
+                        max_cv: float = MAX_EFFORT_CV) -> list:
+    """
+    Sucht je Dauer die leistungsstärkste gleichmäßige Belastung (Variationskoeffizient ≤ `max_cv`,
+    vollständige HF-Daten). Die HF wird über die zweite Fensterhälfte gemittelt (HF-Verzögerung).
+
+    Returns:
+        Liste von Dicts mit duration, start, power, hr
+    """
+    efforts = []
+    n = len(power)
+    if n == 0 or len(hr) != n:
+        return efforts
+
+    valid = ~np.isnan(power) & ~np.isnan(hr)
+    p = np.where(valid, power, 0.0)
+    h = np.where(valid, hr, 0.0)
+
+    for window in durations:
+        if n < window:
+            continue
+        mean_p = _window_means(p, window)
+        mean_p2 = _window_means(p * p, window)
+        complete = _window_means(valid.astype("float64"), window) >= 1.0
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std_p = np.sqrt(np.maximum(mean_p2 - mean_p ** 2, 0.0))
+            steady = complete & (mean_p > 0) & (std_p / mean_p <= max_cv)
+        if not steady.any():
+            continue
+
+        start = int(np.argmax(np.where(steady, mean_p, -np.inf)))
+        half = window // 2
+        efforts.append({
+            "duration": window,
+            "start": start,
+            "power": round(float(mean_p[start]), 1),
+            "hr": round(float(h[start + half:start + window].mean()), 1),
+        })
+
+    return efforts
+
+
+def estimate_vo2max_from_efforts(efforts: list, weight: float, hr_max: float, hr_rest: float):
+    """
+    Schätzt die relative VO₂max (ml/kg/min) aus den gleichmäßigen Belastungen einer Fahrt:
+    VO₂ der Belastung aus der Leistung, Hochrechnung über den Anteil der HF-Reserve.
+    Liefert den Median der Einzelschätzungen oder None.
+    """
+    if not efforts or weight <= 0 or hr_max <= hr_rest:
+        return None
+
+    power = np.array([e["power"] for e in efforts], dtype="float64")
+    hr = np.array([e["hr"] for e in efforts], dtype="float64")
+    hrr = (hr - hr_rest) / (hr_max - hr_rest)
+    usable = (hrr >= MIN_HRR_FRACTION) & (hrr <= 1.0)
+    if not usable.any():
+        return None
+
+    vo2_effort = 10.8 * power[usable] / weight + 7.0
+    vo2max = VO2_REST + (vo2_effort - VO2_REST) / hrr[usable]
+    vo2max = vo2max[(vo2max >= 30) & (vo2max <= 90)]
+    return round(float(np.median(vo2max)), 1) if vo2max.size else None
+
+
+def scan_activity_efforts(filepath: str) -> list:
+    """Worker-Einstieg: liest eine FIT-Datei und liefert ihre gleichmäßigen Belastungen."""
+    power, hr = load_power_hr_streams(filepath)
+    return find_steady_efforts(power, hr)
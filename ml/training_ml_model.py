@@ -14,6 +14,7 @@ if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
 from utils.user_paths import get_user_cache_path, get_user_cache_dir
+from utils.cache_io import read_table
 
 def train_model_for_user(user: str):
     # === Benutzerpfade
@@ -23,30 +24,18 @@ def train_model_for_user(user: str):
 
     # === Pfade zu Input- und Output-Dateien
     activities_path = get_user_cache_path("activities_with_manual_labels.csv", user)
-    eff_path = get_user_cache_path("efficiency_factors.csv", user)
-    max_paths = {
-        "max_5min_power": get_user_cache_path("max_5min_power.json", user),
-        "max_10min_power": get_user_cache_path("max_10min_power.json", user),
-        "max_20min_power": get_user_cache_path("max_20min_power.json", user),
-    }
+    eff_path = get_user_cache_path("efficiency_factors.npz", user)
+    bests_path = get_user_cache_path("power_bests_time_series.npz", user)
+    max_columns = ["max_5min_power", "max_10min_power", "max_20min_power"]
     model_path = os.path.join(ml_dir, "saved_model.pkl")
     scaler_path = os.path.join(ml_dir, "saved_scaler.pkl")
     features_path = os.path.join(ml_dir, "feature_names.json")
 
-    def load_power_json(path, col_name):
+    def load_power_bests(col_name):
         try:
-            df = pd.read_json(path)
-            for tcol in ["timestamp", "start_time", "date", "time"]:
-                if tcol in df.columns:
-                    df["start_time"] = pd.to_datetime(df[tcol])
-                    break
-            else:
-                print(f"⚠️ Keine Zeitspalte in {os.path.basename(path)} erkannt.")
-                return pd.DataFrame()
-            df = df.rename(columns={"Power": col_name})
-            return df[["start_time", col_name]]
+            return read_table(bests_path, columns=["start_time", col_name]).dropna()
         except Exception as e:
-            print(f"❌ Fehler beim Laden von {path}: {e}")
+            print(f"❌ Fehler beim Laden von {bests_path}: {e}")
             return pd.DataFrame()
 
     if not os.path.exists(activities_path):
@@ -55,14 +44,13 @@ def train_model_for_user(user: str):
     df["start_time"] = pd.to_datetime(df["start_time"])
 
     # === Effizienzfaktoren (optional)
-    eff = pd.read_csv(eff_path) if os.path.exists(eff_path) else pd.DataFrame()
+    eff = read_table(eff_path) if os.path.exists(eff_path) else pd.DataFrame()
     if not eff.empty and "start_time" in eff.columns:
-        eff["start_time"] = pd.to_datetime(eff["start_time"])
         df = pd.merge_asof(df.sort_values("start_time"), eff.sort_values("start_time"), on="start_time", direction="nearest")
 
     # === Power-Zusatzdaten (optional)
-    for label, path in max_paths.items():
-        addon = load_power_json(path, col_name=label)
+    for label in max_columns:
+        addon = load_power_bests(label)
         if not addon.empty:
             df = pd.merge_asof(df.sort_values("start_time"), addon.sort_values("start_time"), on="start_time", direction="nearest")
 
@@ -1,12 +1,12 @@
 import os
 import streamlit as st
 import numpy as np
-import json
 import plotly.graph_objects as go
 import plotly.io as pio
 
 from utils.user_paths import get_user_cache_path, get_current_user
-from cache_modules.cache_critical_power import save_critical_power
+from utils.artifact_cache import load_artifact
+from fit_processing.build_data_cache_new import rebuild_modules
 
 # === Custom Plotly Theme laden ===
 pio.templates.default = "training_dashboard_light"
@@ -38,8 +38,7 @@ def render():
         return
 
     try:
-        with open(cp_path, "r") as f:
-            model = json.load(f)
+        model = load_artifact("critical_power.json", user)
     except Exception as e:
         st.error(f"Fehler beim Laden der CP-Daten: {e}")
         return
@@ -131,9 +130,12 @@ def render():
     st.markdown("<div style='text-align: right; margin-top: 2rem;'>", unsafe_allow_html=True)
     if st.button("Neuberechnen", key="refresh_cp", help="Cache für Critical Power neu berechnen"):
         try:
-            save_critical_power(user)
-            st.success("✅ CP-Modell erfolgreich neu berechnet.")
-            st.experimental_rerun()
+            errors = rebuild_modules(user, ["cp_model"])
+            if errors:
+                st.error(f"❌ Fehler bei Neuberechnung: {errors['cp_model']}")
+            else:
+                st.success("✅ CP-Modell erfolgreich neu berechnet.")
+                st.experimental_rerun()
         except Exception as e:
             st.error(f"❌ Fehler bei Neuberechnung: {e}")
     st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
@@ -1,12 +1,14 @@
 import os
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
-from utils.user_paths import get_user_cache_path, get_current_user
+from utils.user_paths import get_current_user
+from utils.artifact_cache import load_artifact
+from cache_modules.cache_efficiency import load_ef_stream
 
 def render():
     user = get_current_user()
-    cache_path = get_user_cache_path("efficiency_factors.csv", user)
 
     st.markdown("""
         <div style='font-size: 1.4rem; font-weight: 600; margin-bottom: 0.5rem;'>
@@ -15,7 +17,7 @@ def render():
     """, unsafe_allow_html=True)
 
     try:
-        df = pd.read_csv(cache_path, parse_dates=["start_time"])
+        df = load_artifact("efficiency_factors.npz", user)
     except Exception as e:
         st.error(f"❌ Fehler beim Laden des EF-Caches: {e}")
         return
@@ -63,10 +65,12 @@ def render():
 
     # Metriken
     st.markdown("### Übersicht")
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     col1.metric("Ø EF (alle)", f"{df['EF'].mean():.2f}")
     col2.metric("Letzter EF", f"{last_ef:.2f}")
-    col3.markdown(
+    decoupling = df["decoupling"].dropna() if "decoupling" in df.columns else pd.Series(dtype=float)
+    col3.metric("Ø Entkopplung", f"{decoupling.mean():.1f} %" if not decoupling.empty else "–")
+    col4.markdown(
         f"""<div style='padding: 1em; border-radius: 8px;
                     background-color:{color}; color:{text_color};
                     text-align:center; font-weight:600; font-size:1.1rem'>
@@ -97,15 +101,63 @@ def render():
     )
     st.plotly_chart(fig, use_container_width=True)
 
+    # Aerobe Entkopplung je Einheit
+    if not decoupling.empty:
+        df_dec = df.dropna(subset=["decoupling"])
+        fig_dec = go.Figure()
+        fig_dec.add_trace(go.Bar(
+            x=df_dec["start_time"],
+            y=df_dec["decoupling"],
+            name="Entkopplung",
+            marker_color=["#4CAF50" if v < 5 else "#E31A1C" for v in df_dec["decoupling"]],
+            hovertemplate="📅 %{x|%d.%m.%Y}<br>Pw:HR: %{y:.1f} %<extra></extra>"
+        ))
+        fig_dec.add_hline(y=5, line_dash="dot", line_color="#999999")
+        fig_dec.update_layout(
+            title="Aerobe Entkopplung (Pw:HR) je Einheit",
+            xaxis_title="Datum",
+            yaxis_title="Entkopplung (%)",
+            template="training_dashboard_light",
+            height=320,
+            margin=dict(t=40, b=30)
+        )
+        st.plotly_chart(fig_dec, use_container_width=True)
+
+        # EF-Verlauf innerhalb der letzten Einheit mit Stream
+        last_ride = df_dec.iloc[-1]
+        # Caches vor Version 3 des Moduls enthalten noch keine Aktivitäts-ID
+        stream = load_ef_stream(user, last_ride["id"]) if "id" in df_dec.columns else np.empty(0)
+        if stream.size:
+            fig_stream = go.Figure(go.Scatter(
+                x=list(range(len(stream))),
+                y=stream,
+                mode="lines",
+                line=dict(color="#1F78B4", width=2),
+                hovertemplate="Minute %{x}<br>EF: %{y:.2f}<extra></extra>"
+            ))
+            fig_stream.update_layout(
+                title=f"EF-Verlauf innerhalb der Einheit vom {last_ride['start_time']:%d.%m.%Y} (5-min-Fenster)",
+                xaxis_title="Minute",
+                yaxis_title="EF",
+                template="training_dashboard_light",
+                height=300,
+                margin=dict(t=40, b=30)
+            )
+            st.plotly_chart(fig_stream, use_container_width=True)
+
     # Tabelle
     st.markdown("### 📋 Aktivitäten mit EF")
-    df_table = df[["start_time", "normalized_power", "avg_heart_rate", "intensity_factor", "EF"]].copy()
+    table_cols = ["start_time", "normalized_power", "avg_heart_rate", "intensity_factor", "EF"]
+    if "decoupling" in df.columns:
+        table_cols.append("decoupling")
+    df_table = df[table_cols].copy()
     df_table["start_time"] = df_table["start_time"].dt.strftime("%d.%m.%Y")
     df_table = df_table.rename(columns={
         "start_time": "Datum",
         "normalized_power": "NP",
         "avg_heart_rate": "HFavg",
-        "intensity_factor": "IF"
+        "intensity_factor": "IF",
+        "decoupling": "Pw:HR (%)"
     }).round(2)
     st.dataframe(df_table.sort_values("Datum", ascending=False), use_container_width=True)
 
@@ -121,6 +173,9 @@ def render():
 
         <strong>Wann nützlich?</strong> Vor allem bei <code>IF &lt; 0.75</code> (Grundlagenfahrten)
 
+        Die <strong>aerobe Entkopplung (Pw:HR)</strong> vergleicht den EF der ersten mit dem der zweiten Hälfte einer Einheit.
+        Werte unter 5&nbsp;% zeigen, dass die Herzfrequenz bei gleicher Leistung stabil bleibt.
+
         <strong>Typische Interpretation:</strong>
         <ul style='margin-top: 0.5em;'>
             ✅ <strong>Höherer EF:</strong> Bessere aerobe Fitness<br>
@@ -3,22 +3,20 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from utils.user_paths import get_user_cache_path, get_current_user
+from utils.user_paths import get_current_user
+from utils.artifact_cache import load_artifact
 
 def fetch_training_load_from_cache(user):
-    path = get_user_cache_path("training_load.csv")
     try:
-        df = pd.read_csv(path)
-        df["date"] = pd.to_datetime(df["date"])
+        df = load_artifact("training_load.npz", user)
         return df.rename(columns={"date": "start_time"})
     except Exception as e:
         st.error(f"❌ Fehler beim Laden des Training Load Cache: {e}")
         return pd.DataFrame()
 
 def fetch_recent_activity_metrics(user):
-    path = get_user_cache_path("efficiency_factors.csv")
     try:
-        df = pd.read_csv(path, parse_dates=["start_time"])
+        df = load_artifact("efficiency_factors.npz", user)
         return df
     except Exception as e:
         st.error(f"❌ Fehler beim Laden des EF-Caches: {e}")
@@ -64,6 +62,7 @@ def render():
     ef_prev = prev["ef"].mean() if "ef" in prev.columns and not prev.empty else 0
     ef_trend = ef_recent - ef_prev
     if_recent = recent["intensity_factor"].mean() if "intensity_factor" in recent.columns and not recent.empty else 0
+    dec_recent = recent["decoupling"].mean() if "decoupling" in recent.columns and not recent.empty else None
 
     status, status_msg, color = classify_training_state(latest_tsb, ef_trend, if_recent)
 
@@ -74,10 +73,11 @@ def render():
         <div style='margin-top: 0.5rem; font-size: 0.95rem; color: #444;'>{status_msg}</div>
     """, unsafe_allow_html=True)
 
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     col1.metric("TSB (Form)", f"{latest_tsb:.1f}")
     col2.metric("EF-Trend (7d)", f"{ef_trend:.2f}")
     col3.metric("Ø IF (7d)", f"{if_recent:.2f}")
+    col4.metric("Ø Entkopplung (7d)", f"{dec_recent:.1f} %" if pd.notna(dec_recent) else "–")
 
     load_plot = load_df.copy().sort_values("start_time")
     load_plot["TSB_Smooth"] = load_plot["tsb"].rolling(3, min_periods=1).mean()
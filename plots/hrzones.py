@@ -1,12 +1,13 @@
 import os
-import sqlite3
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from streamlit_option_menu import option_menu
-from utils.settings_access import get_setting, DB_PATH
+from utils.settings_access import get_setting
 from utils.user_paths import get_user_cache_path, get_user_fit_path, get_current_user
+from utils.artifact_cache import load_artifact
 from fit_processing.heart_rate_metrics import compute_hr_zones
+from utils.database import read_connection
 
 # === HR-Zonen – 5 Zonen Modell (relativ zu Max HR) ===
 MAX_HR = get_setting("hr_max", default=190)
@@ -70,7 +71,7 @@ def render():
 
     if tab_selection == "Letztes Training":
         try:
-            with sqlite3.connect(DB_PATH) as conn:
+            with read_connection() as conn:
                 df = pd.read_sql_query(
                     "SELECT file_name, start_time FROM activities WHERE user_id = ? ORDER BY start_time DESC LIMIT 1",
                     conn, params=(user,)
@@ -139,7 +140,7 @@ def render():
             st.warning("⚠️ HF-Zonen-Cachedatei nicht gefunden.")
             return
         try:
-            df_total = pd.read_csv(cache_path)
+            df_total = load_artifact("hr_zones_summary.csv", user)
         except Exception as e:
             st.error(f"❌ Fehler beim Laden der HF-Zonen-Cachedaten: {e}")
             return
@@ -1,6 +1,11 @@
+import numpy as np
+import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
 from fit_processing.metrics_calc_new import get_training_load_df
+from fit_processing.pmc_model import (
+    DEFAULT_WEEK_SHAPE, expand_weekly_template, project_training_load, search_taper_plan
+)
 
 def render():
     df = get_training_load_df()  # ✅ Kein Argument übergeben!
@@ -84,4 +89,81 @@ def render():
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5)
     )
 
-    st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+    st.plotly_chart(fig, use_container_width=True)
+
+    render_projection(df)
+
+def render_projection(df):
+    """Prognose von CTL/ATL/TSB für einen geplanten Wochenumfang inkl. Taper-Suche bis zum Renntag."""
+    hist = df.dropna(subset=["CTL", "ATL"])
+    if hist.empty:
+        return
+
+    last = hist.iloc[-1]
+    start = pd.Timestamp(last["date"]).normalize() + pd.Timedelta(days=1)
+
+    with st.expander("🔮 Prognose & Tapering", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        weekly_tss = col1.number_input("Geplanter Wochen-TSS", min_value=0, max_value=2000, value=400, step=10)
+        race_date = col2.date_input("Renntag", value=(start + pd.Timedelta(weeks=8)).date())
+        target_tsb = col3.number_input("Ziel-TSB am Renntag", min_value=-30.0, max_value=40.0, value=10.0, step=1.0)
+
+        days = (pd.Timestamp(race_date) - start).days
+        if days < 1:
+            st.warning("Der Renntag muss nach dem letzten Tag der Historie liegen.")
+            return
+
+        base_plan = expand_weekly_template(np.array(DEFAULT_WEEK_SHAPE) * weekly_tss, start, days)
+        projection = project_training_load(base_plan, last["CTL"], last["ATL"], start)
+        best = search_taper_plan(base_plan, last["CTL"], last["ATL"], target_tsb)
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=hist["date"].tail(90), y=hist["TSB"].tail(90),
+            mode="lines", name="TSB (Historie)",
+            line=dict(color="#33A02C", width=1.8)
+        ))
+        fig.add_trace(go.Scatter(
+            x=projection["date"], y=projection["tsb"],
+            mode="lines", name="TSB (Plan ohne Taper)",
+            line=dict(color="#999999", width=1.6, dash="dot")
+        ))
+        fig.add_trace(go.Scatter(
+            x=projection["date"], y=projection["ctl"],
+            mode="lines", name="CTL (Plan ohne Taper)",
+            line=dict(color="#1F78B4", width=1.6, dash="dot")
+        ))
+
+        if best:
+            fig.add_trace(go.Scatter(
+                x=projection["date"], y=best["tsb"],
+                mode="lines", name="TSB (bester Taper)",
+                line=dict(color="#E31A1C", width=2.2)
+            ))
+            fig.add_trace(go.Scatter(
+                x=projection["date"], y=best["ctl"],
+                mode="lines", name="CTL (bester Taper)",
+                line=dict(color="#1F78B4", width=2.2)
+            ))
+
+        fig.update_layout(
+            title="Prognose bis zum Renntag",
+            xaxis_title="Datum",
+            yaxis_title="TSS-Werte",
+            template="training_dashboard_light",
+            hovermode="x unified",
+            margin=dict(t=50, b=40, l=60, r=20),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        if best:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("TSB am Renntag", f"{best['race_tsb']:.1f}")
+            col2.metric("CTL am Renntag", f"{best['race_ctl']:.1f}")
+            col3.metric("Taper", f"{best['taper_days']} Tage · {best['taper_factor']:.0%}")
+            st.caption(
+                f"Beste von {best['candidates']} Varianten · Aufbau mit {best['build_factor']:.0%} des Wochen-TSS, "
+                f"danach {best['taper_days']} Tage mit {best['taper_factor']:.0%} Umfang. "
+                "TSB am Renntag = Form vor der Rennbelastung."
+            )
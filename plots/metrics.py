@@ -1,13 +1,12 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.graph_objects as go
-from utils.settings_access import DB_PATH
 from fitparse import FitFile
 from fit_processing.power_zones import compute_power_zones
 from fit_processing.heart_rate_metrics import compute_hr_zones
 from utils.formatting import format_duration
 from utils.user_paths import get_current_user, get_user_fit_path
+from cache_modules.cache_helpers import load_activity_aggregates, load_activities_between
 
 def render():
     user = get_current_user()
@@ -18,35 +17,16 @@ def render():
         </div>
     """, unsafe_allow_html=True)
 
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("""
-        SELECT id, file_name, date(start_time) as date,
-               strftime('%Y-%W', start_time) as week,
-               tss,
-               normalized_power,
-               avg_power,
-               intensity_factor
-        FROM activities
-        WHERE user_id = ?
-        ORDER BY start_time
-    """, conn, params=(user,))
-    conn.close()
-
-    if df.empty:
+    # Wochenwerte aus der materialisierten Aggregattabelle (Bereichsabfrage über den Primärschlüssel)
+    weekly = load_activity_aggregates(user, period="week")
+
+    if weekly.empty:
         st.warning("Keine Metriken verfügbar.")
         return
 
-    df["date"] = pd.to_datetime(df["date"])
-    df["week_start"] = df["date"] - pd.to_timedelta(df["date"].dt.weekday, unit="D")
-    df["week_end"] = df["week_start"] + pd.Timedelta(days=6)
-    df["week_label"] = df["week_start"].dt.strftime("%Y-%m-%d") + " – " + df["week_end"].dt.strftime("%m-%d")
-
-    weekly = df.groupby(["week_start", "week_label"]).agg(
-        total_tss=("tss", "sum"),
-        avg_np=("normalized_power", "mean"),
-        avg_power=("avg_power", "mean"),
-        avg_if=("intensity_factor", "mean")
-    ).reset_index().sort_values("week_start")
+    weekly = weekly.rename(columns={"period_start": "week_start", "tss": "total_tss"})
+    weekly["week_end"] = weekly["week_start"] + pd.Timedelta(days=6)
+    weekly["week_label"] = weekly["week_start"].dt.strftime("%Y-%m-%d") + " – " + weekly["week_end"].dt.strftime("%m-%d")
 
     st.markdown("### Analyse auswählen")
     view_option = st.radio("", ["TSS-Verlauf", "Leistung", "IF & TSS"], horizontal=True)
@@ -145,8 +125,9 @@ def render():
 
     selected_week = st.selectbox("Woche auswählen", weekly["week_label"])
     selected_start = weekly.loc[weekly["week_label"] == selected_week, "week_start"].values[0]
-    selected_end = pd.to_datetime(selected_start) + pd.Timedelta(days=6)
-    week_df = df[(df["date"] >= pd.to_datetime(selected_start)) & (df["date"] <= selected_end)]
+    selected_start = pd.to_datetime(selected_start)
+    week_df = load_activities_between(user, selected_start, selected_start + pd.Timedelta(days=7))
+    week_df["date"] = pd.to_datetime(week_df["date"])
 
     st.markdown(f"### Aktivitäten in der Woche {selected_week}")
 
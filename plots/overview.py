@@ -3,13 +3,38 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from utils.formatting import format_duration
-from fit_processing.metrics_calc_new import update_training_load_table, get_training_load_df
+from fit_processing.metrics_calc_new import get_training_load_df
 from utils.live_extension import get_live_extension_rows
+from cache_modules.cache_helpers import load_activity_aggregates
+from fit_processing.activity_writer import existing_hashes
 from utils.user_paths import get_current_user, get_user_cache_path
+from utils.artifact_cache import load_artifact
+
+def load_weekly_totals(user, live_rows=None) -> pd.DataFrame:
+    """
+    Wochensummen aus der Aggregattabelle, ergänzt um noch nicht importierte Live-Aktivitäten.
+    Live-Zeilen, deren Datei inzwischen importiert ist, stecken bereits in den Aggregaten.
+    """
+    weeks = load_activity_aggregates(user, period="week")[["period_start", "count", "duration", "distance", "tss"]]
+    if live_rows is not None and not live_rows.empty and "file_hash" in live_rows:
+        live_rows = live_rows[~live_rows["file_hash"].isin(existing_hashes(user))]
+    if live_rows is None or live_rows.empty:
+        return weeks
+
+    live = live_rows.assign(start_time=pd.to_datetime(live_rows["start_time"], errors="coerce")).dropna(subset=["start_time"])
+    live["period_start"] = live["start_time"].dt.normalize() - pd.to_timedelta(live["start_time"].dt.weekday, unit="D")
+    live["count"] = 1
+    columns = ["count", "duration", "distance", "tss"]
+    live[columns] = live[columns].apply(pd.to_numeric, errors="coerce")
+    return (
+        pd.concat([weeks, live[["period_start"] + columns]], ignore_index=True)
+        .groupby("period_start", as_index=False)[columns].sum(min_count=1)
+        .sort_values("period_start")
+    )
 
 def render():
     user = get_current_user()
-    activities_path = get_user_cache_path("activities.csv")
+    activities_path = get_user_cache_path("activities.npz")
 
     st.markdown("""
         <h2 style='display: flex; align-items: center; gap: 0.5rem;'>
@@ -22,7 +47,7 @@ def render():
         return
 
     try:
-        df = pd.read_csv(activities_path, parse_dates=["start_time"])
+        df = load_artifact("activities.npz", user)
     except Exception as e:
         st.error(f"❗️ Fehler beim Laden des Aktivitäten-Caches: {e}")
         return
@@ -33,6 +58,7 @@ def render():
 
     df = df[df["start_time"].notna()]
 
+    live_rows = pd.DataFrame()
     live_key = "live_fit_paths_for_user_" + user
     if live_key in st.session_state:
         try:
@@ -47,13 +73,14 @@ def render():
         except Exception as e:
             st.error(f"⚠️ Fehler bei Live-Ergänzung: {e}")
 
+    weeks = load_weekly_totals(user, live_rows)
     start_of_week = pd.Timestamp.today().normalize() - pd.to_timedelta(pd.Timestamp.today().weekday(), unit='d')
-    weekly = df[df["start_time"] >= start_of_week].copy()
+    current = weeks[weeks["period_start"] == start_of_week]
 
-    dur_sec = pd.to_numeric(weekly["duration"], errors="coerce").sum()
-    tss_sum = pd.to_numeric(weekly["tss"], errors="coerce").sum()
-    dist_sum = pd.to_numeric(weekly["distance"], errors="coerce").sum()
-    count = len(weekly)
+    dur_sec = current["duration"].sum()
+    tss_sum = current["tss"].sum()
+    dist_sum = current["distance"].sum()
+    count = int(current["count"].sum())
     dur_str = format_duration(dur_sec) if pd.notna(dur_sec) and dur_sec > 0 else "–"
 
     with st.container():
@@ -64,7 +91,6 @@ def render():
         col4.metric("→ Distanz (km)", round(dist_sum, 1) if pd.notna(dist_sum) else "–")
 
     try:
-        update_training_load_table(user)
         df_load = get_training_load_df(user)
         df_load = df_load[df_load[["CTL", "ATL", "TSB"]].notna().all(axis=1)]
 
@@ -96,13 +122,12 @@ def render():
         st.error(f"❗️ Fehler bei Trainingszustand-Berechnung: {e}")
 
     try:
-        df["week"] = df["start_time"].dt.isocalendar().week
-        df["year"] = df["start_time"].dt.isocalendar().year
-        df["label"] = df["year"].astype(str) + "-W" + df["week"].astype(str).str.zfill(2)
-
-        tss_df = df.groupby("label")["tss"].sum(min_count=1).reset_index().rename(columns={"tss": "TSS"})
-        dist_df = df.groupby("label")["distance"].sum(min_count=1).reset_index().rename(columns={"distance": "Distanz"})
-        trend = pd.merge(tss_df, dist_df, on="label", how="outer").fillna(0)
+        iso = weeks["period_start"].dt.isocalendar()
+        trend = pd.DataFrame({
+            "label": iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2),
+            "TSS": weeks["tss"].fillna(0),
+            "Distanz": weeks["distance"].fillna(0),
+        })
 
         fig = go.Figure()
         fig.add_trace(go.Bar(
@@ -164,11 +189,12 @@ def render():
     st.markdown("<div style='margin-top: 2rem; text-align: right;'>", unsafe_allow_html=True)
     if st.button("Neu berechnen", key="refresh_overview_tab"):
         try:
-            from cache_modules.cache_export import save_activities_export
-            from cache_modules.cache_training_load import save_training_load
-            save_activities_export(user=user)
-            save_training_load(user=user)
-            st.success("Overview-Daten wurden erfolgreich neu berechnet.")
+            from fit_processing.build_data_cache_new import rebuild_modules
+            errors = rebuild_modules(user, ["export", "training_load"])
+            if errors:
+                st.error(f"Fehler bei Neuberechnung: {'; '.join(errors.values())}")
+            else:
+                st.success("Overview-Daten wurden erfolgreich neu berechnet.")
         except Exception as e:
             st.error(f"Fehler bei Neuberechnung: {e}")
     st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
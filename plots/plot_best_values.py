@@ -3,10 +3,11 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import os
-import json
 from datetime import timedelta
 from utils.settings_access import get_setting, DB_PATH
 from utils.user_paths import get_user_cache_path, get_current_user
+from utils.artifact_cache import load_artifact
+from cache_modules.cache_best_values import POWER_BESTS_TABLE
 from fit_processing.metrics_calc_new import get_training_load_df
 
 DURATIONS = {
@@ -19,16 +20,13 @@ DURATIONS = {
 }
 
 def load_pb_data(user, duration_key):
-    filepath = get_user_cache_path(f"{duration_key}.json", user)
+    filepath = get_user_cache_path(POWER_BESTS_TABLE, user)
     if not os.path.exists(filepath):
         return pd.DataFrame()
     try:
-        with open(filepath, "r") as f:
-            records = json.load(f)
-        df = pd.DataFrame(records)
-        df["start_time"] = pd.to_datetime(df["start_time"])
+        df = load_artifact(POWER_BESTS_TABLE, user, columns=["start_time", duration_key])
         df["date"] = df["start_time"].dt.normalize()
-        df["power"] = pd.to_numeric(df["Power"], errors="coerce")
+        df["power"] = df[duration_key]
         weight = get_setting("weight", default=78, user=user)
         df["power_wkg"] = df["power"] / weight
         return df.dropna(subset=["power"])
@@ -1,13 +1,13 @@
 import streamlit as st
 import plotly.graph_objects as go
-import numpy as np
 import os
 import plotly.io as pio
 from utils.formatting import format_duration
 from utils.settings_access import get_setting
 from utils.user_paths import get_current_user, get_user_cache_path
+from utils.artifact_cache import load_artifact
 from fit_processing.power_metrics_complete import compute_last_activity_power_curve
-from cache_modules.cache_power_curve import save_power_curve
+from fit_processing.build_data_cache_new import rebuild_modules
 
 pio.templates.default = "training_dashboard_light"
 
@@ -31,7 +31,7 @@ def load_power_curve_from_cache(user, weighted=False):
     if not os.path.exists(filepath):
         return None
     try:
-        curve = np.load(filepath).tolist()
+        curve = load_artifact("power_curve.npy", user).tolist()
         if weighted:
             weight = get_setting("weight", default=70, user=user)
             curve = [p / weight for p in curve]
@@ -144,8 +144,11 @@ def render():
     st.markdown("<div style='margin-top: 2rem; text-align: right;'>", unsafe_allow_html=True)
     if st.button("Neuberechnen", key="refresh_power_curve"):
         try:
-            save_power_curve(user=user)
-            st.success("Powerkurve wurde erfolgreich neu berechnet.")
+            errors = rebuild_modules(user, ["power_curve"])
+            if errors:
+                st.error(f"Fehler bei Neuberechnung: {errors['power_curve']}")
+            else:
+                st.success("Powerkurve wurde erfolgreich neu berechnet.")
         except Exception as e:
             st.error(f"Fehler bei Neuberechnung: {e}")
     st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
@@ -2,12 +2,12 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-import sqlite3
 import json
 import os
 import plotly.io as pio
-from utils.settings_access import get_setting
 from utils.user_paths import get_user_cache_path, get_current_user
+from utils.artifact_cache import load_artifact
+from utils.database import write_connection
 
 # === Theme
 pio.templates["training_dashboard_light"] = pio.templates["plotly_white"].update({
@@ -36,20 +36,10 @@ TYP_ERKLAERUNGEN = {
 
 def save_rider_profile(user, rider_type, profile_data):
     try:
-        db_path = get_setting("db_path", user=user)
-        with sqlite3.connect(db_path) as conn:
+        with write_connection() as conn:
             cur = conn.cursor()
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS rider_profiles (
-                    user TEXT,
-                    timestamp TEXT,
-                    rider_type TEXT,
-                    profile_json TEXT
-                )
-            """)
             cur.execute("INSERT INTO rider_profiles VALUES (?, datetime('now'), ?, ?)",
                         (user, rider_type, json.dumps(profile_data)))
-            conn.commit()
     except Exception as e:
         st.warning(f"Profil konnte nicht gespeichert werden: {e}")
 
@@ -68,8 +58,7 @@ def show_rider_profile():
         return
 
     try:
-        with open(cache_file, "r") as f:
-            best_values = json.load(f)
+        best_values = load_artifact("power_best_values.json", user)
     except Exception as e:
         st.error(f"❌ Fehler beim Laden des Caches: {e}")
         return
@@ -6,6 +6,7 @@ import subprocess
 import plotly.io as pio
 from utils.user_paths import get_current_user, get_user_cache_path
 from utils.settings_access import get_setting
+from cache_modules.cache_manifest import artifact_built_at
 
 # === Plot-Theme aktivieren ===
 pio.templates.default = "training_dashboard_light"
@@ -34,9 +35,12 @@ def render():
     manual_label_path = get_user_cache_path("activities_with_manual_labels.csv", user=user)
 
     # === Vorhersage notwendig?
+    # Bau-Zeitpunkt des Exports laut Manifest (Fallback: Änderungszeit der Datei)
+    export_built = artifact_built_at(user, "activities.csv")
+    export_time = export_built.timestamp() if export_built else os.path.getmtime(activities_path)
     needs_prediction = (
         not os.path.exists(predictions_path) or
-        os.path.getmtime(predictions_path) < os.path.getmtime(activities_path)
+        os.path.getmtime(predictions_path) < export_time
     )
 
     if needs_prediction:
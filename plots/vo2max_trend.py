@@ -1,11 +1,11 @@
 import os
-import json
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 import plotly.io as pio
-from cache_modules.cache_vo2max import save_vo2max_peak_estimates_multistage
+from fit_processing.build_data_cache_new import rebuild_modules
 from utils.user_paths import get_current_user, get_user_cache_path
+from utils.artifact_cache import load_artifact
 from utils.settings_access import get_setting
 
 # === Custom Plotly Theme aktivieren ===
@@ -27,14 +27,12 @@ pio.templates["training_dashboard_light"] = pio.templates["plotly_white"].update
 })
 
 
-def load_vo2max_estimates(user):
-    path = get_user_cache_path("vo2max_time_series.json", user)
+def load_vo2max_estimates(user, filename="vo2max_time_series.json"):
+    path = get_user_cache_path(filename, user)
     if not os.path.exists(path):
         return pd.DataFrame()
     try:
-        with open(path, "r") as f:
-            data = json.load(f)
-        df = pd.DataFrame(data)
+        df = pd.DataFrame(load_artifact(filename, user))
 
         if df.empty or "timestamp" not in df or "vo2max" not in df:
             return pd.DataFrame()
@@ -73,7 +71,17 @@ def render_vo2max_plot():
         labels={"VO₂max": "VO₂max (ml/min/kg)", "Datum": "Datum"},
         template="training_dashboard_light"
     )
-    fig.update_traces(line=dict(width=2), marker=dict(size=6))
+    fig.update_traces(line=dict(width=2), marker=dict(size=6), name="Multistage", showlegend=True)
+
+    df_streams = load_vo2max_estimates(user, filename="vo2max_stream_series.json")
+    if not df_streams.empty:
+        fig.add_scatter(
+            x=df_streams["Datum"],
+            y=df_streams["VO₂max"],
+            mode="markers",
+            name="Stream-Belastungen",
+            marker=dict(size=6, color="#999999", symbol="diamond")
+        )
     fig.update_layout(
         height=420,
         yaxis=dict(
@@ -128,14 +136,21 @@ def render_vo2max_plot():
 
         Nur plausible und valide Trainings werden einbezogen, um eine belastbare Abschätzung deiner  
         **maximalen Sauerstoffaufnahmefähigkeit (ml/min/kg)** zu ermitteln.
+
+        Die grauen Punkte (Stream-Belastungen) stammen aus den Sekundendaten jeder Fahrt:  
+        Die stärksten gleichmäßigen 3-, 5- und 8-Minuten-Belastungen werden über die  
+        ACSM-Formel (10.8 · W/kg + 7) und den Anteil der HF-Reserve auf VO₂max hochgerechnet.
         """)
 
     st.markdown("<div style='text-align: right; margin-top: 2rem;'>", unsafe_allow_html=True)
     if st.button("Neuberechnen", key="refresh_vo2max", help="Cache für VO₂max neu berechnen"):
         try:
-            save_vo2max_peak_estimates_multistage(user=user)
-            st.success("✅ VO₂max neu berechnet.")
-            st.rerun()
+            errors = rebuild_modules(user, ["vo2max", "vo2max_streams"])
+            if errors:
+                st.error(f"❌ Fehler bei Neuberechnung: {'; '.join(errors.values())}")
+            else:
+                st.success("✅ VO₂max neu berechnet.")
+                st.rerun()
         except Exception as e:
             st.error(f"❌ Fehler bei Neuberechnung: {e}")
     st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
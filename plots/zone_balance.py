@@ -5,6 +5,7 @@ import os
 import plotly.io as pio
 from datetime import timedelta
 from utils.user_paths import get_current_user, get_user_cache_path
+from utils.artifact_cache import load_artifact
 from utils.settings_access import get_setting
 
 # === Theme ===
@@ -57,15 +58,15 @@ def render():
     target = ZONE_TARGETS[model]
 
     ftp = get_setting("ftp", default=250)
-    cache_path = get_user_cache_path("activities.csv", user)
-    zone_cache_path = get_user_cache_path("power_zones_detailed.csv", user)
+    cache_path = get_user_cache_path("activities.npz", user)
+    zone_cache_path = get_user_cache_path("power_zones_detailed.npz", user)
 
     if not os.path.exists(cache_path):
         st.warning("⚠️ Activities-Cache nicht gefunden.")
         return
 
     try:
-        df = pd.read_csv(cache_path, parse_dates=["start_time"])
+        df = load_artifact("activities.npz", user, columns=["id", "start_time"])
     except Exception as e:
         st.error(f"Fehler beim Laden des Activities-Caches: {e}")
         return
@@ -84,7 +85,7 @@ def render():
         return
 
     try:
-        df_zones = pd.read_csv(zone_cache_path)
+        df_zones = load_artifact("power_zones_detailed.npz", user, columns=["activity_id", "zone_label", "seconds_in_zone"])
     except Exception as e:
         st.error(f"Fehler beim Laden des Power-Zonen-Caches: {e}")
         return
@@ -5,6 +5,7 @@ import plotly.express as px
 import plotly.io as pio
 from utils.settings_access import get_setting, DB_PATH
 from utils.user_paths import get_current_user, get_user_cache_path
+from utils.artifact_cache import load_artifact
 from plotly import graph_objects as go
 from fit_processing.power_zones import compute_power_zones
 from fit_processing.core_metrics import extract_core_metrics
@@ -101,7 +102,7 @@ def load_total_zone_distribution(user):
         st.warning("⚠️ Power-Zonen-Cache nicht gefunden.")
         return pd.DataFrame()
     try:
-        df = pd.read_csv(path)
+        df = load_artifact("power_zones_summary.csv", user)
         df.columns = ["zone_label", "total_sec"] + (["user_id"] if "user_id" in df.columns else [])
         return df
     except Exception as e:
@@ -8,7 +8,7 @@ import plotly.io as pio
 import plotly.graph_objects as go
 
 from utils.auth import authenticate_user, register_user
-from utils.user_paths import get_current_user
+from utils.user_paths import get_current_user, pin_user_cache_generation
 from utils.settings_access import get_all_settings, save_settings
 
 # === Streamlit Page Config ===
@@ -39,6 +39,19 @@ from plots import (
 )
 from fit_processing import fit_importer_new
 from fit_processing.build_data_cache_new import build_and_save_cache
+from cache_modules.cache_planner import make_change_set
+from fit_processing.metrics_calc_new import update_training_load_table
+from utils.db_migrations import run_migrations
+from utils.memo import invalidate_memo
+
+
+# === Schema-Migrationen einmal pro Serverprozess ===
+@st.cache_resource(show_spinner=False)
+def _migrate_once():
+    run_migrations()
+    return True
+
+_migrate_once()
 
 
 # === Session State ===
@@ -211,6 +224,10 @@ if not st.session_state.logged_in:
     st.stop()
 
 
+# === Cache-Generation für diesen Seitenaufbau fixieren ===
+# Alle Diagramme lesen dieselbe Generation, auch wenn parallel ein Rebuild abgeschlossen wird
+pin_user_cache_generation(get_current_user())
+
 # === Sidebar Navigation ===
 with st.sidebar:
     user = get_current_user()
@@ -234,7 +251,7 @@ with st.sidebar:
         with st.spinner("Baue Cache neu auf..."):
             build_and_save_cache(user=user, selective=False)
             st.success("Cache wurde vollständig neu berechnet.")
-            st.cache_data.clear()
+            invalidate_memo(user)
             st.info("Cache neu gebaut. Bitte Seite manuell neu laden.")
 
 # === Seitenlogik ===
@@ -366,7 +383,9 @@ elif selected_section == "Import":
                 file_paths.append(path)
 
             results = fit_importer_new.import_fit_files(file_paths)
-            st.cache_data.clear()
+            # Nur die importierten Aktivitäten und die benutzerweiten Auswertungen verwerfen
+            for path in file_paths:
+                invalidate_memo(user, activity=os.path.basename(path))
 
         st.success(f"{len(results)} Datei(en) erfolgreich importiert.")
         st.markdown("<ul style='padding-left: 1rem;'>", unsafe_allow_html=True)
@@ -386,15 +405,29 @@ elif selected_section == "Einstellungen":
                              value=float(current_settings.get("weight", 70)), step=0.1)
     hr_max = st.number_input("Maximale Herzfrequenz (bpm)", min_value=120, max_value=220, value=current_settings.get("hr_max", 190), step=1)
     hr_rest = st.number_input("Ruhepuls (bpm)", min_value=30, max_value=100, value=current_settings.get("hr_rest", 60), step=1)
+    ctl_constant = st.number_input("CTL-Zeitkonstante (Tage)", min_value=7, max_value=90, value=int(current_settings.get("ctl_constant", 42)), step=1)
+    atl_constant = st.number_input("ATL-Zeitkonstante (Tage)", min_value=2, max_value=21, value=int(current_settings.get("atl_constant", 7)), step=1)
 
     if st.button("💾 Einstellungen speichern"):
-        save_settings(user, {
+        new_settings = {
             "ftp": ftp,
             "weight": weight,
             "hr_max": hr_max,
-            "hr_rest": hr_rest
-        })
+            "hr_rest": hr_rest,
+            "ctl_constant": ctl_constant,
+            "atl_constant": atl_constant
+        }
+        save_settings(user, new_settings)
         st.success("✅ Einstellungen gespeichert.")
+
+        # Zeitkonstanten und HF-Parameter wirken auf die gesamte Belastungshistorie
+        changed_keys = [k for k, v in new_settings.items() if v != current_settings.get(k)]
+        load_keys = ("hr_max", "hr_rest", "ctl_constant", "atl_constant")
+        if changed_keys:
+            with st.spinner("Aktualisiere betroffene Auswertungen..."):
+                if any(k in load_keys for k in changed_keys):
+                    update_training_load_table(user=user)
+                build_and_save_cache(user=user, change_set=make_change_set(settings=changed_keys))
         st.rerun()  # ⬅️ wichtig für sofortige Anzeige der neuen Werte
 
     # Optional: Debuganzeige
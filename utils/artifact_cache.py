@@ -0,0 +1,107 @@
+# === Datei: artifact_cache.py ===
+# Prozessweiter In-Memory-Cache für Cache-Artefakte. Alle Streamlit-Sitzungen eines
+# Server-Prozesses teilen sich denselben Speicher; Schlüssel ist (Benutzer, Artefakt,
+# Generation[, Spalten]). Da eine neue Generation einen neuen Schlüssel ergibt, sind Einträge
+# nie veraltet – der Rebuild gibt mit invalidate_user() nur den Speicher alter Generationen frei.
+# Die Gesamtgröße ist begrenzt; verdrängt wird der am längsten nicht genutzte Eintrag (LRU).
+
+import os
+import copy
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.cache_io import read_table, read_generation
+from utils.user_paths import get_current_user, get_user_cache_dir, get_user_cache_path
+
+MAX_CACHE_BYTES = int(os.environ.get("ARTIFACT_CACHE_MB", 256)) * 1024 * 1024
+
+_entries = OrderedDict()   # Schlüssel → (Wert, Größe in Bytes)
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+
+def _sizeof(value, path: str) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    # JSON-Strukturen: Dateigröße als Näherung (Python-Objekte sind eher größer)
+    return os.path.getsize(path) * 2
+
+
+def _copy(value):
+    """Aufrufer dürfen das Ergebnis verändern, ohne den gemeinsamen Eintrag zu beschädigen."""
+    if isinstance(value, (pd.DataFrame, np.ndarray)):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def _load(path: str, columns=None):
+    ext = os.path.splitext(path)[1]
+    if ext == ".npz":
+        return read_table(path, columns=columns)
+    if ext == ".npy":
+        return np.load(path, allow_pickle=False)
+    if ext == ".json":
+        with open(path, "r") as f:
+            return json.load(f)
+    if ext == ".csv":
+        return pd.read_csv(path)
+    raise ValueError(f"Unbekanntes Artefaktformat: {path}")
+
+
+def _evict():
+    while _stats["bytes"] > MAX_CACHE_BYTES and len(_entries) > 1:
+        _, (_, size) = _entries.popitem(last=False)
+        _stats["bytes"] -= size
+        _stats["evictions"] += 1
+
+
+def load_artifact(filename: str, user: str = None, columns=None):
+    """
+    Lädt ein Cache-Artefakt aus dem Speicher oder – beim ersten Zugriff – von der Platte.
+    Gelesen wird aus der für diesen Seitenaufbau fixierten Generation.
+
+    Raises:
+        FileNotFoundError: wenn das Artefakt nicht existiert
+    """
+    user = user or get_current_user()
+    path = get_user_cache_path(filename, user=user)
+    generation = read_generation(get_user_cache_dir(user), user)
+    if generation is None:
+        # Artefakt außerhalb einer Generation: Änderungszeit als Version
+        generation = f"mtime:{os.stat(path).st_mtime_ns}"
+    key = (user, filename, generation, tuple(columns) if columns else None)
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return _copy(entry[0])
+        _stats["misses"] += 1
+
+    value = _load(path, columns)
+    size = _sizeof(value, path)
+    with _lock:
+        if key not in _entries and size <= MAX_CACHE_BYTES:
+            _entries[key] = (value, size)
+            _stats["bytes"] += size
+            _evict()
+    return _copy(value)
+
+
+def invalidate_user(user: str, keep_generation: str = None):
+    """Entfernt alle Einträge eines Benutzers (optional außer denen einer Generation)."""
+    with _lock:
+        for key in [k for k in _entries if k[0] == user and k[2] != keep_generation]:
+            _stats["bytes"] -= _entries.pop(key)[1]
+
+
+def cache_stats() -> dict:
+    with _lock:
+        return {**_stats, "entries": len(_entries), "max_bytes": MAX_CACHE_BYTES}
@@ -0,0 +1,136 @@
+# === Datei: cache_benchmark.py ===
+# Vergleicht CSV-/JSON-Artefakte mit den spaltenbasierten .npz-Tabellen (utils/cache_io.py)
+# anhand einer synthetischen Trainingshistorie.
+#
+#   python -m utils.cache_benchmark [--years 5] [--repeat 20]
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from utils.cache_io import write_table, read_table
+
+
+def make_history(years: int = 5, seed: int = 0) -> dict:
+    """Synthetische Artefakte: ~1,2 Aktivitäten pro Tag, tägliche Belastung, 7 Zonen je Aktivität."""
+    rng = np.random.default_rng(seed)
+    days = years * 365
+    n = int(days * 1.2)
+    start = pd.Timestamp.today().normalize() - pd.Timedelta(days=days)
+
+    activities = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "user_id": "benchmark",
+        "file_name": [f"ride_{i}.fit" for i in range(n)],
+        "file_hash": [f"{h:032x}" for h in rng.integers(0, 2**62, n)],
+        "start_time": np.sort(start + pd.to_timedelta(rng.uniform(0, days * 86400, n), unit="s")),
+        "duration": rng.integers(1800, 18000, n),
+        "distance": rng.uniform(15, 180, n).round(2),
+        "avg_power": rng.uniform(120, 260, n).round(2),
+        "normalized_power": rng.uniform(140, 290, n).round(2),
+        "avg_heart_rate": rng.uniform(110, 160, n).round(2),
+        "tss": rng.uniform(20, 300, n).round(1),
+        "intensity_factor": rng.uniform(0.5, 1.1, n).round(3),
+        "efficiency_factor": rng.uniform(1.2, 2.0, n).round(3),
+        "trimp": rng.uniform(20, 250, n).round(1),
+        "hr_tss": rng.uniform(20, 280, n).round(1),
+        "critical_power": rng.uniform(220, 300, n).round(1),
+        **{f"max_{m}min_power": rng.uniform(200, 600, n).round(2) for m in (1, 3, 5, 10, 20, 30)},
+    })
+
+    dates = pd.date_range(start, periods=days, freq="D")
+    training_load = pd.DataFrame({"date": dates, **{
+        c: rng.uniform(0, 120, days).round(2)
+        for c in ("tss", "ctl", "atl", "tsb", "trimp_ctl", "trimp_atl", "trimp_tsb")
+    }})
+
+    zones = pd.DataFrame({
+        "activity_id": np.repeat(activities["id"].to_numpy(), 7),
+        "zone_label": np.tile([f"Z{i}" for i in range(1, 8)], n),
+        "seconds_in_zone": rng.integers(0, 3600, n * 7),
+        "user_id": "benchmark",
+    })
+
+    bests = activities[["start_time"] + [f"max_{m}min_power" for m in (1, 3, 5, 10, 20, 30)]]
+    return {"activities": activities, "training_load": training_load, "zones": zones, "bests": bests}
+
+
+def _timed(fn, repeat: int) -> float:
+    """Median-Laufzeit in Millisekunden."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)) * 1000
+
+
+def run_benchmark(years: int = 5, repeat: int = 20) -> pd.DataFrame:
+    history = make_history(years)
+    rows = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = [
+            ("activities", history["activities"], ["start_time"], ["id", "start_time"]),
+            ("training_load", history["training_load"], ["date"], ["date", "ctl", "atl", "tsb"]),
+            ("power_zones_detailed", history["zones"], [], ["activity_id", "zone_label", "seconds_in_zone"]),
+        ]
+        for name, df, dates, projection in cases:
+            csv_path = os.path.join(tmp, f"{name}.csv")
+            npz_path = os.path.join(tmp, f"{name}.npz")
+            df.to_csv(csv_path, index=False)
+            write_table(df, npz_path, datetime_columns=dates)
+
+            rows.append({
+                "Artefakt": name,
+                "Zeilen": len(df),
+                "CSV lesen (ms)": _timed(lambda: pd.read_csv(csv_path, parse_dates=dates or False), repeat),
+                "NPZ lesen (ms)": _timed(lambda: read_table(npz_path), repeat),
+                "NPZ Projektion (ms)": _timed(lambda: read_table(npz_path, columns=projection), repeat),
+                "CSV (KB)": os.path.getsize(csv_path) // 1024,
+                "NPZ (KB)": os.path.getsize(npz_path) // 1024,
+            })
+
+        # Sechs JSON-Dateien (bisheriges Format) gegen eine Tabelle mit Projektion auf ein Zeitfenster
+        bests = history["bests"]
+        json_paths = []
+        for col in bests.columns[1:]:
+            out = bests[["start_time", col]].rename(columns={col: "Power"})
+            out["start_time"] = out["start_time"].astype(str)
+            path = os.path.join(tmp, f"{col}.json")
+            with open(path, "w") as f:
+                json.dump(out.to_dict(orient="records"), f, indent=2)
+            json_paths.append(path)
+        npz_path = os.path.join(tmp, "power_bests_time_series.npz")
+        write_table(bests, npz_path)
+
+        def read_json_one():
+            with open(json_paths[4], "r") as f:
+                df = pd.DataFrame(json.load(f))
+            df["start_time"] = pd.to_datetime(df["start_time"])
+
+        rows.append({
+            "Artefakt": "power_bests (1 Zeitfenster)",
+            "Zeilen": len(bests),
+            "CSV lesen (ms)": _timed(read_json_one, repeat),
+            "NPZ lesen (ms)": _timed(lambda: read_table(npz_path), repeat),
+            "NPZ Projektion (ms)": _timed(lambda: read_table(npz_path, columns=["start_time", "max_20min_power"]), repeat),
+            "CSV (KB)": sum(os.path.getsize(p) for p in json_paths) // 1024,
+            "NPZ (KB)": os.path.getsize(npz_path) // 1024,
+        })
+
+    return pd.DataFrame(rows).round(2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV/JSON- gegen NPZ-Cache-Artefakte vergleichen.")
+    parser.add_argument("--years", type=int, default=5, help="Länge der synthetischen Historie in Jahren")
+    parser.add_argument("--repeat", type=int, default=20, help="Wiederholungen je Messung (Median)")
+    args = parser.parse_args()
+
+    print(f"[INFO] Benchmark mit {args.years} Jahren Trainingshistorie (JSON-Zeile: ein Zeitfenster)")
+    print(run_benchmark(args.years, args.repeat).to_string(index=False))
@@ -0,0 +1,280 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import contextvars
+from functools import lru_cache
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# === Atomare Schreibvorgänge ===
+# Alle Cache-Artefakte werden in eine temporäre Datei im Zielverzeichnis geschrieben und
+# anschließend per os.replace() umbenannt. Leser sehen dadurch immer entweder die alte oder
+# die vollständige neue Datei – nie einen halb geschriebenen Stand.
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w", **kwargs):
+    """Kontextmanager wie open(), der die Datei erst beim erfolgreichen Abschluss ersetzt."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json(path: str, data, **kwargs):
+    with atomic_write(path, "w") as f:
+        json.dump(data, f, **kwargs)
+
+
+def write_csv(df, path: str, **kwargs):
+    with atomic_write(path, "w", newline="") as f:
+        df.to_csv(f, **kwargs)
+
+
+def write_npy(path: str, array):
+    with atomic_write(path, "wb") as f:
+        np.save(f, np.asarray(array))
+
+
+# === Generationen ===
+# Die Artefakte der Cache-Module liegen in cache/<user>/generations/<id>/. Ein Rebuild schreibt
+# in eine neue Generation (STAGING), in die zuvor alle Artefakte der aktuellen Generation per
+# Hardlink übernommen werden. Nach Abschluss wird der Zeiger CURRENT atomar umgesetzt.
+# Ein Seitenaufbau fixiert zu Beginn eine Generation (pin_generation) und liest alle Artefakte
+# aus dieser – auch wenn währenddessen ein Rebuild abgeschlossen wird.
+# Schreiber erfahren ihre Generation nicht über den STAGING-Zeiger, sondern über den Kontext
+# (writing_generation), den der Rebuild in jedem Worker setzt. Eine Sperrdatei je Benutzer
+# (generation_lock) serialisiert Rebuilds von begin_generation bis commit_generation – auch
+# über Prozessgrenzen hinweg (App, CLI, Worker von rebuild_all_users).
+# Zustandsdateien (Manifest, Checkpoints) sowie ml/-Ausgaben und manuelle Labels sind keine
+# Generationsartefakte und bleiben direkt in cache/<user>/.
+
+GENERATIONS_DIR = "generations"
+CURRENT_FILE = "CURRENT"
+STAGING_FILE = "STAGING"
+LOCK_FILE = "REBUILD.lock"
+KEEP_GENERATIONS = 3
+
+_pinned = threading.local()
+# Cache-Verzeichnis → Generation, in die der aktuelle Kontext schreibt
+_write_generations = contextvars.ContextVar("cache_write_generations", default={})
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def generation_artifacts() -> frozenset:
+    """Alle Artefakte, die von Cache-Modulen erzeugt werden (laut MODULE_SPECS)."""
+    from cache_modules.cache_planner import MODULE_SPECS
+    return frozenset(a for spec in MODULE_SPECS.values() for a in spec["outputs"]["artifacts"])
+
+
+def _read_pointer(cache_dir: str, name: str):
+    path = os.path.join(cache_dir, name)
+    try:
+        with open(path, "r") as f:
+            gen = f.read().strip()
+    except OSError:
+        return None
+    return gen if gen and os.path.isdir(os.path.join(cache_dir, GENERATIONS_DIR, gen)) else None
+
+
+def _write_pointer(cache_dir: str, name: str, gen: str):
+    with atomic_write(os.path.join(cache_dir, name), "w") as f:
+        f.write(gen)
+
+
+def current_generation(cache_dir: str):
+    return _read_pointer(cache_dir, CURRENT_FILE)
+
+
+def _generation_dir(cache_dir: str, gen: str) -> str:
+    return os.path.join(cache_dir, GENERATIONS_DIR, gen)
+
+
+def read_generation(cache_dir: str, user: str):
+    """Generation, aus der der aktuelle Thread liest: die fixierte, sonst die aktuelle."""
+    pins = getattr(_pinned, "generations", {})
+    if user in pins and (pins[user] is None or os.path.isdir(_generation_dir(cache_dir, pins[user]))):
+        return pins[user]
+    return current_generation(cache_dir)
+
+
+def resolve_read_path(cache_dir: str, user: str, filename: str) -> str:
+    """Lesepfad: fixierte bzw. aktuelle Generation für Artefakte, sonst das Benutzerverzeichnis."""
+    if filename not in generation_artifacts():
+        return os.path.join(cache_dir, filename)
+    gen = read_generation(cache_dir, user)
+    return os.path.join(_generation_dir(cache_dir, gen), filename) if gen else os.path.join(cache_dir, filename)
+
+
+def resolve_write_path(cache_dir: str, filename: str) -> str:
+    """Schreibpfad: Generation des laufenden Rebuilds, sonst aktuelle Generation bzw. Benutzerverzeichnis."""
+    if filename not in generation_artifacts():
+        return os.path.join(cache_dir, filename)
+    gen = _write_generations.get().get(cache_dir) or current_generation(cache_dir)
+    return os.path.join(_generation_dir(cache_dir, gen), filename) if gen else os.path.join(cache_dir, filename)
+
+
+def pin_generation(user: str, cache_dir: str):
+    """Fixiert für den aktuellen Thread (Seitenaufbau) die aktuelle Generation eines Benutzers."""
+    if not hasattr(_pinned, "generations"):
+        _pinned.generations = {}
+    _pinned.generations[user] = current_generation(cache_dir)
+
+
+@contextmanager
+def writing_generation(cache_dir: str, gen: str):
+    """Leitet im aktuellen Kontext (Thread bzw. Worker-Prozess) alle Schreibzugriffe in `gen`."""
+    token = _write_generations.set({**_write_generations.get(), cache_dir: gen})
+    try:
+        yield
+    finally:
+        _write_generations.reset(token)
+
+
+@contextmanager
+def generation_lock(cache_dir: str):
+    """Exklusive Sperre eines Cache-Verzeichnisses für die Dauer eines Rebuilds (blockierend)."""
+    with _local_locks_guard:
+        local_lock = _local_locks.setdefault(os.path.abspath(cache_dir), threading.Lock())
+    with local_lock:
+        if fcntl is None:
+            # Ohne fcntl (Windows) nur innerhalb des Prozesses gesperrt
+            yield
+            return
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.path.join(cache_dir, LOCK_FILE), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def begin_generation(cache_dir: str) -> str:
+    """Legt eine neue Generation an, übernimmt die bestehenden Artefakte und setzt STAGING."""
+    gen = datetime.now().strftime("%Y%m%d-%H%M%S-%f") + f"-{os.getpid()}"
+    target = _generation_dir(cache_dir, gen)
+    os.makedirs(target, exist_ok=True)
+
+    source = _source_dir(cache_dir)
+    for name in generation_artifacts():
+        src = os.path.join(source, name)
+        if os.path.exists(src):
+            _link_artifact(src, os.path.join(target, name))
+
+    _write_pointer(cache_dir, STAGING_FILE, gen)
+    return gen
+
+
+def _source_dir(cache_dir: str) -> str:
+    current = current_generation(cache_dir)
+    return _generation_dir(cache_dir, current) if current else cache_dir
+
+
+def _link_artifact(src: str, dst: str):
+    # Artefakte werden nur per os.replace() ersetzt, daher ist ein Hardlink gefahrlos
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def restore_artifacts(cache_dir: str, gen: str, names):
+    """
+    Setzt Artefakte einer noch nicht veröffentlichten Generation auf den Stand der aktuellen
+    zurück (z. B. die teilweise geschriebenen Ausgaben eines fehlgeschlagenen Moduls).
+    """
+    source, target = _source_dir(cache_dir), _generation_dir(cache_dir, gen)
+    for name in names:
+        src, dst = os.path.join(source, name), os.path.join(target, name)
+        if os.path.exists(dst):
+            os.remove(dst)
+        if os.path.exists(src):
+            _link_artifact(src, dst)
+
+
+def discard_generation(cache_dir: str, gen: str):
+    """Verwirft eine nicht veröffentlichte Generation (abgebrochener Rebuild)."""
+    if _read_pointer(cache_dir, STAGING_FILE) == gen:
+        os.remove(os.path.join(cache_dir, STAGING_FILE))
+    shutil.rmtree(_generation_dir(cache_dir, gen), ignore_errors=True)
+
+
+def commit_generation(cache_dir: str, gen: str):
+    """Macht eine Generation atomar zur aktuellen und entfernt ältere Generationen."""
+    _write_pointer(cache_dir, CURRENT_FILE, gen)
+    if _read_pointer(cache_dir, STAGING_FILE) == gen:
+        os.remove(os.path.join(cache_dir, STAGING_FILE))
+
+    generations = sorted(os.listdir(os.path.join(cache_dir, GENERATIONS_DIR)))
+    staging = _read_pointer(cache_dir, STAGING_FILE)
+    for old in generations[:-KEEP_GENERATIONS]:
+        if old not in (gen, staging):
+            shutil.rmtree(_generation_dir(cache_dir, old), ignore_errors=True)
+
+
+# === Spaltenbasierte Tabellen (.npz) ===
+# Tabellarische Artefakte werden als NumPy-Archiv mit einem Array je Spalte gespeichert:
+# Datumsspalten als datetime64, Zahlen als float64/int64, Text als Unicode-Array mit
+# Null-Maske. Laden erfordert kein Parsen; np.load liest nur die angeforderten Spalten.
+
+COLUMNS_KEY = "__columns__"
+NULL_SUFFIX = "__null"
+
+
+def write_table(df, path: str, datetime_columns=()):
+    """Speichert ein DataFrame spaltenweise und atomar als .npz."""
+    arrays = {COLUMNS_KEY: np.array([str(c) for c in df.columns])}
+    for col in df.columns:
+        series = df[col]
+        if col in datetime_columns or pd.api.types.is_datetime64_any_dtype(series):
+            series = pd.to_datetime(series, errors="coerce")
+            if getattr(series.dt, "tz", None) is not None:
+                series = series.dt.tz_localize(None)
+            arrays[col] = series.to_numpy(dtype="datetime64[ns]")
+        elif pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            arrays[col] = series.to_numpy()
+        else:
+            nulls = series.isna().to_numpy()
+            arrays[col] = series.where(~nulls, "").astype(str).to_numpy(dtype=str)
+            if nulls.any():
+                arrays[col + NULL_SUFFIX] = nulls
+
+    with atomic_write(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def read_table(path: str, columns=None):
+    """Lädt eine mit write_table gespeicherte Tabelle; `columns` beschränkt auf einzelne Spalten."""
+    with np.load(path, allow_pickle=False) as archive:
+        stored = [str(c) for c in archive[COLUMNS_KEY]]
+        selected = stored if columns is None else [c for c in columns if c in stored]
+        data = {}
+        for col in selected:
+            values = archive[col]
+            if values.dtype.kind == "U":
+                values = values.astype(object)
+                if col + NULL_SUFFIX in archive.files:
+                    values[archive[col + NULL_SUFFIX]] = None
+            data[col] = values
+    return pd.DataFrame(data, columns=selected)
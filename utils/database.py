@@ -1,51 +1,122 @@
+# === Datei: database.py ===
+# Zentrale Verwaltung der SQLite-Verbindungen. Statt pro Abfrage sqlite3.connect() zu öffnen,
+# hält jeder Thread je Datenbank eine Lese- und eine Schreibverbindung offen und verwendet sie
+# wieder. Alle Verbindungen laufen im WAL-Modus: Leser sehen einen konsistenten Stand und
+# werden vom Schreiber (z. B. dem Cache-Rebuild im Hintergrund) nicht blockiert; gleichzeitige
+# Schreiber warten bis zu busy_timeout statt sofort mit "database is locked" abzubrechen.
+#
+#   with read_connection() as conn:    – nur lesend (PRAGMA query_only)
+#       df = pd.read_sql_query(...)
+#
+#   with write_connection() as conn:   – BEGIN IMMEDIATE … COMMIT, bei Fehler ROLLBACK
+#       conn.execute("UPDATE ...")
+#
+# Verschachtelte write_connection()-Blöcke eines Threads teilen sich die äußere Transaktion;
+# read_connection() innerhalb eines Schreibblocks liefert die Schreibverbindung, damit eigene,
+# noch nicht committete Änderungen sichtbar sind.
+
+import os
 import sqlite3
-import pandas as pd
-from utils.config import settings
+import threading
+from contextlib import contextmanager
 
-DB_PATH = settings["db_path"]
+from utils.settings_access import DB_PATH
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 30000))
+CACHE_SIZE_MB = int(os.environ.get("DB_CACHE_MB", 64))
+MMAP_SIZE_MB = int(os.environ.get("DB_MMAP_MB", 256))
 
-def get_best_values():
-    conn = get_connection()
-    cur = conn.cursor()
+_local = threading.local()
+_wal_paths = set()   # Datenbanken, die in diesem Prozess bereits auf WAL umgestellt sind
+_wal_lock = threading.Lock()
+
+
+def _configure(conn: sqlite3.Connection, path: str):
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    with _wal_lock:
+        if path not in _wal_paths:
+            # WAL ist eine Eigenschaft der Datei und bleibt gesetzt – einmal pro Prozess genügt
+            mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            if mode.lower() != "wal":
+                print(f"[WARN] WAL-Modus für '{path}' nicht aktivierbar (Modus: {mode}).")
+            _wal_paths.add(path)
+    # Im WAL-Modus ist NORMAL sicher gegen Korruption und spart das fsync je Commit
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = {-CACHE_SIZE_MB * 1024}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_MB * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def _pool() -> dict:
+    """Verbindungen dieses Threads; nach einem fork() werden geerbte Verbindungen verworfen."""
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+        _local.write_depth = {}
+    return _local.connections
 
-    try:
-        cur.execute("""
-            SELECT
-                MAX(max_1min_power),
-                MAX(max_5min_power),
-                MAX(max_20min_power),
-                MAX(avg_power)
-            FROM activities
-            WHERE duration >= 5
-        """)
-        result = cur.fetchone()
-        return {
-            "5s": result[3] or 0,       # Annäherung über avg_power bei kurzen Fahrten
-            "1min": result[0] or 0,
-            "5min": result[1] or 0,
-            "20min": result[2] or 0,
-        }
-    except Exception as e:
-        print(f"❌ Fehler beim Abrufen der Bestwerte: {e}")
-        return {
-            "5s": 0,
-            "1min": 0,
-            "5min": 0,
-            "20min": 0,
-        }
-    finally:
-        conn.close()
 
-def get_activities_df():
-    conn = get_connection()
+def _get(path: str, mode: str) -> sqlite3.Connection:
+    pool = _pool()
+    conn = pool.get((path, mode))
+    if conn is None:
+        # Transaktionen steuert write_connection() selbst (isolation_level=None)
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        _configure(conn, path)
+        if mode == "read":
+            conn.execute("PRAGMA query_only = ON")
+        pool[(path, mode)] = conn
+    return conn
+
+
+@contextmanager
+def read_connection(db_path: str = None):
+    """Wiederverwendete Leseverbindung des aktuellen Threads."""
+    path = db_path or DB_PATH
+    _pool()
+    if _local.write_depth.get(path):
+        yield _get(path, "write")
+    else:
+        yield _get(path, "read")
+
+
+@contextmanager
+def write_connection(db_path: str = None):
+    """
+    Wiederverwendete Schreibverbindung des aktuellen Threads in einer Transaktion.
+    BEGIN IMMEDIATE holt die Schreibsperre sofort, damit ein späteres Upgrade von Lese- auf
+    Schreibsperre nicht mit SQLITE_BUSY scheitert.
+    """
+    path = db_path or DB_PATH
+    conn = _get(path, "write")
+    depth = _local.write_depth.get(path, 0)
+    if depth:
+        # Verschachtelter Block: Teil der äußeren Transaktion
+        _local.write_depth[path] = depth + 1
+        try:
+            yield conn
+        finally:
+            _local.write_depth[path] = depth
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    _local.write_depth[path] = 1
     try:
-        df = pd.read_sql_query("SELECT * FROM activities ORDER BY start_time DESC", conn)
-    except Exception as e:
-        print(f"❌ Fehler beim Laden der Datenbank: {e}")
-        df = pd.DataFrame()  # leeres DataFrame bei Fehler
+        yield conn
+        # Aufrufer dürfen zwischendurch selbst committen
+        if conn.in_transaction:
+            conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
     finally:
+        _local.write_depth[path] = 0
+
+
+def close_connections():
+    """Schließt alle Verbindungen des aktuellen Threads (z. B. vor dem Löschen der Datenbank)."""
+    pool = _pool()
+    for conn in pool.values():
         conn.close()
-    return df
\ No newline at end of file
+    pool.clear()
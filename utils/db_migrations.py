@@ -0,0 +1,462 @@
+# === Datei: db_migrations.py ===
+# Versioniertes Datenbankschema. Jede Schemaänderung ist ein nummerierter Schritt in
+# MIGRATIONS; run_migrations() wendet beim Start nur die noch nicht in 'schema_version'
+# eingetragenen Schritte an – in Reihenfolge und je Datenbank genau einmal.
+#
+# Mehrere Prozesse (Streamlit, Cache-Rebuild, Backfill) dürfen gleichzeitig starten:
+# Die Schritte laufen in einer Transaktion mit BEGIN IMMEDIATE (utils.database). Wer die
+# Schreibsperre zuerst erhält, migriert; alle anderen warten (busy timeout), lesen danach den
+# Stand neu und finden nichts mehr zu tun. Schlägt ein Schritt fehl, wird alles zurückgerollt.
+#
+# Neue Schemaänderungen werden als neuer Eintrag am Ende von MIGRATIONS angehängt –
+# bestehende Einträge werden nie geändert oder umnummeriert.
+
+import sqlite3
+import importlib
+from datetime import datetime
+from utils.database import read_connection, write_connection
+
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    start_time TEXT,
+    file_name TEXT,
+    avg_power REAL,
+    avg_heart_rate REAL,
+    normalized_power REAL,
+    tss REAL,
+    intensity_factor REAL,
+    efficiency_factor REAL,
+    max_5sec_power REAL,
+    max_1min_power REAL,
+    max_3min_power REAL,
+    max_5min_power REAL,
+    max_10min_power REAL,
+    max_20min_power REAL,
+    max_30min_power REAL,
+    duration REAL,
+    distance REAL,
+    file_size INTEGER,
+    file_hash TEXT,
+    critical_power REAL,
+    trimp REAL,
+    hr_tss REAL,
+    ef_first_half REAL,
+    ef_second_half REAL,
+    decoupling REAL,
+    ef_stream BLOB
+);
+
+CREATE TABLE IF NOT EXISTS power_zones (
+    activity_id INTEGER,
+    zone_label TEXT,
+    seconds_in_zone INTEGER,
+    user_id TEXT NOT NULL,
+    FOREIGN KEY(activity_id) REFERENCES activities(id)
+);
+
+CREATE TABLE IF NOT EXISTS hr_zones (
+    activity_id INTEGER,
+    zone_label TEXT,
+    seconds_in_zone INTEGER,
+    user_id TEXT NOT NULL,
+    FOREIGN KEY(activity_id) REFERENCES activities(id)
+);
+
+CREATE TABLE IF NOT EXISTS training_load (
+    date TEXT,
+    tss REAL,
+    ctl REAL,
+    atl REAL,
+    tsb REAL,
+    trimp REAL,
+    trimp_ctl REAL,
+    trimp_atl REAL,
+    trimp_tsb REAL,
+    kj REAL,
+    kj_ctl REAL,
+    kj_atl REAL,
+    kj_tsb REAL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (date, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS data_version (
+    user_id TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, table_name)
+);
+"""
+
+# Name → (Tabelle, Spalten, eindeutig)
+INDEXES = {
+    "ux_activities_user_hash": ("activities", ("user_id", "file_hash"), True),
+    "ix_activities_user_start": ("activities", ("user_id", "start_time"), False),
+    "ix_activities_user_file": ("activities", ("user_id", "file_name"), False),
+    "ix_power_zones_activity": ("power_zones", ("activity_id",), False),
+    "ix_power_zones_user": ("power_zones", ("user_id", "activity_id"), False),
+    "ix_hr_zones_activity": ("hr_zones", ("activity_id",), False),
+    "ix_hr_zones_user": ("hr_zones", ("user_id", "activity_id"), False),
+    # Der Primärschlüssel (date, user_id) hilft Abfragen je Benutzer nicht
+    "ix_training_load_user_date": ("training_load", ("user_id", "date"), False),
+}
+
+
+def create_base_schema(conn: sqlite3.Connection):
+    # Einzelne Anweisungen statt executescript(): das würde die laufende Transaktion committen
+    for statement in BASE_SCHEMA.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def _add_columns(conn: sqlite3.Connection, table: str, columns: dict) -> list:
+    """Legt fehlende Spalten an (Name → Typ) und gibt die hinzugefügten zurück."""
+    existing = {col[1] for col in conn.execute(f"PRAGMA table_info({table})")}
+    missing = [c for c in columns if c not in existing]
+    for col in missing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {columns[col]}")
+    if missing:
+        print(f"[MIGRATION] Spalten {missing} zur Tabelle '{table}' hinzugefügt.")
+    return missing
+
+
+def _replace_triggers(conn: sqlite3.Connection, triggers: dict):
+    for name, body in triggers.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+
+
+# === Datenversion je Benutzer und Tabelle ===
+
+# Tabellen, deren Änderungen je Benutzer in 'data_version' mitgezählt werden
+VERSIONED_TABLES = ("power_zones", "hr_zones", "training_load")
+
+
+def _bump_version_sql(ref: str, key: str) -> str:
+    return f"""
+        INSERT INTO data_version (user_id, table_name, version)
+        VALUES (COALESCE({ref}.user_id, ''), '{key}', 1)
+        ON CONFLICT(user_id, table_name) DO UPDATE SET version = version + 1;
+    """
+
+
+def create_data_version_triggers(conn: sqlite3.Connection):
+    """
+    Trigger, die bei jeder Änderung die Version der betroffenen Tabelle je Benutzer erhöhen
+    (Grundlage für das Cache-Manifest). Der Update-Trigger von 'activities' listet dessen
+    Spalten auf und wird deshalb nach jeder neuen Spalte neu erstellt.
+    """
+    columns = [
+        col[1] for col in conn.execute("PRAGMA table_info(activities)")
+        if col[1] not in ("id", "critical_power")
+    ]
+    triggers = {
+        "trg_version_activities_insert": f"AFTER INSERT ON activities BEGIN {_bump_version_sql('NEW', 'activities')} END",
+        "trg_version_activities_delete": f"AFTER DELETE ON activities BEGIN {_bump_version_sql('OLD', 'activities')} END",
+        "trg_version_activities_update": (
+            f"AFTER UPDATE OF {', '.join(columns)} ON activities "
+            f"BEGIN {_bump_version_sql('NEW', 'activities')} END"
+        ),
+        "trg_version_activities_cp": (
+            f"AFTER UPDATE OF critical_power ON activities "
+            f"BEGIN {_bump_version_sql('NEW', 'activities.critical_power')} END"
+        ),
+    }
+    for table in VERSIONED_TABLES:
+        triggers[f"trg_version_{table}_insert"] = f"AFTER INSERT ON {table} BEGIN {_bump_version_sql('NEW', table)} END"
+        triggers[f"trg_version_{table}_update"] = f"AFTER UPDATE ON {table} BEGIN {_bump_version_sql('NEW', table)} END"
+        triggers[f"trg_version_{table}_delete"] = f"AFTER DELETE ON {table} BEGIN {_bump_version_sql('OLD', table)} END"
+    _replace_triggers(conn, triggers)
+
+
+# === Materialisierte Wochen-/Monatsaggregate ===
+# 'activity_aggregates' hält je Benutzer und Kalenderwoche (Montag) bzw. Monat die Summen
+# und Mittelwerte der Aktivitäten. Trigger auf 'activities' berechnen bei jedem Einfügen,
+# Löschen oder Ändern nur die betroffene Woche und den betroffenen Monat neu.
+
+AGGREGATE_PERIODS = {
+    # Periodentyp → (Periodenbeginn, Beginn der Folgeperiode) als SQLite-Datumsausdrücke
+    "week": ("date({t}, 'weekday 0', '-6 days')", "date({t}, 'weekday 0', '+1 day')"),
+    "month": ("date({t}, 'start of month')", "date({t}, 'start of month', '+1 month')"),
+}
+AGGREGATE_SOURCE_COLUMNS = (
+    "user_id", "start_time", "duration", "distance", "tss",
+    "normalized_power", "intensity_factor", "avg_power",
+)
+_AGGREGATE_VALUES = """
+    COUNT(*), TOTAL(duration), TOTAL(distance), TOTAL(tss),
+    AVG(normalized_power), AVG(intensity_factor), AVG(avg_power),
+    TOTAL(avg_power * duration) / 1000.0
+"""
+
+
+def _refresh_period_sql(ref: str, period: str) -> str:
+    """Berechnet die Periode der Zeile `ref` (NEW/OLD) aus 'activities' neu."""
+    start, end = (expr.format(t=f"{ref}.start_time") for expr in AGGREGATE_PERIODS[period])
+    return f"""
+        DELETE FROM activity_aggregates
+        WHERE user_id = {ref}.user_id AND period_type = '{period}' AND period_start = {start};
+        INSERT INTO activity_aggregates
+        SELECT user_id, '{period}', {start}, {_AGGREGATE_VALUES}
+        FROM activities
+        WHERE user_id = {ref}.user_id AND start_time >= {start} AND start_time < {end}
+        GROUP BY user_id;
+    """
+
+
+def rebuild_activity_aggregates(conn: sqlite3.Connection, user: str = None):
+    """Berechnet alle Aggregate (eines oder aller Benutzer) vollständig neu."""
+    where, params = ("WHERE user_id = ?", (user,)) if user else ("", ())
+    conn.execute(f"DELETE FROM activity_aggregates {where}", params)
+    for period, (start, _) in AGGREGATE_PERIODS.items():
+        start = start.format(t="start_time")
+        conn.execute(f"""
+            INSERT INTO activity_aggregates
+            SELECT user_id, '{period}', {start}, {_AGGREGATE_VALUES}
+            FROM activities
+            WHERE user_id IS NOT NULL AND start_time IS NOT NULL
+            {'AND user_id = ?' if user else ''}
+            GROUP BY user_id, {start}
+        """, params)
+
+
+# === Indizes ===
+
+def dedupe_activities(conn: sqlite3.Connection) -> int:
+    """
+    Entfernt doppelte Aktivitäten (gleicher Benutzer und file_hash) samt Zonenzeilen;
+    behalten wird jeweils der älteste Eintrag. Voraussetzung für den eindeutigen Index.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.duplicate_activities")
+    conn.execute("""
+        CREATE TEMP TABLE duplicate_activities AS
+        SELECT id FROM activities
+        WHERE file_hash IS NOT NULL
+          AND id NOT IN (
+              SELECT MIN(id) FROM activities
+              WHERE file_hash IS NOT NULL
+              GROUP BY user_id, file_hash
+          )
+    """)
+    removed = conn.execute("SELECT COUNT(*) FROM temp.duplicate_activities").fetchone()[0]
+    if removed:
+        for table in ("power_zones", "hr_zones"):
+            conn.execute(f"DELETE FROM {table} WHERE activity_id IN (SELECT id FROM temp.duplicate_activities)")
+        conn.execute("DELETE FROM activities WHERE id IN (SELECT id FROM temp.duplicate_activities)")
+    conn.execute("DROP TABLE temp.duplicate_activities")
+    return removed
+
+
+def apply_indexes(conn: sqlite3.Connection):
+    """Legt alle Indizes an (idempotent); vor dem eindeutigen Index werden Duplikate entfernt."""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    created = False
+    for name, (table, columns, unique) in INDEXES.items():
+        if name in existing:
+            continue
+        if unique:
+            removed = dedupe_activities(conn)
+            if removed:
+                print(f"[MIGRATION] {removed} doppelte Aktivitäten vor eindeutigem Index entfernt.")
+        conn.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+        )
+        created = True
+    if created:
+        # Statistiken für den Query-Planer aktualisieren
+        conn.execute("ANALYZE")
+
+
+# === Migrationsschritte ===
+# Jeder Schritt ist idempotent, damit auch Datenbanken aus der Zeit vor 'schema_version'
+# (deren Tabellen und Spalten teilweise schon existieren) sauber übernommen werden.
+
+def _m001_base_schema(conn):
+    create_base_schema(conn)
+
+
+def _m002_critical_power(conn):
+    _add_columns(conn, "activities", {"critical_power": "REAL"})
+
+
+def _m003_training_load_channels(conn):
+    _add_columns(conn, "training_load", {
+        col: "REAL" for col in (
+            "tss", "trimp", "trimp_ctl", "trimp_atl", "trimp_tsb",
+            "kj", "kj_ctl", "kj_atl", "kj_tsb",
+        )
+    })
+
+
+def _m004_hr_load(conn):
+    _add_columns(conn, "activities", {"trimp": "REAL", "hr_tss": "REAL"})
+
+
+def _m005_efficiency(conn):
+    _add_columns(conn, "activities", {
+        "ef_first_half": "REAL",
+        "ef_second_half": "REAL",
+        "decoupling": "REAL",
+        "ef_stream": "BLOB",
+    })
+
+
+def _m006_data_version(conn):
+    create_data_version_triggers(conn)
+
+
+def _m007_activity_aggregates(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS activity_aggregates (
+            user_id TEXT NOT NULL,
+            period_type TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            duration REAL,
+            distance REAL,
+            tss REAL,
+            avg_np REAL,
+            avg_if REAL,
+            avg_power REAL,
+            kj REAL,
+            PRIMARY KEY (user_id, period_type, period_start)
+        )
+    """)
+    refresh_new = "".join(_refresh_period_sql("NEW", p) for p in AGGREGATE_PERIODS)
+    refresh_old = "".join(_refresh_period_sql("OLD", p) for p in AGGREGATE_PERIODS)
+    _replace_triggers(conn, {
+        "trg_aggregates_insert": f"AFTER INSERT ON activities BEGIN {refresh_new} END",
+        "trg_aggregates_delete": f"AFTER DELETE ON activities BEGIN {refresh_old} END",
+        "trg_aggregates_update": (
+            f"AFTER UPDATE OF {', '.join(AGGREGATE_SOURCE_COLUMNS)} ON activities "
+            f"BEGIN {refresh_old}{refresh_new} END"
+        ),
+    })
+    rebuild_activity_aggregates(conn)
+
+
+def _m008_indexes(conn):
+    apply_indexes(conn)
+
+
+def _m009_rider_profiles(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rider_profiles (
+            user TEXT,
+            timestamp TEXT,
+            rider_type TEXT,
+            profile_json TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_rider_profiles_user_time ON rider_profiles (user, timestamp)")
+
+
+def _m010_zone_basis(conn):
+    # FTP und HF-max, mit denen die gespeicherten Zonenzeilen eines Benutzers berechnet wurden
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS zone_basis (
+            user_id TEXT PRIMARY KEY,
+            ftp REAL,
+            hr_max REAL,
+            updated_at TEXT
+        )
+    """)
+
+
+# (Version, Name, Funktion) – nur am Ende anhängen
+MIGRATIONS = [
+    (1, "base_schema", _m001_base_schema),
+    (2, "activities_critical_power", _m002_critical_power),
+    (3, "training_load_channels", _m003_training_load_channels),
+    (4, "activities_hr_load", _m004_hr_load),
+    (5, "activities_efficiency", _m005_efficiency),
+    (6, "data_version_triggers", _m006_data_version),
+    (7, "activity_aggregates", _m007_activity_aggregates),
+    (8, "indexes", _m008_indexes),
+    (9, "rider_profiles", _m009_rider_profiles),
+    (10, "zone_basis", _m010_zone_basis),
+]
+
+
+def _missing_metric_columns(conn: sqlite3.Connection) -> dict:
+    """
+    Spalten registrierter Aktivitätsmetriken, die 'activities' noch fehlen. Sie folgen der
+    Metrik-Registry statt einer festen Version und werden deshalb bei jedem Start abgeglichen.
+    """
+    from fit_processing.metric_registry import metric_column_types
+    # Die Metriken registrieren sich beim Import ihres Moduls
+    importlib.import_module("fit_processing.activity_metrics")
+    existing = {col[1] for col in conn.execute("PRAGMA table_info(activities)")}
+    return {c: t for c, t in metric_column_types().items() if c not in existing}
+
+
+def _applied_versions(conn: sqlite3.Connection) -> set:
+    has_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not has_table:
+        return set()
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+
+def _is_current(conn: sqlite3.Connection) -> bool:
+    if {v for v, _, _ in MIGRATIONS} - _applied_versions(conn):
+        return False
+    return not _missing_metric_columns(conn)
+
+
+def get_schema_version(db_path: str = None) -> int:
+    """Höchste angewendete Migrationsversion (0 bei einer Datenbank ohne 'schema_version')."""
+    with read_connection(db_path) as conn:
+        return max(_applied_versions(conn), default=0)
+
+
+def run_migrations(db_path: str = None) -> list:
+    """
+    Bringt das Schema auf den neuesten Stand. Ist nichts zu tun, kostet der Aufruf nur zwei
+    Lesezugriffe und nimmt keine Schreibsperre.
+
+    Returns:
+        Namen der in diesem Aufruf angewendeten Migrationen
+    """
+    with read_connection(db_path) as conn:
+        if _is_current(conn):
+            return []
+
+    done = []
+    try:
+        # BEGIN IMMEDIATE; bei einem Fehler wird die gesamte Transaktion zurückgerollt
+        with write_connection(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TEXT NOT NULL
+                )
+            """)
+            # Stand erst unter der Sperre lesen – ein anderer Prozess kann gerade migriert haben
+            applied = _applied_versions(conn)
+            for version, name, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                migrate(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, name, datetime.now().isoformat(timespec="seconds")),
+                )
+                done.append(name)
+
+            missing = _missing_metric_columns(conn)
+            if missing:
+                _add_columns(conn, "activities", missing)
+                create_data_version_triggers(conn)
+                done.append("metric_columns")
+    except Exception as e:
+        print(f"[ERROR] Schema-Migration fehlgeschlagen, Änderungen zurückgerollt: {e}")
+        raise
+
+    for name in done:
+        print(f"[MIGRATION] {name} angewendet.")
+    return done
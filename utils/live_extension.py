@@ -3,6 +3,7 @@ from fitparse import FitFile
 from utils.settings_access import get_setting
 from fit_processing.core_metrics import extract_core_metrics
 from fit_processing.heart_rate_metrics import extract_hr_series
+from fit_processing.stream_cache import file_fingerprint
 from fit_processing.power_metrics_complete import (
     extract_power_series, calculate_np, calculate_if, calculate_tss, calculate_ef
 )
@@ -41,7 +42,7 @@ def get_live_extension_rows(paths: list[str], user: str = None) -> pd.DataFrame:
             distance = core.get("distance")
             start_time = core.get("start_time")
 
-            if not power_series or duration is None or start_time is None:
+            if power_series.size == 0 or duration is None or start_time is None:
                 continue
 
             np_val = calculate_np(power_series)
@@ -54,6 +55,9 @@ def get_live_extension_rows(paths: list[str], user: str = None) -> pd.DataFrame:
                 ef_val = calculate_ef(np_val, hr_avg)
 
             rows.append({
+                # Gleicher Hash wie beim Import → Abgleich mit bereits importierten Aktivitäten
+                "file_hash": file_fingerprint(path),
+                "user_id": user,
                 "start_time": start_time,
                 "duration": duration,
                 "distance": distance,
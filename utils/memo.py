@@ -0,0 +1,102 @@
+# === Datei: memo.py ===
+# Prozessweite Memoisierung teurer Berechnungen mit Schlüsseln je Benutzer bzw. Aktivität.
+# Ersetzt st.cache_data für FIT-basierte Auswertungen: Statt mit st.cache_data.clear() alle
+# Einträge aller Benutzer zu verwerfen, entfernt invalidate_memo() nur die betroffenen.
+#
+#   @memoize()                       – Benutzer-Ebene: Schlüssel enthält den Benutzer und die
+#                                      Datenversion seiner Aktivitäten (Tabelle 'data_version')
+#   @memoize(activity_arg="path")    – Aktivitäts-Ebene: Schlüssel enthält Benutzer, Dateiname
+#                                      und Änderungszeit/Größe der FIT-Datei
+
+import os
+import copy
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 512
+
+_entries = OrderedDict()   # (Funktion, Benutzer, Aktivität, Version, Argumente) → Ergebnis
+_lock = threading.Lock()
+
+
+def _freeze(value):
+    """Macht Argumente hashbar (Listen/Dicts aus der UI)."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return tuple(sorted(value))
+    return value
+
+
+def _activity_scope(path: str):
+    """Benutzer, Aktivität und Version einer FIT-Datei (fit_samples/<user>/<datei>)."""
+    try:
+        info = os.stat(path)
+        version = (info.st_mtime_ns, info.st_size)
+    except OSError:
+        version = None
+    return os.path.basename(os.path.dirname(os.path.abspath(path))), os.path.basename(path), version
+
+
+def _user_scope(user: str):
+    from cache_modules.cache_manifest import get_data_versions
+    return user, None, get_data_versions(user, ["activities"])["activities"]
+
+
+def memoize(user_arg: str = "user", activity_arg: str = None, max_entries: int = MAX_ENTRIES):
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = bound.arguments
+
+            if activity_arg:
+                user, activity, version = _activity_scope(params[activity_arg])
+            else:
+                if not params.get(user_arg):
+                    from utils.user_paths import get_current_user
+                    params[user_arg] = get_current_user()
+                user, activity, version = _user_scope(params[user_arg])
+
+            key = (func.__qualname__, user, activity, version, _freeze(dict(params)))
+            with _lock:
+                if key in _entries:
+                    _entries.move_to_end(key)
+                    return copy.copy(_entries[key])
+
+            result = func(**params)
+            with _lock:
+                _entries[key] = result
+                # Älteste Einträge dieser Funktion verdrängen
+                own = [k for k in _entries if k[0] == func.__qualname__]
+                for old in own[:max(0, len(own) - max_entries)]:
+                    del _entries[old]
+            return copy.copy(result)
+
+        return wrapper
+    return decorator
+
+
+def invalidate_memo(user: str, activity: str = None) -> int:
+    """
+    Entfernt memoisierte Ergebnisse eines Benutzers. Mit `activity` (Dateiname) nur die dieser
+    Aktivität sowie die benutzerweiten Auswertungen, die sie einschließen.
+
+    Returns:
+        Anzahl entfernter Einträge
+    """
+    with _lock:
+        stale = [
+            k for k in _entries
+            if k[1] == user and (activity is None or k[2] in (None, activity))
+        ]
+        for k in stale:
+            del _entries[k]
+    return len(stale)
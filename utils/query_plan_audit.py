@@ -0,0 +1,136 @@
+# === Datei: query_plan_audit.py ===
+# Prüft per EXPLAIN QUERY PLAN, dass die häufigen Abfragen je Benutzer einen Index nutzen.
+# Die Prüfung läuft auf einer temporären Datenbank mit synthetischen Aktivitäten
+# (Standard: 100 000 über 50 Benutzer), damit der Planer realistische Statistiken sieht.
+#
+#   python -m utils.query_plan_audit [--activities 100000] [--users 50]
+#
+# Exit-Code 1, sobald eine Abfrage eine Tabelle vollständig scannt.
+
+import os
+import sys
+import sqlite3
+import argparse
+import tempfile
+import numpy as np
+
+from utils.db_migrations import create_base_schema, run_migrations
+from utils.database import close_connections
+from fit_processing.activity_writer import EXISTING_HASHES_SQL, ZONE_INSERT_SQL, ZONE_DELETE_SQL, ZONE_TABLES
+from fit_processing.backfill import pending_activities_sql
+from fit_processing.metric_registry import METRICS
+from fit_processing.metrics_calc_new import TRAINING_LOAD_SQL
+from fit_processing.build_data_cache_new import LAST_ACTIVITY_SQL
+from cache_modules.cache_helpers import (
+    ACTIVITIES_IN_RANGE_SQL, ACTIVITY_AGGREGATES_SQL, FILE_NAMES_SQL, FILE_METADATA_SQL
+)
+from cache_modules.cache_efficiency import EF_STREAM_SQL
+from cache_modules.cache_manifest import data_versions_sql
+from cache_modules.cache_vo2max import VO2MAX_COLUMNS
+from cache_modules.cache_zones import ZONE_ACTIVITIES_SQL, MISSING_ZONE_ROWS_SQL, ZONE_ROWS_SQL
+
+# Name → (SQL, Parameter). Die SQL-Texte stammen aus den Modulen, die sie ausführen;
+# Parameter beziehen sich auf die synthetischen Daten.
+HOT_QUERIES = {
+    "Import: bekannte Datei-Hashes": (EXISTING_HASHES_SQL, ("user_7",)),
+    **{
+        f"Import: Zonenzeilen ({table})": (ZONE_INSERT_SQL.format(table=table), ("Z1", 600, "user_7", "hash_7_42"))
+        for table in ZONE_TABLES
+    },
+    **{
+        f"Zonen ersetzen ({table})": (ZONE_DELETE_SQL.format(table=table), (1,))
+        for table in ZONE_TABLES
+    },
+    "Dateinamen je Benutzer": (FILE_NAMES_SQL, ("user_7",)),
+    "Datei-Metadaten je Benutzer": (FILE_METADATA_SQL, ("user_7",)),
+    "Aktivitäten im Zeitraum": (ACTIVITIES_IN_RANGE_SQL, ("user_7", "2024-01-01", "2024-01-08")),
+    "Aggregate je Periode": (ACTIVITY_AGGREGATES_SQL, ("user_7", "week")),
+    "Letzte Aktivität je Benutzer": (LAST_ACTIVITY_SQL, ()),
+    "EF-Stream einer Aktivität": (EF_STREAM_SQL, (42, "user_7")),
+    "VO₂max: neue Aktivitäten": (f"{VO2MAX_COLUMNS} AND start_time > ?", ("user_7", "2024-01-01")),
+    **{
+        f"Backfill: offene Aktivitäten ({name})": (pending_activities_sql(spec["columns"]), ("user_7",))
+        for name, spec in METRICS.items() if spec["columns"]
+    },
+    "Zonen: alle Aktivitäten": (ZONE_ACTIVITIES_SQL, ("user_7",)),
+    "Zonen: Aktivitäten ohne Zonenzeilen": (MISSING_ZONE_ROWS_SQL, ("user_7",)),
+    "Zonen: Summen je Aktivität": (ZONE_ROWS_SQL, ("user_7", "user_7")),
+    "Trainingsbelastung je Benutzer": (TRAINING_LOAD_SQL, ("user_7",)),
+    "Datenversion": (data_versions_sql(2), ("user_7", "activities", "power_zones")),
+}
+
+
+def build_audit_db(path: str, n_activities: int = 100_000, n_users: int = 50, seed: int = 0):
+    """Füllt eine neue Datenbank mit synthetischen Daten und bringt sie per Migration auf den aktuellen Stand."""
+    rng = np.random.default_rng(seed)
+    per_user = n_activities // n_users
+    with sqlite3.connect(path) as conn:
+        create_base_schema(conn)
+        rows = []
+        for u in range(n_users):
+            days = np.sort(rng.integers(0, 5 * 365, per_user))
+            for i, day in enumerate(days):
+                start = np.datetime64("2020-01-01T08:00:00") + np.timedelta64(int(day), "D")
+                rows.append((f"user_{u}", str(start), f"ride_{u}_{i}.fit", f"hash_{u}_{i}",
+                             float(rng.uniform(100, 300)), float(rng.uniform(1800, 14400))))
+        conn.executemany(
+            "INSERT INTO activities (user_id, start_time, file_name, file_hash, avg_power, duration) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        conn.executemany(
+            "INSERT INTO power_zones (activity_id, zone_label, seconds_in_zone, user_id) "
+            "SELECT id, ?, 600, user_id FROM activities", [(f"Z{z}",) for z in range(1, 8)]
+        )
+        conn.executemany(
+            "INSERT INTO hr_zones (activity_id, zone_label, seconds_in_zone, user_id) "
+            "SELECT id, ?, 600, user_id FROM activities", [(f"Z{z}",) for z in range(1, 6)]
+        )
+        conn.execute("""
+            INSERT INTO training_load (date, user_id, tss)
+            SELECT DISTINCT date(start_time), user_id, 50 FROM activities
+        """)
+        conn.execute("""
+            INSERT INTO data_version (user_id, table_name, version)
+            SELECT DISTINCT user_id, 'activities', 1 FROM activities
+        """)
+        conn.commit()
+
+    # Übrige Migrationen (Spalten, Trigger, Aggregate, Indizes samt ANALYZE) erst nach den
+    # Testdaten – die Trigger feuern so nicht je Zeile, das Schema entspricht dem Betrieb
+    run_migrations(path)
+    close_connections()
+
+
+def audit_query_plans(conn: sqlite3.Connection) -> list:
+    """
+    Returns:
+        Liste (Name, Plan, ok) – ok, wenn kein Schritt eine Tabelle ohne Index scannt
+    """
+    results = []
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        # "SCAN <tabelle>" ohne "USING ... INDEX" ist ein vollständiger Tabellenscan
+        full_scans = [p for p in plan if p.startswith("SCAN") and "INDEX" not in p]
+        results.append((name, " | ".join(plan), not full_scans))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query-Pläne der häufigen Abfragen prüfen.")
+    parser.add_argument("--activities", type=int, default=100_000, help="Anzahl synthetischer Aktivitäten")
+    parser.add_argument("--users", type=int, default=50, help="Anzahl Benutzer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "audit.db")
+        print(f"[INFO] Erzeuge Testdatenbank mit {args.activities} Aktivitäten ...")
+        build_audit_db(db_path, args.activities, args.users)
+        with sqlite3.connect(db_path) as conn:
+            results = audit_query_plans(conn)
+
+    failed = 0
+    for name, plan, ok in results:
+        print(f"{'[OK]' if ok else '[ERROR]'} {name}: {plan}")
+        failed += not ok
+    print(f"[INFO] {len(results) - failed}/{len(results)} Abfragen nutzen einen Index.")
+    sys.exit(1 if failed else 0)
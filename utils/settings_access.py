@@ -18,6 +18,8 @@ DEFAULTS = {
     "weight": 70,
     "hr_max": 190,
     "hr_rest": 60,
+    "ctl_constant": 42,
+    "atl_constant": 7,
 }
 
 def get_settings_file(user: str = None) -> str:
@@ -1,5 +1,9 @@
 import os
 import streamlit as st
+from utils.cache_io import (
+    resolve_read_path, resolve_write_path, pin_generation, begin_generation, commit_generation,
+    writing_generation, generation_lock, restore_artifacts, discard_generation
+)
 
 # Basisverzeichnisse
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -24,8 +28,45 @@ def get_user_cache_dir(user: str = None) -> str:
     return path
 
 def get_user_cache_path(filename: str, user: str = None) -> str:
-    """Gibt den vollständigen Pfad zu einer Cache-Datei für einen Benutzer zurück."""
-    return os.path.join(get_user_cache_dir(user), filename)
+    """
+    Gibt den vollständigen Pfad zu einer Cache-Datei für einen Benutzer zurück.
+    Artefakte der Cache-Module werden aus der fixierten bzw. aktuellen Generation gelesen.
+    """
+    user = user or get_current_user()
+    return resolve_read_path(get_user_cache_dir(user), user, filename)
+
+def get_user_cache_write_path(filename: str, user: str = None) -> str:
+    """Zielpfad zum Schreiben einer Cache-Datei (während eines Rebuilds in der neuen Generation)."""
+    return resolve_write_path(get_user_cache_dir(user), filename)
+
+def pin_user_cache_generation(user: str = None):
+    """Fixiert die aktuelle Cache-Generation für den laufenden Seitenaufbau."""
+    user = user or get_current_user()
+    pin_generation(user, get_user_cache_dir(user))
+
+def begin_user_cache_generation(user: str) -> str:
+    """Startet eine neue Cache-Generation für einen Rebuild."""
+    return begin_generation(get_user_cache_dir(user))
+
+def commit_user_cache_generation(user: str, generation: str):
+    """Veröffentlicht eine fertige Cache-Generation atomar."""
+    commit_generation(get_user_cache_dir(user), generation)
+
+def restore_user_cache_artifacts(user: str, generation: str, names):
+    """Übernimmt die angegebenen Artefakte unverändert aus der aktuellen Generation."""
+    restore_artifacts(get_user_cache_dir(user), generation, names)
+
+def discard_user_cache_generation(user: str, generation: str):
+    """Verwirft eine nicht veröffentlichte Cache-Generation."""
+    discard_generation(get_user_cache_dir(user), generation)
+
+def user_cache_generation_lock(user: str):
+    """Sperre eines Benutzers von begin_ bis commit_user_cache_generation (prozessübergreifend)."""
+    return generation_lock(get_user_cache_dir(user))
+
+def writing_user_cache_generation(user: str, generation: str):
+    """Leitet get_user_cache_write_path im aktuellen Thread/Prozess in die angegebene Generation."""
+    return writing_generation(get_user_cache_dir(user), generation)
 
 # === FIT-Dateiverzeichnisse ===
 def get_user_fit_dir(user: str = None) -> str: